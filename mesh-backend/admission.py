@@ -0,0 +1,286 @@
+"""
+Admission Control
+
+Bounds how much work clients can start, so one misbehaving integration can't
+use up the Mesh quota or the worker's capacity, and latency stays bounded
+under overload.
+
+``RateLimiter`` keeps a token bucket per key. The admission middleware uses
+one per client address, plus one per client and route for the routes that
+are expensive or get polled (``/api/get_token``, ``/api/get_linktoken``). A
+client over its rate gets ``429`` with ``Retry-After`` before any work is
+done.
+
+Behind a reverse proxy every request arrives from the proxy's address, so
+``client_address`` only reads ``X-Forwarded-For`` when the peer is one of
+the configured trusted proxies.
+
+Requests that get past admission still share a capped number of Mesh
+connections; ``upstream_scheduler.py`` decides which Mesh call goes next and
+sheds calls once its queue is full.
+"""
+
+# --- Standard Library Imports ---
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple, Union
+
+# --- Third-Party Imports ---
+from starlette.routing import compile_path
+
+# --- Local Imports ---
+from metrics import REGISTRY
+
+# --- Metrics ---
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "admission_rejections_total",
+    "Requests turned away by admission control, by the limit they hit",
+    ("reason",),
+)
+
+
+def retry_after_header(seconds: float) -> str:
+    """Return a ``Retry-After`` value: whole seconds, at least one."""
+    return str(max(1, math.ceil(seconds)))
+
+
+def parse_route_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Parse per-route rate limits.
+
+    Args:
+        spec: Comma-separated ``route=rate:burst`` items, where ``route`` is a
+            route template such as ``/api/get_token/{request_id}``, ``rate``
+            is requests per second and ``burst`` the bucket size
+
+    Returns:
+        Dict[str, Tuple[float, float]]: (rate, burst) by route template
+
+    Raises:
+        ValueError: If an item is malformed
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, limit = item.partition("=")
+        rate, _, burst = limit.partition(":")
+        try:
+            limits[route.strip()] = (float(rate), float(burst or rate))
+        except ValueError:
+            raise ValueError(f"Invalid route limit {item!r}; expected route=rate:burst")
+    return limits
+
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_trusted_proxies(spec: str) -> List[IPNetwork]:
+    """
+    Parse the reverse proxies allowed to set ``X-Forwarded-For``.
+
+    Args:
+        spec: Comma-separated addresses or CIDR ranges, e.g. ``10.0.0.0/8,127.0.0.1``
+
+    Returns:
+        List[IPNetwork]: The trusted networks
+
+    Raises:
+        ValueError: If an item is not an address or network
+    """
+    proxies = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            proxies.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            raise ValueError(f"Invalid trusted proxy {item!r}; expected an address or CIDR range")
+    return proxies
+
+
+def _is_trusted(address: str, proxies: Sequence[IPNetwork]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in proxies)
+
+
+def client_address(peer: str, forwarded_for: Optional[str], proxies: Sequence[IPNetwork]) -> str:
+    """
+    Return the address a request's rate limits are keyed on.
+
+    When the peer is a trusted proxy, ``X-Forwarded-For`` is read from the
+    right, skipping trusted proxies, and the first other address is the
+    client. Addresses further left were supplied by the client itself and
+    are never used.
+
+    Args:
+        peer: Address of the connection's peer
+        forwarded_for: The ``X-Forwarded-For`` header, if any
+        proxies: Trusted proxy networks
+
+    Returns:
+        str: The client's address
+    """
+    if not forwarded_for or not _is_trusted(peer, proxies):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, proxies):
+            return hop
+    return hops[0] if hops else peer
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Take one token if there is one.
+
+        Args:
+            now: Current monotonic time
+
+        Returns:
+            float: 0.0 if a token was taken, otherwise seconds until one is available
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token buckets by key, with a cap on how many keys are tracked.
+
+    Buckets are kept in least-recently-used order; past ``max_keys`` the
+    least recently used is dropped. An idle bucket refills to full anyway, so
+    dropping one only forgets a client that has gone quiet.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket size
+            max_keys: Maximum number of buckets kept
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Any, TokenBucket]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: Any, now: Optional[float] = None) -> float:
+        """
+        Take a token from ``key``'s bucket.
+
+        Args:
+            key: Bucket key
+            now: Current monotonic time (defaults to now)
+
+        Returns:
+            float: 0.0 if allowed, otherwise seconds until the key may retry
+        """
+        if now is None:
+            now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+
+class AdmissionController:
+    """Per-client and per-client-per-route rate limits for incoming requests."""
+
+    def __init__(
+        self,
+        client_rate: float,
+        client_burst: float,
+        route_limits: Dict[str, Tuple[float, float]],
+        max_clients: int = 100000,
+        exempt_prefixes: Tuple[str, ...] = (),
+    ):
+        """
+        Args:
+            client_rate: Requests per second each client may sustain
+            client_burst: Requests a client may make in a burst
+            route_limits: (rate, burst) by route template, applied per client
+            max_clients: Maximum clients tracked per limiter
+            exempt_prefixes: Path prefixes that are never limited
+        """
+        self.exempt_prefixes = exempt_prefixes
+        self.clients = RateLimiter(client_rate, client_burst, max_clients)
+        self.routes: List[Tuple[str, Pattern[str], RateLimiter]] = [
+            (route, compile_path(route)[0], RateLimiter(rate, burst, max_clients))
+            for route, (rate, burst) in route_limits.items()
+        ]
+        self._stats = {"admitted": 0, "client_rate": 0, "route_rate": 0}
+
+    def check(self, client: str, path: str) -> Optional[Tuple[str, float]]:
+        """
+        Decide whether a request may start.
+
+        Args:
+            client: Client address
+            path: Request path
+
+        Returns:
+            Optional[Tuple[str, float]]: None if admitted, otherwise the
+                limit that was hit (``client_rate`` or ``route_rate``) and
+                the seconds until the client may retry
+        """
+        if path.startswith(self.exempt_prefixes):
+            return None
+        now = time.monotonic()
+        wait = self.clients.take(client, now)
+        if wait:
+            return self._reject("client_rate", wait)
+        for _, pattern, limiter in self.routes:
+            if pattern.match(path):
+                wait = limiter.take(client, now)
+                if wait:
+                    return self._reject("route_rate", wait)
+                break
+        self._stats["admitted"] += 1
+        return None
+
+    def _reject(self, reason: str, wait: float) -> Tuple[str, float]:
+        self._stats[reason] += 1
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        return reason, wait
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report admission counters and limits.
+
+        Returns:
+            Dict[str, Any]: Counters, tracked clients and per-route limits
+        """
+        return {
+            **self._stats,
+            "clients": len(self.clients),
+            "client_limit": {"rate": self.clients.rate, "burst": self.clients.burst},
+            "route_limits": {
+                route: {"rate": limiter.rate, "burst": limiter.burst, "clients": len(limiter)}
+                for route, _, limiter in self.routes
+            },
+        }
@@ -0,0 +1,276 @@
+"""
+Fake Mesh API
+
+A local stand-in for the Mesh Connect endpoints this service calls, so load
+tests run offline and give comparable numbers from one commit to the next.
+
+Each endpoint answers after a delay drawn from a latency model and fails with
+a configurable probability. Responses are synthetic by default. They can
+instead be recorded from a real Mesh environment once (``--record``) and
+replayed later (``--replay``).
+
+Usage (from the mesh-backend directory):
+
+    python -m benchmarks.fake_mesh --port 9100 --latency lognormal:0.08,0.5 --error-rate 0.01
+    python -m benchmarks.fake_mesh --latency-for execute=fixed:0.4 --error-rate-for holdings=0.05
+    python -m benchmarks.fake_mesh --record recordings/ --upstream https://sandbox-integration-api.meshconnect.com
+    python -m benchmarks.fake_mesh --replay recordings/
+
+Latency models: ``none``, ``fixed:SECONDS``, ``uniform:LOW,HIGH`` and
+``lognormal:MEDIAN,SIGMA``.
+"""
+
+# --- Standard Library Imports ---
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import math
+import os
+import random
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# --- Third-Party Imports ---
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Endpoint name -> (method, path), mirroring the helpers in main.py
+ENDPOINTS: Dict[str, Tuple[str, str]] = {
+    "linktoken": ("POST", "/api/v1/linktoken"),
+    "preview": ("POST", "/api/v1/transfers/managed/preview"),
+    "execute": ("POST", "/api/v1/transfers/managed/execute"),
+    "holdings": ("POST", "/api/v1/holdings/get"),
+    "networks": ("GET", "/api/v1/transfers/managed/networks"),
+}
+COINBASE_NETWORK_ID = "aa883b03-120d-477c-a588-37c2afd3ca71"
+
+
+class LatencyModel:
+    """Draws response delays from a simple distribution."""
+
+    def __init__(self, spec: str):
+        """
+        Args:
+            spec: ``none``, ``fixed:S``, ``uniform:LOW,HIGH`` or ``lognormal:MEDIAN,SIGMA``
+        """
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        params = [float(value) for value in args.split(",") if value]
+        if kind == "none":
+            self._draw = lambda: 0.0
+        elif kind == "fixed" and len(params) == 1:
+            self._draw = lambda: params[0]
+        elif kind == "uniform" and len(params) == 2:
+            self._draw = lambda: random.uniform(params[0], params[1])
+        elif kind == "lognormal" and len(params) == 2:
+            mu = math.log(params[0])
+            self._draw = lambda: random.lognormvariate(mu, params[1])
+        else:
+            raise ValueError(f"Invalid latency model: {spec}")
+
+    def draw(self) -> float:
+        """Return a delay in seconds."""
+        return self._draw()
+
+
+def synthetic_response(name: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a plausible Mesh response for an endpoint.
+
+    Args:
+        name: Endpoint name
+        body: Parsed request body
+
+    Returns:
+        Dict[str, Any]: Response payload shaped like Mesh's
+    """
+    if name == "linktoken":
+        url = f"https://sandbox-web.meshconnect.com/link?token={uuid.uuid4().hex}"
+        return {"status": "ok", "content": {"linkToken": base64.b64encode(url.encode()).decode()}}
+    if name == "preview":
+        return {"status": "ok", "content": {
+            "status": "succeeded",
+            "previewResult": {
+                "previewId": str(uuid.uuid4()),
+                "symbol": body.get("symbol"),
+                "amount": body.get("amount"),
+                "networkId": body.get("networkId"),
+                "estimatedNetworkGasFee": {"fee": 0.0001, "feeCurrency": "ETH"},
+            },
+        }}
+    if name == "execute":
+        return {"status": "ok", "content": {
+            "status": "succeeded",
+            "executeTransferResult": {
+                "transferId": str(uuid.uuid4()),
+                "txHash": "0x" + uuid.uuid4().hex + uuid.uuid4().hex,
+            },
+        }}
+    if name == "holdings":
+        return {"status": "ok", "content": {
+            "institutionName": "Fake Broker",
+            "accountName": "Main",
+            "cryptocurrencyPositions": [
+                {"symbol": "USDC", "name": "USD Coin", "amount": 250.0},
+                {"symbol": "ETH", "name": "Ethereum", "amount": 0.75},
+            ],
+        }}
+    return {"status": "ok", "content": {"networks": [
+        {"id": COINBASE_NETWORK_ID, "name": "Base", "chainId": "8453", "supportedTokens": ["USDC", "ETH"]},
+    ]}}
+
+
+class Recordings:
+    """Canned responses per endpoint, recorded from a real Mesh environment."""
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: Directory holding one ``<endpoint>.json`` file per endpoint
+        """
+        self.directory = directory
+        self._cycles: Dict[str, Iterator[Dict[str, Any]]] = {}
+        for name in ENDPOINTS:
+            path = os.path.join(directory, f"{name}.json")
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    entries = json.load(f)
+                if entries:
+                    self._cycles[name] = itertools.cycle(entries)
+
+    def next(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the next canned ``{status, body}`` for an endpoint, round robin."""
+        cycle = self._cycles.get(name)
+        return next(cycle) if cycle is not None else None
+
+    def append(self, name: str, status: int, body: Any, limit: int = 50) -> None:
+        """Add a recorded response, keeping the most recent ``limit``."""
+        path = os.path.join(self.directory, f"{name}.json")
+        entries: List[Dict[str, Any]] = []
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                entries = json.load(f)
+        entries = (entries + [{"status": status, "body": body}])[-limit:]
+        with open(path, "w") as f:
+            json.dump(entries, f, indent=2)
+
+
+def create_app(
+    latency: Dict[str, LatencyModel],
+    error_rates: Dict[str, float],
+    error_status: int = 503,
+    replay: Optional[str] = None,
+    record: Optional[str] = None,
+    upstream: Optional[str] = None,
+) -> FastAPI:
+    """
+    Build the fake Mesh application.
+
+    Args:
+        latency: Latency model per endpoint name
+        error_rates: Failure probability per endpoint name
+        error_status: HTTP status returned for injected failures
+        replay: Directory of recorded responses to serve
+        record: Directory to record upstream responses into
+        upstream: Real Mesh base URL to proxy to while recording
+
+    Returns:
+        FastAPI: The application
+    """
+    app = FastAPI(title="Fake Mesh API")
+    recordings = Recordings(replay) if replay else None
+    recorder = Recordings(record) if record else None
+    counts = {name: 0 for name in ENDPOINTS}
+    proxy = httpx.AsyncClient(base_url=upstream, timeout=30) if record and upstream else None
+
+    def add_endpoint(name: str, method: str, path: str) -> None:
+        async def handler(request: Request):
+            counts[name] += 1
+            raw = await request.body()
+            body = json.loads(raw) if raw else {}
+            if proxy is not None:
+                # Recording: pass the real latency and errors through untouched
+                headers = {k: v for k, v in request.headers.items() if k.lower().startswith("x-client")}
+                upstream_response = await proxy.request(method, path, json=body or None, headers=headers)
+                payload = upstream_response.json()
+                recorder.append(name, upstream_response.status_code, payload)
+                return JSONResponse(payload, status_code=upstream_response.status_code)
+            await asyncio.sleep(latency[name].draw())
+            if random.random() < error_rates[name]:
+                return JSONResponse({"status": "error", "message": "Injected failure"}, status_code=error_status)
+            canned = recordings.next(name) if recordings is not None else None
+            if canned is not None:
+                return JSONResponse(canned["body"], status_code=canned["status"])
+            return JSONResponse(synthetic_response(name, body))
+
+        app.add_api_route(path, handler, methods=[method], name=name)
+
+    for name, (method, path) in ENDPOINTS.items():
+        add_endpoint(name, method, path)
+
+    @app.get("/_stats")
+    async def stats():
+        return {"requests": counts}
+
+    return app
+
+
+def parse_overrides(values: List[str]) -> Dict[str, str]:
+    """Parse repeated ``endpoint=value`` options."""
+    overrides = {}
+    for value in values:
+        name, _, setting = value.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint {name!r}; expected one of {', '.join(ENDPOINTS)}")
+        overrides[name] = setting
+    return overrides
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the command line parser."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", default="lognormal:0.08,0.4", help="latency model for every endpoint")
+    parser.add_argument("--latency-for", action="append", default=[], metavar="ENDPOINT=MODEL")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="failure probability for every endpoint")
+    parser.add_argument("--error-rate-for", action="append", default=[], metavar="ENDPOINT=RATE")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, help="random seed, for repeatable latency and error draws")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--replay", metavar="DIR", help="serve responses recorded with --record")
+    group.add_argument("--record", metavar="DIR", help="proxy to --upstream and record its responses")
+    parser.add_argument("--upstream", help="real Mesh base URL used with --record")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    if args.record and not args.upstream:
+        raise SystemExit("--record needs --upstream")
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    latency_overrides = parse_overrides(args.latency_for)
+    rate_overrides = parse_overrides(args.error_rate_for)
+    latency = {name: LatencyModel(latency_overrides.get(name, args.latency)) for name in ENDPOINTS}
+    error_rates = {name: float(rate_overrides.get(name, args.error_rate)) for name in ENDPOINTS}
+    app = create_app(
+        latency,
+        error_rates,
+        error_status=args.error_status,
+        replay=args.replay,
+        record=args.record,
+        upstream=args.upstream,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
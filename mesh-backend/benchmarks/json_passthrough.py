@@ -0,0 +1,112 @@
+"""
+JSON Passthrough Benchmark
+
+Measures the CPU a route spends turning a Mesh response body into its own
+response body, for holdings payloads of increasing size:
+
+- ``decode+encode``: ``response.json()`` then ``JSONResponse``, as routes did
+  before forwarding bytes
+- ``passthrough``: the upstream bytes wrapped in a ``Response`` unchanged
+- ``fast decode+encode``: ``UpstreamJSON.data()`` then ``FastJSONResponse``,
+  as routes that change the payload do (orjson when installed)
+
+Usage (from the mesh-backend directory):
+
+    python -m benchmarks.json_passthrough --positions 10,100,1000 --iterations 2000
+"""
+
+# --- Standard Library Imports ---
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- Third-Party Imports ---
+from fastapi.responses import JSONResponse  # noqa: E402
+
+# --- Local Imports ---
+from upstream_json import FastJSONResponse, UpstreamJSON, orjson, passthrough_response  # noqa: E402
+
+
+def holdings_body(positions: int) -> bytes:
+    """
+    Build a Mesh-shaped holdings response body.
+
+    Args:
+        positions: Number of crypto positions
+
+    Returns:
+        bytes: Encoded JSON body
+    """
+    return json.dumps({
+        "status": "ok",
+        "content": {
+            "institutionName": "Coinbase",
+            "accountName": "Main",
+            "cryptocurrencyPositions": [
+                {
+                    "symbol": f"TOK{i}",
+                    "name": f"Token number {i}",
+                    "amount": 1234.5678 + i,
+                    "costBasis": 0.0123 * i,
+                    "marketValue": 99.95 * i,
+                    "networks": ["ethereum", "base"],
+                }
+                for i in range(positions)
+            ],
+        },
+    }).encode("utf-8")
+
+
+def cpu_per_call(fn: Callable[[], object], iterations: int) -> float:
+    """Return the mean process CPU time of ``fn`` in microseconds."""
+    fn()
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def measure(body: bytes, iterations: int) -> Dict[str, float]:
+    """
+    Time each way of turning ``body`` into a response.
+
+    Args:
+        body: Upstream response body
+        iterations: Calls per method
+
+    Returns:
+        Dict[str, float]: Mean CPU microseconds per call, by method
+    """
+    return {
+        "decode+encode": cpu_per_call(lambda: JSONResponse(content=json.loads(body)), iterations),
+        "passthrough": cpu_per_call(lambda: passthrough_response(UpstreamJSON(body)), iterations),
+        "fast decode+encode": cpu_per_call(lambda: FastJSONResponse(content=UpstreamJSON(body).data()), iterations),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", default="10,100,1000", help="comma-separated payload sizes")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"orjson: {'installed' if orjson is not None else 'not installed (stdlib json fallback)'}")
+    print(f"{'positions':>9} {'bytes':>9} {'decode+encode µs':>17} {'passthrough µs':>15} {'fast µs':>9} {'saved':>7}")
+    sizes: List[int] = [int(value) for value in args.positions.split(",")]
+    for positions in sizes:
+        body = holdings_body(positions)
+        stats = measure(body, args.iterations)
+        saved = 1 - stats["passthrough"] / stats["decode+encode"]
+        print(
+            f"{positions:>9} {len(body):>9,} {stats['decode+encode']:>17.1f} "
+            f"{stats['passthrough']:>15.1f} {stats['fast decode+encode']:>9.1f} {saved:>7.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
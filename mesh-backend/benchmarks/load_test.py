@@ -0,0 +1,480 @@
+"""
+Load Test
+
+Runs scripted user journeys against a local copy of the service wired to the
+fake Mesh API (``benchmarks/fake_mesh.py``), and reports throughput, latency
+percentiles and memory growth per route. Nothing leaves the machine, so
+results can be compared between commits.
+
+Scenarios:
+
+- ``demo``: the ``demo.html`` flow. Request an ID, open the auth page, poll
+  ``/api/get_token`` until the simulated user finishes auth, then load
+  holdings, preview and execute a transfer.
+- ``rainbow``: the ``rainbow_payment.html`` flow. Request an ID and a link
+  token, long-poll ``/api/get_token?wait=25``, then walk the preview, MFA,
+  execute and success pages.
+- ``routes``: each busy API route on its own, so memory growth can be
+  attributed to a single route.
+
+Usage (from the mesh-backend directory):
+
+    python -m benchmarks.load_test --users 50 --duration 20
+    python -m benchmarks.load_test --scenarios demo --mesh-args="--latency fixed:0.2 --error-rate 0.02"
+    python -m benchmarks.load_test --output before.json
+    python -m benchmarks.load_test --compare before.json
+"""
+
+# --- Standard Library Imports ---
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# --- Third-Party Imports ---
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUTH_TOKEN = "bench-auth-token"
+BROKER_TYPE = "coinbase"
+
+
+# --- Process Helpers ---
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """
+    Return the resident memory of a process and its children, in bytes.
+
+    Reads ``/proc``, so it only works on Linux.
+
+    Args:
+        pid: Root process ID
+
+    Returns:
+        Optional[int]: Total RSS, or None if ``/proc`` is unavailable
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # The command name may contain spaces; fields resume after ')'
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+        pending.extend(children.get(current, []))
+    return total
+
+
+def start_process(args: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    """Start a helper process in the mesh-backend directory, sending its output to ``log_path``."""
+    with open(log_path, "ab") as log:
+        return subprocess.Popen(
+            args, cwd=BASE_DIR, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT
+        )
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    """
+    Poll a URL until it answers 200.
+
+    Raises:
+        RuntimeError: If it does not answer within ``timeout`` seconds
+    """
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(url, timeout=1.0)
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+# --- Recording ---
+
+class Recorder:
+    """Collects (latency, ok) samples per route."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[float, bool]]] = {}
+
+    async def call(
+        self,
+        client: httpx.AsyncClient,
+        route: str,
+        method: str,
+        url: str,
+        ok_statuses: Tuple[int, ...] = (200,),
+        **kwargs: Any,
+    ) -> Optional[httpx.Response]:
+        """
+        Send a request and record its latency under a route name.
+
+        Args:
+            client: Client pointed at the service
+            route: Route template to aggregate under
+            method: HTTP method
+            url: Path and query
+            ok_statuses: Statuses that count as success
+            **kwargs: Passed to ``client.request``
+
+        Returns:
+            Optional[httpx.Response]: The response, or None on a transport error
+        """
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.samples.setdefault(route, []).append((time.perf_counter() - started, False))
+            return None
+        self.samples.setdefault(route, []).append(
+            (time.perf_counter() - started, response.status_code in ok_statuses)
+        )
+        return response
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the given percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict[str, float]]:
+    """
+    Turn raw samples into per-route throughput and latency figures.
+
+    Args:
+        recorder: Collected samples
+        elapsed: Wall-clock seconds the scenario ran
+
+    Returns:
+        Dict[str, Dict[str, float]]: Requests, req/s, errors and p50/p95/p99
+            latency in milliseconds, by route
+    """
+    summary = {}
+    for route, samples in sorted(recorder.samples.items()):
+        latencies = [latency * 1000 for latency, _ in samples]
+        summary[route] = {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed,
+            "errors": sum(1 for _, ok in samples if not ok),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "mean_ms": statistics.fmean(latencies),
+        }
+    return summary
+
+
+# --- Journeys ---
+
+class Journeys:
+    """User journeys; each method runs one complete pass of a flow."""
+
+    def __init__(self, recorder: Recorder, poll_interval: float, auth_delay: float):
+        """
+        Args:
+            recorder: Where request samples go
+            poll_interval: Seconds between demo.html token polls (2 s in the page)
+            auth_delay: Seconds the simulated user takes to finish auth
+        """
+        self.recorder = recorder
+        self.poll_interval = poll_interval
+        self.auth_delay = auth_delay
+
+    async def _finish_auth_later(self, client: httpx.AsyncClient, request_id: str) -> None:
+        # Stands in for the Mesh iframe posting the broker token back
+        await asyncio.sleep(self.auth_delay)
+        await self.recorder.call(
+            client, "/api/store_token/{request_id}", "POST", f"/api/store_token/{request_id}",
+            json={"access_token": AUTH_TOKEN, "broker_type": BROKER_TYPE},
+        )
+
+    async def _preview_and_execute(self, client: httpx.AsyncClient) -> None:
+        params = {
+            "auth_token": AUTH_TOKEN, "from_type": BROKER_TYPE, "to_type": "rainbow",
+            "to_address": "0x0000000000000000000000000000000000000001", "amount": 5, "symbol": "USDC",
+        }
+        response = await self.recorder.call(client, "/api/transfer_preview", "GET", "/api/transfer_preview", params=params)
+        preview_id = str(uuid.uuid4())
+        if response is not None and response.status_code == 200:
+            preview_id = response.json().get("content", {}).get("previewResult", {}).get("previewId", preview_id)
+        await self.recorder.call(
+            client, "/api/execute_transfer", "POST", "/api/execute_transfer",
+            json={"auth_token": AUTH_TOKEN, "from_type": BROKER_TYPE, "preview_id": preview_id, "mfa_code": "123456"},
+        )
+
+    async def demo(self, client: httpx.AsyncClient) -> None:
+        """The demo.html flow, using its 2-second polling fallback."""
+        record = self.recorder.call
+        await record(client, "/demo", "GET", "/demo")
+        response = await record(client, "/api/request_id", "GET", "/api/request_id")
+        if response is None or response.status_code != 200:
+            return
+        request_id = response.json()["request_id"]
+        await record(client, "/init_auth/{request_id}", "GET", f"/init_auth/{request_id}")
+        auth = asyncio.create_task(self._finish_auth_later(client, request_id))
+        try:
+            while True:
+                response = await record(client, "/api/get_token/{request_id}", "GET", f"/api/get_token/{request_id}")
+                if response is None or response.status_code != 200:
+                    return
+                if "access_token" in response.json():
+                    break
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            await auth
+        await record(
+            client, "/api/get_holdings", "GET", "/api/get_holdings",
+            params={"auth_token": AUTH_TOKEN, "from_type": BROKER_TYPE},
+        )
+        await self._preview_and_execute(client)
+
+    async def rainbow(self, client: httpx.AsyncClient) -> None:
+        """The rainbow_payment.html flow, long-polling for the token."""
+        record = self.recorder.call
+        await record(client, "/rainbow_payment", "GET", "/rainbow_payment")
+        response = await record(client, "/api/request_id", "GET", "/api/request_id")
+        if response is None or response.status_code != 200:
+            return
+        request_id = response.json()["request_id"]
+        await record(client, "/api/get_linktoken", "GET", "/api/get_linktoken")
+        auth = asyncio.create_task(self._finish_auth_later(client, request_id))
+        try:
+            while True:
+                response = await record(
+                    client, "/api/get_token/{request_id}?wait", "GET", f"/api/get_token/{request_id}?wait=25",
+                    timeout=35.0,
+                )
+                if response is None or response.status_code not in (200, 503):
+                    return
+                if response.status_code == 503:
+                    await asyncio.sleep(2)
+                elif "access_token" in response.json():
+                    break
+        finally:
+            await auth
+        await record(client, "/rainbow_preview", "GET", "/rainbow_preview")
+        await record(client, "/rainbow_mfa", "GET", "/rainbow_mfa")
+        await self._preview_and_execute(client)
+        await record(client, "/rainbow_success", "GET", "/rainbow_success")
+
+    def single_route(self, route: str, method: str, url: str, **kwargs: Any) -> Callable[[httpx.AsyncClient], Awaitable[None]]:
+        """Return a journey that calls one route once."""
+        async def journey(client: httpx.AsyncClient) -> None:
+            await self.recorder.call(client, route, method, url, **kwargs)
+        return journey
+
+
+ROUTE_JOURNEYS = [
+    ("/api/get_networks", "GET", "/api/get_networks", {}),
+    ("/api/get_holdings", "GET", "/api/get_holdings", {"params": {"auth_token": AUTH_TOKEN, "from_type": BROKER_TYPE}}),
+    ("/api/get_linktoken", "GET", "/api/get_linktoken", {}),
+    ("/api/request_id", "GET", "/api/request_id", {}),
+    ("/holdings", "GET", "/holdings", {}),
+]
+
+
+async def run_journey(
+    journey: Callable[[httpx.AsyncClient], Awaitable[None]],
+    base_url: str,
+    users: int,
+    duration: float,
+) -> float:
+    """
+    Run a journey in a loop from ``users`` concurrent clients for ``duration`` seconds.
+
+    Returns:
+        float: Wall-clock seconds elapsed, including journeys finishing after the deadline
+    """
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0, limits=limits) as client:
+        async def user() -> None:
+            while time.monotonic() < deadline:
+                await journey(client)
+
+        started = time.monotonic()
+        await asyncio.gather(*(user() for _ in range(users)))
+        return time.monotonic() - started
+
+
+async def run_phase(
+    name: str,
+    journey: Callable[[httpx.AsyncClient], Awaitable[None]],
+    recorder: Recorder,
+    args: argparse.Namespace,
+    app_pid: int,
+) -> Dict[str, Any]:
+    """Run one scenario phase and measure the service's RSS around it."""
+    rss_before = process_tree_rss(app_pid)
+    elapsed = await run_journey(journey, args.base_url, args.users, args.duration)
+    rss_after = process_tree_rss(app_pid)
+    return {
+        "name": name,
+        "elapsed": elapsed,
+        "rss_before": rss_before,
+        "rss_after": rss_after,
+        "rss_growth": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "routes": summarize(recorder, elapsed),
+    }
+
+
+# --- Reporting ---
+
+def print_phase(phase: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    """Print a phase's per-route table, with deltas against a baseline phase if given."""
+    growth = phase["rss_growth"]
+    growth_text = f"{growth / 1048576:+.1f} MiB" if growth is not None else "n/a"
+    print(f"\n== {phase['name']} ({phase['elapsed']:.1f}s, RSS growth {growth_text})")
+    print(f"{'route':<38} {'reqs':>7} {'req/s':>8} {'err':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    base_routes = (baseline or {}).get("routes", {})
+    for route, stats in phase["routes"].items():
+        line = (
+            f"{route:<38} {stats['requests']:>7} {stats['rps']:>8.1f} {stats['errors']:>5} "
+            f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+        )
+        base = base_routes.get(route)
+        if base:
+            line += f"   (req/s {stats['rps'] - base['rps']:+.1f}, p95 {stats['p95_ms'] - base['p95_ms']:+.1f} ms)"
+        print(line)
+
+
+def git_revision() -> Optional[str]:
+    """Return the current commit, if this is a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Start the fake Mesh API and the service, run the scenarios and stop both."""
+    mesh = start_process(
+        [sys.executable, "-m", "benchmarks.fake_mesh", "--port", str(args.mesh_port)] + shlex.split(args.mesh_args),
+        {},
+        args.log,
+    )
+    app_env = {
+        "MESH_API_BASE": f"http://127.0.0.1:{args.mesh_port}",
+        "MESH_CLIENT_ID": "bench-client",
+        "MESH_API_SECRET": "bench-secret",
+        "SANDBOX": "1",
+        "RAINBOW_WALLET_ADDRESS": "0x0000000000000000000000000000000000000002",
+        "COINBASE_WALLET_ADDRESS": "0x0000000000000000000000000000000000000003",
+        # Every simulated user shares one address; per-client limits would throttle the run
+        "ADMISSION_ENABLED": "false",
+    }
+    app_env.update(dict(item.split("=", 1) for item in args.env))
+    app = start_process(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.app_port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        app_env,
+        args.log,
+    )
+    args.base_url = f"http://127.0.0.1:{args.app_port}"
+    try:
+        await wait_until_ready(f"http://127.0.0.1:{args.mesh_port}/_stats")
+        await wait_until_ready(f"{args.base_url}/health/ready")
+        journeys_recorder = Recorder()
+        journeys = Journeys(journeys_recorder, args.poll_interval, args.auth_delay)
+
+        phases = []
+        for scenario in args.scenarios:
+            if scenario == "routes":
+                for route, method, url, kwargs in ROUTE_JOURNEYS:
+                    recorder = Recorder()
+                    journey = Journeys(recorder, args.poll_interval, args.auth_delay).single_route(route, method, url, **kwargs)
+                    phases.append(await run_phase(f"route {route}", journey, recorder, args, app.pid))
+            else:
+                recorder = Recorder()
+                journey = getattr(Journeys(recorder, args.poll_interval, args.auth_delay), scenario)
+                phases.append(await run_phase(scenario, journey, recorder, args, app.pid))
+        return {
+            "revision": git_revision(),
+            "users": args.users,
+            "duration": args.duration,
+            "workers": args.workers,
+            "mesh_args": args.mesh_args,
+            "phases": phases,
+        }
+    finally:
+        for process in (app, mesh):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="demo,rainbow,routes", help="comma-separated: demo, rainbow, routes")
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per scenario phase")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="demo.html token poll interval")
+    parser.add_argument("--auth-delay", type=float, default=1.0, help="seconds a simulated user spends authenticating")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the service")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--mesh-port", type=int, default=9100)
+    parser.add_argument("--mesh-args", default="--seed 1", help="extra arguments for benchmarks.fake_mesh")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="extra service settings")
+    parser.add_argument("--log", default=os.devnull, help="file for the service and fake Mesh output")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run to show deltas against")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    for name in args.scenarios:
+        if name not in ("demo", "rainbow", "routes"):
+            parser.error(f"unknown scenario {name!r}")
+
+    results = asyncio.run(run(args))
+
+    baseline_phases = {}
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        baseline_phases = {phase["name"]: phase for phase in baseline["phases"]}
+        print(f"Comparing against {args.compare} (revision {baseline.get('revision')})")
+    print(f"Revision {results['revision']}, {args.users} users, {args.duration:.0f}s per phase, {args.workers} worker(s)")
+    for phase in results["phases"]:
+        print_phase(phase, baseline_phases.get(phase["name"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+State Backend Benchmark
+
+Measures read and write latency of the StateStore backends against each other,
+so the cost of sharing state between workers is known before enabling it.
+
+Usage (from the mesh-backend directory):
+
+    python -m benchmarks.state_backends --entries 10000 --reads 50000
+"""
+
+# --- Standard Library Imports ---
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- Local Imports ---
+from state_backends import FileBackend, SQLiteBackend  # noqa: E402
+from state_store import MemoryBackend, StateBackend  # noqa: E402
+
+FIELDS = ("status", "token", "broker_type")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Return the given percentile of a list of samples.
+
+    Args:
+        samples: Measured values
+        pct: Percentile between 0 and 100
+
+    Returns:
+        float: The percentile value
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(backend: StateBackend, entries: int, reads: int) -> Dict[str, float]:
+    """
+    Time ``entries`` writes followed by ``reads`` random point reads.
+
+    Args:
+        backend: Backend under test
+        entries: Number of entries to write
+        reads: Number of reads to time
+
+    Returns:
+        Dict[str, float]: Latency percentiles in microseconds
+    """
+    keys = [str(uuid.uuid4()) for _ in range(entries)]
+    write_samples = []
+    for key in keys:
+        start = time.perf_counter()
+        backend.set(key, {"status": "complete", "token": "x" * 64, "broker_type": "coinbase"}, 3600)
+        write_samples.append((time.perf_counter() - start) * 1e6)
+    if hasattr(backend, "flush"):
+        backend.flush()
+
+    read_samples = []
+    for _ in range(reads):
+        key = random.choice(keys)
+        start = time.perf_counter()
+        backend.get(key)
+        read_samples.append((time.perf_counter() - start) * 1e6)
+
+    return {
+        "write_p50_us": percentile(write_samples, 50),
+        "write_p99_us": percentile(write_samples, 99),
+        "read_p50_us": percentile(read_samples, 50),
+        "read_p99_us": percentile(read_samples, 99),
+        "read_mean_us": statistics.fmean(read_samples),
+    }
+
+
+def main() -> None:
+    """Run the benchmark for every backend and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000, help="entries written per backend")
+    parser.add_argument("--reads", type=int, default=50000, help="point reads timed per backend")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "memory": MemoryBackend(FIELDS, max_entries=args.entries * 2),
+            # Without a running flush task the batched backends write through,
+            # so write latency here is the unbatched worst case.
+            "sqlite": SQLiteBackend(os.path.join(tmp, "state.db"), "bench", args.entries * 2),
+            "file": FileBackend(os.path.join(tmp, "files"), args.entries * 2),
+        }
+        print(f"{'backend':<8} {'write p50':>10} {'write p99':>10} {'read p50':>10} {'read p99':>10} {'read mean':>10}  (µs)")
+        for name, backend in backends.items():
+            result = measure(backend, args.entries, args.reads)
+            print(
+                f"{name:<8} {result['write_p50_us']:>10.1f} {result['write_p99_us']:>10.1f} "
+                f"{result['read_p50_us']:>10.1f} {result['read_p99_us']:>10.1f} {result['read_mean_us']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
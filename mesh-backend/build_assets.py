@@ -0,0 +1,187 @@
+"""
+Front-End Asset Build
+
+Bundles ``static/mesh_iframe_app.js`` with esbuild (minified and tree-shaken),
+then writes content-hashed copies of the served assets to ``static/dist/``
+with gzip and brotli variants, and a ``manifest.json`` mapping each logical
+name to its hashed file and each written file to its ETag.
+``static_assets.py`` serves the result.
+
+Usage (from the mesh-backend directory):
+
+    python build_assets.py              # bundle, fingerprint and compress
+    python build_assets.py --no-bundle  # fingerprint the existing bundle only
+
+Brotli variants need the optional ``brotli`` package (``pip install brotli``);
+without it only gzip variants are written.
+"""
+
+# --- Standard Library Imports ---
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- Constants ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+HASH_LENGTH = 12
+
+BUNDLE_ENTRY = "static/mesh_iframe_app.js"
+BUNDLE_OUTPUT = "mesh_iframe_app.bundle.js"
+# Same flags as esbuild_script.txt, plus minification and no legal comments
+ESBUILD_COMMAND = [
+    "npx", "esbuild", BUNDLE_ENTRY,
+    "--bundle",
+    "--minify",
+    "--tree-shaking=true",
+    "--legal-comments=none",
+    "--format=iife",
+    "--platform=browser",
+    "--target=es2018",
+    f"--outfile=static/{BUNDLE_OUTPUT}",
+]
+
+# Logical names (relative to static/) that templates reference
+ASSETS = [BUNDLE_OUTPUT, "transfer_status.js"]
+
+
+def bundle() -> None:
+    """Run esbuild to produce the minified iframe bundle."""
+    print(" ".join(ESBUILD_COMMAND))
+    subprocess.run(ESBUILD_COMMAND, cwd=BASE_DIR, check=True)
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """
+    Write a file so readers never see it half-written.
+
+    Args:
+        path: Destination path
+        data: File contents
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def etag(data: bytes) -> str:
+    """
+    Return the strong ETag ``static_assets.py`` sends for a file's bytes.
+
+    Args:
+        data: File contents as served
+
+    Returns:
+        str: Quoted ETag
+    """
+    return f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+
+def fingerprint(name: str, etags: Dict[str, str]) -> str:
+    """
+    Write the hashed copy of an asset and its compressed variants.
+
+    Args:
+        name: Asset path relative to static/
+        etags: Receives the ETag of every file written, by path relative to static/
+
+    Returns:
+        str: Hashed path relative to static/
+    """
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    stem, ext = os.path.splitext(os.path.basename(name))
+    hashed_name = f"{stem}.{digest}{ext}"
+    hashed_path = os.path.join(DIST_DIR, hashed_name)
+
+    relative_path = f"dist/{hashed_name}"
+
+    write_atomic(hashed_path, data)
+    etags[relative_path] = etag(data)
+    # mtime=0 keeps the gzip output byte-identical across builds
+    gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+    write_atomic(hashed_path + ".gz", gzipped)
+    etags[relative_path + ".gz"] = etag(gzipped)
+    sizes = f"{len(data):,} B, gzip {len(gzipped):,} B"
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        write_atomic(hashed_path + ".br", compressed)
+        etags[relative_path + ".br"] = etag(compressed)
+        sizes += f", brotli {len(compressed):,} B"
+    print(f"{name} -> {relative_path} ({sizes})")
+    return relative_path
+
+
+def prune(keep: List[str]) -> None:
+    """
+    Delete hashed files that no manifest generation in ``keep`` refers to.
+
+    Args:
+        keep: Hashed paths relative to static/ that must stay
+    """
+    keep_names = {os.path.basename(path) for path in keep}
+    for entry in os.scandir(DIST_DIR):
+        if entry.name == os.path.basename(MANIFEST_PATH) or entry.name.startswith(".tmp-"):
+            continue
+        base = entry.name
+        for suffix in (".gz", ".br"):
+            if base.endswith(suffix):
+                base = base[: -len(suffix)]
+        if base not in keep_names:
+            os.unlink(entry.path)
+
+
+def load_manifest() -> Dict[str, str]:
+    """Return the current manifest's asset paths, or none if there is no manifest."""
+    try:
+        with open(MANIFEST_PATH, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # Manifests from before ETags were recorded map names to paths directly
+    return data.get("assets", data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-bundle", action="store_true", help="skip esbuild and fingerprint the existing bundle")
+    args = parser.parse_args()
+
+    if not args.no_bundle:
+        bundle()
+    if brotli is None:
+        print("brotli is not installed; writing gzip variants only", file=sys.stderr)
+
+    os.makedirs(DIST_DIR, exist_ok=True)
+    previous = load_manifest()
+    etags: Dict[str, str] = {}
+    assets = {name: fingerprint(name, etags) for name in ASSETS}
+    # Keep the previous build's files so pages rendered before the deploy still load
+    prune(list(assets.values()) + list(previous.values()))
+    manifest = {"assets": assets, "etags": etags}
+    write_atomic(MANIFEST_PATH, json.dumps(manifest, indent=2, sort_keys=True).encode())
+    print(f"Wrote {os.path.relpath(MANIFEST_PATH, BASE_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
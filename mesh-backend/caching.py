@@ -0,0 +1,277 @@
+"""
+Caching Utilities
+
+In-process caches that sit in front of Mesh API calls.
+
+``ReferenceCache`` holds slow-changing reference data (such as the list of
+transfer networks). It serves fresh values from memory, revalidates stale
+values in the background, collapses concurrent misses into a single upstream
+call and keeps serving the last good value while Mesh returns errors.
+
+``TTLCache`` is a bounded LRU cache for short-lived per-user data (such as
+holdings). Concurrent lookups of the same key share one upstream call.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Cache Status Values ---
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+CACHE_STALE = "stale"
+
+
+class ReferenceCache:
+    """Single-value stale-while-revalidate cache for reference data."""
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        stale_ttl: float,
+    ):
+        """
+        Args:
+            name: Cache name used in logs and operator stats
+            loader: Coroutine function that fetches the value from upstream
+            ttl: Seconds a loaded value is served as fresh
+            stale_ttl: Further seconds a value is served while it revalidates
+                in the background; older values are reloaded inline
+        """
+        self.name = name
+        self._loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._value: Any = None
+        self._loaded_at: Optional[float] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._stats = {"hits": 0, "misses": 0, "stale_hits": 0, "refreshes": 0, "errors": 0}
+        self._last_error: Optional[str] = None
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the cached value was loaded, or None if empty."""
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    async def get(self) -> Any:
+        """
+        Return the cached value, loading or revalidating it as needed.
+
+        Returns:
+            Any: The cached value
+
+        Raises:
+            Exception: Whatever the loader raised, if no value has ever been loaded
+        """
+        value, _ = await self.get_with_status()
+        return value
+
+    async def get_with_status(self) -> Tuple[Any, str]:
+        """
+        Return the cached value together with how it was served.
+
+        Returns:
+            Tuple[Any, str]: The value and one of ``hit``, ``stale`` or ``miss``
+
+        Raises:
+            Exception: Whatever the loader raised, if no value has ever been loaded
+        """
+        age = self.age
+        if age is not None and age < self.ttl:
+            self._stats["hits"] += 1
+            return self._value, CACHE_HIT
+
+        if age is not None and age < self.ttl + self.stale_ttl:
+            self._stats["stale_hits"] += 1
+            self._start_refresh()
+            return self._value, CACHE_STALE
+
+        self._stats["misses"] += 1
+        try:
+            return await self._refresh_shared(), CACHE_MISS
+        except Exception:
+            if self._loaded_at is None:
+                raise
+            # Mesh is failing: keep serving the last good value
+            return self._value, CACHE_STALE
+
+    async def refresh(self) -> Any:
+        """
+        Force a reload from upstream, joining any refresh already in flight.
+
+        Returns:
+            Any: The freshly loaded value
+
+        Raises:
+            Exception: Whatever the loader raised
+        """
+        return await self._refresh_shared()
+
+    def invalidate(self) -> None:
+        """Drop the cached value so the next read reloads it."""
+        self._value = None
+        self._loaded_at = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache counters and the age of the cached value.
+
+        Returns:
+            Dict[str, Any]: Hit/miss/refresh counters, value age and last error
+        """
+        return {
+            "name": self.name,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "age_seconds": self.age,
+            "refreshing": self._inflight is not None,
+            "last_error": self._last_error,
+            **self._stats,
+        }
+
+    def _start_refresh(self) -> None:
+        if self._inflight is None:
+            future = asyncio.ensure_future(self._refresh_shared())
+            # Errors are recorded in _load; don't warn about an unretrieved exception
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    async def _refresh_shared(self) -> Any:
+        # Single flight: every caller awaits the same upstream load
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._load())
+        return await asyncio.shield(self._inflight)
+
+    async def _load(self) -> Any:
+        self._stats["refreshes"] += 1
+        try:
+            value = await self._loader()
+        except Exception as e:
+            self._stats["errors"] += 1
+            self._last_error = str(e)
+            logger.warning("Refresh of %s cache failed: %s", self.name, e)
+            raise
+        finally:
+            self._inflight = None
+        self._value = value
+        self._loaded_at = time.monotonic()
+        self._last_error = None
+        return value
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry expiry and in-flight request coalescing."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        """
+        Args:
+            name: Cache name used in logs and operator stats
+            maxsize: Maximum number of entries; least recently used are evicted
+            ttl: Seconds an entry is served before it is reloaded
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "invalidations": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, str]:
+        """
+        Return the cached value for a key, loading it on a miss.
+
+        Concurrent misses for the same key await a single loader call.
+        Loader errors are propagated to every waiter and never cached.
+
+        Args:
+            key: Cache key
+            loader: Coroutine function that fetches the value from upstream
+
+        Returns:
+            Tuple[Any, str]: The value and ``hit`` or ``miss``
+
+        Raises:
+            Exception: Whatever the loader raised
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return value, CACHE_HIT
+            del self._entries[key]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self._stats["coalesced"] += 1
+        else:
+            self._stats["misses"] += 1
+            future = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = future
+        return await asyncio.shield(future), CACHE_MISS
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Drop a key, including any load still in flight for it.
+
+        Args:
+            key: Cache key to drop
+        """
+        self._stats["invalidations"] += 1
+        self._entries.pop(key, None)
+        # Waiters on an in-flight load still get its result, but it isn't stored
+        self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache occupancy and counters.
+
+        Returns:
+            Dict[str, Any]: Size, limits and hit/miss/eviction counters
+        """
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "inflight": len(self._inflight),
+            **self._stats,
+        }
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        try:
+            value = await loader()
+        finally:
+            current = self._inflight.get(key)
+            if current is not None and current is future:
+                del self._inflight[key]
+        if current is not None and current is future:
+            self._store(key, value)
+        return value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
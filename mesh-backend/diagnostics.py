@@ -0,0 +1,282 @@
+"""
+Runtime Diagnostics
+
+Tools for finding out what is slowing down a live worker.
+
+``LoopLagMonitor`` measures how late the event loop wakes a periodic task.
+When the loop stays blocked past a threshold, a watchdog thread captures the
+stack of the code holding it, so each recorded stall names its culprit.
+
+``SamplingProfiler`` runs a time-boxed profile of the event loop thread. The
+CPU profile samples the loop thread's stack at a fixed interval and returns
+folded stacks (one ``frame;frame;frame count`` line per stack), which
+flamegraph.pl, speedscope and similar tools read directly. The memory profile
+diffs two ``tracemalloc`` snapshots taken at the start and end of the window.
+
+Both are off unless enabled in settings. The monitor costs one short timer
+per interval plus an idle thread. The profiler only runs while a profile is
+requested.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from types import FrameType
+from typing import Any, Deque, Dict, List, Optional
+
+# --- Local Imports ---
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# --- Metrics ---
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran the lag monitor's timer",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = REGISTRY.counter("event_loop_stalls_total", "Event loop stalls longer than the stall threshold")
+
+# Leaf frames that mean the loop thread was idle, waiting for I/O
+IDLE_FRAMES = {("selectors.py", "select"), ("selectors.py", "poll")}
+
+
+def frame_label(frame: FrameType) -> str:
+    """Return ``module:function`` for a stack frame."""
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def stack_labels(frame: Optional[FrameType], limit: int = 64) -> List[str]:
+    """
+    Return the labels of a stack, outermost first.
+
+    Args:
+        frame: Innermost frame
+        limit: Maximum number of frames
+
+    Returns:
+        List[str]: ``module:function`` labels from the root to ``frame``
+    """
+    labels = []
+    while frame is not None and len(labels) < limit:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def is_idle(frame: Optional[FrameType]) -> bool:
+    """Whether a thread's innermost frame is the event loop waiting for I/O."""
+    if frame is None:
+        return True
+    filename = frame.f_code.co_filename.rsplit("/", 1)[-1]
+    return (filename, frame.f_code.co_name) in IDLE_FRAMES
+
+
+class LoopLagMonitor:
+    """Records event loop lag and the stacks of code that blocked the loop."""
+
+    def __init__(self, interval: float, stall_threshold: float, max_stalls: int = 50):
+        """
+        Args:
+            interval: Seconds between lag measurements
+            stall_threshold: Lag in seconds that counts as a stall and
+                triggers a stack capture
+            max_stalls: Number of recent stalls kept
+        """
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=max_stalls)
+        self.max_lag = 0.0
+        self._heartbeat = time.monotonic()
+        self._captured: Optional[List[str]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    async def start(self) -> None:
+        """Start the lag timer and the watchdog thread."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info("Loop lag monitor started (interval=%ss, stall threshold=%ss)", self.interval, self.stall_threshold)
+
+    async def stop(self) -> None:
+        """Stop the lag timer and the watchdog thread."""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.interval * 2)
+            self._watchdog = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report lag and the most recent stalls.
+
+        Returns:
+            Dict[str, Any]: Settings, worst lag seen, and stalls newest first
+        """
+        return {
+            "running": self._task is not None,
+            "interval": self.interval,
+            "stall_threshold": self.stall_threshold,
+            "max_lag": self.max_lag,
+            "stalls": list(reversed(self.stalls)),
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._heartbeat = time.monotonic()
+            LOOP_LAG_SECONDS.labels().observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.stall_threshold:
+                LOOP_STALLS.labels().inc()
+                stack, self._captured = self._captured, None
+                self.stalls.append({"at": time.time(), "lag": lag, "stack": stack})
+                logger.warning(
+                    "Event loop stalled for %.3fs in %s", lag, stack[-1] if stack else "unknown code"
+                )
+            else:
+                self._captured = None
+
+    def _watch(self) -> None:
+        # Runs in its own thread, so it can look at the loop while it is blocked
+        while not self._stopping.wait(self.interval):
+            overdue = time.monotonic() - self._heartbeat - self.interval
+            if overdue < self.stall_threshold or self._captured is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None and not is_idle(frame):
+                self._captured = stack_labels(frame)
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+class SamplingProfiler:
+    """Time-boxed CPU and memory profiles of the event loop thread."""
+
+    def __init__(self, sample_interval: float, max_seconds: float):
+        """
+        Args:
+            sample_interval: Seconds between CPU stack samples
+            max_seconds: Longest profile that may be requested
+        """
+        self.sample_interval = sample_interval
+        self.max_seconds = max_seconds
+        self._lock = asyncio.Lock()
+
+    async def cpu(self, seconds: float, include_idle: bool = False) -> Dict[str, Any]:
+        """
+        Sample the event loop thread's stack for a while.
+
+        Args:
+            seconds: Profile duration, capped at ``max_seconds``
+            include_idle: Keep samples taken while the loop waited for I/O
+
+        Returns:
+            Dict[str, Any]: Sample counts and folded stacks, heaviest first
+
+        Raises:
+            ProfilerBusy: If another profile is running
+        """
+        seconds = min(seconds, self.max_seconds)
+        async with self._exclusive():
+            loop_thread_id = threading.get_ident()
+            stacks: Counter = Counter()
+            done = threading.Event()
+            counts = {"samples": 0, "idle": 0}
+
+            def sample() -> None:
+                while not done.wait(self.sample_interval):
+                    frame = sys._current_frames().get(loop_thread_id)
+                    counts["samples"] += 1
+                    if is_idle(frame):
+                        counts["idle"] += 1
+                        if not include_idle:
+                            continue
+                    stacks[";".join(stack_labels(frame))] += 1
+
+            sampler = threading.Thread(target=sample, name="sampling-profiler", daemon=True)
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                done.set()
+                await asyncio.get_running_loop().run_in_executor(None, sampler.join)
+        folded = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+        return {"seconds": seconds, **counts, "folded": folded}
+
+    async def memory(self, seconds: float, limit: int = 25, frames: int = 10) -> Dict[str, Any]:
+        """
+        Diff tracemalloc snapshots taken at the start and end of a window.
+
+        Args:
+            seconds: Profile duration, capped at ``max_seconds``
+            limit: Number of allocation sites returned
+            frames: Stack depth recorded per allocation
+
+        Returns:
+            Dict[str, Any]: Top allocation growth by site and as folded stacks
+                weighted by bytes
+
+        Raises:
+            ProfilerBusy: If another profile is running
+        """
+        seconds = min(seconds, self.max_seconds)
+        async with self._exclusive():
+            started_here = not tracemalloc.is_tracing()
+            if started_here:
+                tracemalloc.start(frames)
+            try:
+                before = tracemalloc.take_snapshot()
+                await asyncio.sleep(seconds)
+                after = tracemalloc.take_snapshot()
+            finally:
+                if started_here:
+                    tracemalloc.stop()
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "traceback")
+        top = [stat for stat in stats if stat.size_diff > 0][:limit]
+        sites = [
+            {
+                "site": f"{stat.traceback[-1].filename}:{stat.traceback[-1].lineno}",
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+            }
+            for stat in top
+        ]
+        folded = "\n".join(
+            # tracemalloc orders frames oldest first, as folded stacks expect
+            ";".join(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback) + f" {stat.size_diff}"
+            for stat in top
+        )
+        return {"seconds": seconds, "top": sites, "folded": folded}
+
+    def _exclusive(self) -> asyncio.Lock:
+        if self._lock.locked():
+            raise ProfilerBusy("A profile is already running")
+        return self._lock
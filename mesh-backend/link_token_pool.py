@@ -0,0 +1,159 @@
+"""
+Link Token Pool
+
+Keeps a warm pool of pre-minted generic Mesh link tokens so page routes can
+render without waiting on a ``/api/v1/linktoken`` round trip.
+
+A background task refills the pool whenever it drops below the low watermark
+and tops it up to the high watermark. Tokens are discarded once they reach the
+configured maximum age, well before Mesh expires them. When the pool is empty
+a token is minted inline.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before retrying after a failed background mint
+REFILL_RETRY_DELAY = 5.0
+
+
+class LinkTokenPool:
+    """Pool of pre-minted, single-use generic link tokens."""
+
+    def __init__(
+        self,
+        mint: Callable[[], Awaitable[str]],
+        low_watermark: int,
+        high_watermark: int,
+        max_age: float,
+        refill_concurrency: int = 2,
+    ):
+        """
+        Args:
+            mint: Coroutine function that mints one generic link token
+            low_watermark: Refill starts when fewer tokens than this are pooled
+            high_watermark: Number of tokens a refill tops the pool up to
+            max_age: Seconds after which a pooled token is discarded
+            refill_concurrency: Maximum concurrent mint calls during a refill
+        """
+        self._mint = mint
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.max_age = max_age
+        self.refill_concurrency = max(1, refill_concurrency)
+        self._tokens: Deque[Tuple[float, str]] = deque()
+        self._wakeup = asyncio.Event()
+        self._minted = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"hits": 0, "misses": 0, "minted": 0, "expired": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the pool keeps any tokens at all."""
+        return self.high_watermark > 0
+
+    async def start(self) -> None:
+        """Start the background refill task."""
+        if self.enabled and self._task is None:
+            self._wakeup.set()
+            self._task = asyncio.create_task(self._refill_loop(), name="link-token-pool")
+
+    async def stop(self) -> None:
+        """Stop the background refill task and drop all pooled tokens."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._tokens.clear()
+
+    async def acquire(self) -> str:
+        """
+        Take a fresh link token from the pool, minting one inline if it is empty.
+
+        Returns:
+            str: A link token that has not been handed out before
+
+        Raises:
+            HTTPException: If the pool is empty and the inline mint fails
+        """
+        self._discard_expired()
+        if self._tokens:
+            _, token = self._tokens.popleft()
+            self._stats["hits"] += 1
+            if len(self._tokens) < self.low_watermark:
+                self._wakeup.set()
+            return token
+
+        self._stats["misses"] += 1
+        self._wakeup.set()
+        return await self._mint()
+
+    async def wait_for_token(self) -> None:
+        """Wait until the pool's first refill has minted a token."""
+        await self._minted.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report pool occupancy and counters.
+
+        Returns:
+            Dict[str, Any]: Pool size, oldest token age and hit/miss/mint counters
+        """
+        now = time.monotonic()
+        oldest = now - self._tokens[0][0] if self._tokens else None
+        return {
+            "size": len(self._tokens),
+            "low_watermark": self.low_watermark,
+            "high_watermark": self.high_watermark,
+            "oldest_age_seconds": oldest,
+            **self._stats,
+        }
+
+    def _discard_expired(self) -> None:
+        # Tokens are appended in mint order, so the oldest are always on the left
+        cutoff = time.monotonic() - self.max_age
+        while self._tokens and self._tokens[0][0] <= cutoff:
+            self._tokens.popleft()
+            self._stats["expired"] += 1
+
+    async def _mint_one(self) -> None:
+        token = await self._mint()
+        self._tokens.append((time.monotonic(), token))
+        self._stats["minted"] += 1
+        self._minted.set()
+
+    async def _refill(self) -> None:
+        while len(self._tokens) < self.high_watermark:
+            batch = min(self.refill_concurrency, self.high_watermark - len(self._tokens))
+            results = await asyncio.gather(
+                *(self._mint_one() for _ in range(batch)), return_exceptions=True
+            )
+            errors = [r for r in results if isinstance(r, Exception)]
+            if errors:
+                self._stats["errors"] += len(errors)
+                logger.warning("Link token pool refill failed: %s", errors[0])
+                await asyncio.sleep(REFILL_RETRY_DELAY)
+                return
+
+    async def _refill_loop(self) -> None:
+        # Wake at least once per max_age/2 so stale tokens are replaced
+        # even when no requests are arriving.
+        check_interval = max(1.0, self.max_age / 2)
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._discard_expired()
+            if len(self._tokens) < self.low_watermark or not self._tokens:
+                await self._refill()
@@ -9,40 +9,79 @@ authentication tokens, transfer previews, and transfer execution.
 """
 
 # --- Standard Library Imports ---
+import time
+# Taken before the imports below, so the reported import time includes them
+IMPORT_STARTED = time.perf_counter()
+import asyncio
 import os
 import logging
 import uuid
+import math
 import base64
 import json
-from typing import Optional, Dict, Any
+import hmac
+import hashlib
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Tuple
 
 # --- Third-Party Imports ---
-import requests
-from fastapi import Body, FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
+import httpx
+from fastapi import Body, Depends, FastAPI, Header, Request, Response, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
-# --- Logging Configuration ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# --- Local Imports ---
+from admission import AdmissionController, client_address, parse_route_limits, parse_trusted_proxies, retry_after_header
+from caching import CACHE_HIT, ReferenceCache, TTLCache
+from diagnostics import LoopLagMonitor, ProfilerBusy, SamplingProfiler
+from link_token_pool import LinkTokenPool
+from mesh_client import MeshClient
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from page_cache import FileConfigCache, LazyTemplates, RenderCache
+from pubsub import PubSub, TooManyTopics
+from reconciler import TransferReconciler
+from resilience import CircuitOpenError
+from state_backends import create_backend
+from state_journal import JournaledBackend
+from state_store import StateStore
+from startup import StartupTracker
+from static_assets import AssetManifest, PrecompressedStaticFiles
+from structured_logging import CORRELATION_HEADER, LogPipeline, correlation_id, new_correlation_id, parse_sample_rates
+from upstream_json import FastJSONResponse, UpstreamJSON, dumps, passthrough_response
+from upstream_scheduler import (
+    EXECUTE, HOLDINGS, LINK_TOKEN, NETWORKS, PREVIEW, RECONCILE, UpstreamOverloaded, UpstreamScheduler, parse_reservations
 )
+from waiters import KeyedWaiters, WaiterLimitExceeded
+from webhooks import WEBHOOK_DELIVERIES, WebhookIngestor, WebhookRejected, WebhookVerifier
+
 logger = logging.getLogger(__name__)
 
 # --- Constants ---
 DEFAULT_TIMEOUT = 10
 PENDING_STATUS = "pending"
+COMPLETE_STATUS = "complete"
 SUCCESS_STATUS = "success"
 FAILED_STATUS = "failed"
+# Mesh transfer statuses, mapped onto the statuses kept in transfer_storage
+MESH_TRANSFER_STATUSES = {
+    "succeeded": SUCCESS_STATUS,
+    "success": SUCCESS_STATUS,
+    "completed": SUCCESS_STATUS,
+    "failed": FAILED_STATUS,
+    "rejected": FAILED_STATUS,
+    "canceled": FAILED_STATUS,
+    "cancelled": FAILED_STATUS,
+    "expired": FAILED_STATUS,
+}
 
 # --- Settings and Configuration ---
+# Must run before Settings is defined: its defaults read the environment
+load_dotenv()
+
 class Settings(BaseSettings):
     """Application configuration settings loaded from environment variables."""
-    load_dotenv()
     client_id: str = os.getenv("MESH_CLIENT_ID")
     sandbox: int = os.getenv("SANDBOX")
     client_secret: str = os.getenv("MESH_API_SECRET") if os.getenv("SANDBOX") == "1" else os.getenv("MESH_PROD_API_SECRET")
@@ -52,11 +91,342 @@ class Settings(BaseSettings):
     coinbase_network_id: str = "aa883b03-120d-477c-a588-37c2afd3ca71"
     rainbow_wallet_address: str = os.getenv("RAINBOW_WALLET_ADDRESS")
     coinbase_wallet_address: str = os.getenv("COINBASE_WALLET_ADDRESS")
+    mesh_max_connections: int = 200
+    mesh_max_keepalive_connections: int = 50
+    mesh_keepalive_expiry: float = 30.0
+    mesh_max_connections_per_host: int = 100
+    mesh_retry_attempts: int = 3
+    mesh_retry_base_delay: float = 0.1
+    mesh_retry_max_delay: float = 2.0
+    mesh_breaker_failure_threshold: int = 5
+    mesh_breaker_reset_timeout: float = 30.0
+    mesh_hedge_enabled: bool = False
+    mesh_hedge_min_delay: float = 0.05
+    upstream_max_concurrency: int = 64
+    upstream_max_queue: int = 256
+    upstream_queue_timeout: float = 2.0
+    upstream_reserved_slots: str = "execute=8,link_token=4"
+    upstream_starvation_timeout: float = 0.5
+    upstream_shed_retry_after: float = 1.0
+    admission_enabled: bool = False
+    admission_client_rate: float = 20.0
+    admission_client_burst: float = 40.0
+    admission_route_limits: str = "/api/get_token/{request_id}=2:10,/api/get_linktoken=0.5:5"
+    admission_exempt_paths: str = "/health,/static,/metrics,/api/mesh/webhook"
+    admission_max_clients: int = 100000
+    admission_trusted_proxies: str = ""
+    link_token_pool_low_watermark: int = 2
+    link_token_pool_high_watermark: int = 5
+    link_token_pool_max_age: float = 300.0
+    networks_cache_ttl: float = 3600.0
+    networks_cache_stale_ttl: float = 86400.0
+    holdings_cache_ttl: float = 15.0
+    holdings_cache_max_entries: int = 10000
+    execute_dedup_ttl: float = 600.0
+    execute_dedup_max_entries: int = 10000
+    state_pending_ttl: float = 1800.0
+    state_complete_ttl: float = 3600.0
+    state_failed_ttl: float = 3600.0
+    state_max_entries: int = 100000
+    state_sweep_interval: float = 1.0
+    state_sweep_batch: int = 1000
+    state_backend: str = "memory"
+    state_backend_path: str = ""
+    state_flush_batch: int = 256
+    state_busy_timeout: float = 0.05
+    state_poll_interval: float = 0.25
+    state_journal_dir: str = ""
+    state_journal_fsync_interval: float = 0.05
+    state_snapshot_interval: float = 300.0
+    state_snapshot_max_records: int = 100000
+    token_wait_max: float = 30.0
+    token_stream_timeout: float = 300.0
+    token_stream_heartbeat: float = 15.0
+    token_max_waiters: int = 10000
+    ws_heartbeat_interval: float = 20.0
+    ws_send_timeout: float = 10.0
+    ws_max_subscriptions: int = 50
+    preview_batch_max_items: int = 100
+    preview_batch_concurrency: int = 8
+    portfolio_max_accounts: int = 20
+    portfolio_account_timeout: float = 5.0
+    admin_token: Optional[str] = None
+    dev_mode: bool = False
+    metrics_enabled: bool = True
+    loop_monitor_enabled: bool = False
+    loop_monitor_interval: float = 0.1
+    loop_stall_threshold: float = 0.25
+    loop_monitor_max_stalls: int = 50
+    profiler_enabled: bool = False
+    profiler_sample_interval: float = 0.005
+    profiler_max_seconds: float = 30.0
+    warmup_timeout: float = 10.0
+    warmup_connections: int = 2
+    warmup_link_token: bool = False
+    warmup_retry_interval: float = 5.0
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_queue_size: int = 10000
+    log_sample_rates: str = ""
+    mesh_webhook_secret: Optional[str] = None
+    mesh_webhook_signature_header: str = "X-Mesh-Signature-256"
+    mesh_webhook_tolerance: float = 300.0
+    mesh_webhook_max_body: int = 65536
+    mesh_webhook_queue_size: int = 1000
+    mesh_webhook_batch_size: int = 100
+    mesh_webhook_batch_interval: float = 0.05
+    mesh_transfer_status_path: str = "/api/v1/transfers/managed/mesh"
+    reconcile_enabled: bool = True
+    reconcile_stale_after: float = 120.0
+    reconcile_interval: float = 5.0
+    reconcile_batch_size: int = 50
+    reconcile_rate: float = 5.0
+    reconcile_concurrency: int = 5
+    reconcile_max_backoff: float = 600.0
 
 settings = Settings()
-app = FastAPI(title="Mesh Sandbox Integration")
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+
+# --- Logging Configuration ---
+log_pipeline = LogPipeline(
+    level=settings.log_level,
+    fmt=settings.log_format,
+    queue_size=settings.log_queue_size,
+    sample_rates=parse_sample_rates(settings.log_sample_rates),
+    capture=("uvicorn", "uvicorn.access"),
+)
+log_pipeline.start()
+REGISTRY.gauge_callback(
+    "log_records_dropped", "Log records dropped by INFO sampling or a full log queue", ("reason",), log_pipeline.samples
+)
+REGISTRY.gauge_callback(
+    "log_records_written_directly",
+    "Warnings and errors written on the calling thread because the log queue stayed full",
+    (),
+    lambda: [((), log_pipeline.handler.written_directly)],
+)
+
+mesh_client = MeshClient(
+    timeout=DEFAULT_TIMEOUT,
+    max_connections=settings.mesh_max_connections,
+    max_keepalive_connections=settings.mesh_max_keepalive_connections,
+    keepalive_expiry=settings.mesh_keepalive_expiry,
+    max_connections_per_host=settings.mesh_max_connections_per_host,
+    retry_attempts=settings.mesh_retry_attempts,
+    retry_base_delay=settings.mesh_retry_base_delay,
+    retry_max_delay=settings.mesh_retry_max_delay,
+    breaker_failure_threshold=settings.mesh_breaker_failure_threshold,
+    breaker_reset_timeout=settings.mesh_breaker_reset_timeout,
+    hedge=settings.mesh_hedge_enabled,
+    hedge_min_delay=settings.mesh_hedge_min_delay,
+    scheduler=UpstreamScheduler(
+        max_concurrency=settings.upstream_max_concurrency,
+        max_queue=settings.upstream_max_queue,
+        queue_timeout=settings.upstream_queue_timeout,
+        reserved=parse_reservations(settings.upstream_reserved_slots),
+        starvation_timeout=settings.upstream_starvation_timeout,
+        retry_after=settings.upstream_shed_retry_after,
+    ),
+)
+REGISTRY.gauge_callback(
+    "upstream_calls_active", "Mesh calls holding an upstream slot", (), lambda: [((), mesh_client.scheduler.active)]
+)
+REGISTRY.gauge_callback(
+    "upstream_calls_queued", "Mesh calls waiting for an upstream slot, by priority class", ("priority",),
+    mesh_client.scheduler.samples,
+)
+
+admission = AdmissionController(
+    client_rate=settings.admission_client_rate,
+    client_burst=settings.admission_client_burst,
+    route_limits=parse_route_limits(settings.admission_route_limits),
+    max_clients=settings.admission_max_clients,
+    exempt_prefixes=tuple(filter(None, settings.admission_exempt_paths.split(","))),
+)
+trusted_proxies = parse_trusted_proxies(settings.admission_trusted_proxies)
+
+loop_monitor = LoopLagMonitor(
+    interval=settings.loop_monitor_interval,
+    stall_threshold=settings.loop_stall_threshold,
+    max_stalls=settings.loop_monitor_max_stalls,
+)
+profiler = SamplingProfiler(
+    sample_interval=settings.profiler_sample_interval,
+    max_seconds=settings.profiler_max_seconds,
+)
+
+startup = StartupTracker()
+REGISTRY.gauge_callback(
+    "app_startup_phase_seconds", "Seconds spent in each start-up phase", ("phase",), startup.samples
+)
+REGISTRY.gauge_callback(
+    "app_ready", "1 once warm-up has finished, until shutdown begins", (), lambda: [((), int(startup.ready))]
+)
+
+async def warm_connections() -> None:
+    """Open pooled connections to Mesh before the first request needs one."""
+    opened = await mesh_client.warm_up(settings.mesh_api_base, settings.warmup_connections)
+    logger.info("Opened %s warm connection(s) to %s", opened, settings.mesh_api_base)
+
+async def validate_upstream() -> None:
+    """
+    Check that an authenticated Mesh call works, retrying until it does.
+    
+    The check loads the networks cache, so the first /api/get_networks is a
+    hit. Readiness waits for it: a process that can't authenticate to Mesh
+    would only fail the requests it is sent.
+    """
+    while True:
+        await startup.run("validation", networks_cache.refresh(), settings.warmup_timeout, required=True)
+        if startup.succeeded("validation"):
+            return
+        await asyncio.sleep(settings.warmup_retry_interval)
+
+async def warm_up() -> None:
+    """Run the warm-up steps concurrently, then mark the app ready."""
+    # Build the environment here, so the worker thread only compiles
+    templates.load()
+    steps = [
+        startup.run("templates", asyncio.to_thread(templates.precompile), settings.warmup_timeout),
+        startup.run("connections", warm_connections(), settings.warmup_timeout),
+        validate_upstream(),
+    ]
+    if settings.warmup_link_token and link_token_pool.enabled:
+        steps.append(startup.run("link_token", link_token_pool.wait_for_token(), settings.warmup_timeout))
+    await asyncio.gather(*steps)
+    startup.mark_ready()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open shared resources on startup and release them on shutdown.
+    
+    Everything a request needs is opened before the server accepts
+    connections; warm-up then runs in the background until readiness.
+    """
+    startup.begin()
+    started = time.perf_counter()
+    if settings.loop_monitor_enabled:
+        await loop_monitor.start()
+    await mesh_client.start()
+    await link_token_pool.start()
+    await token_storage.start()
+    await transfer_storage.start()
+    await webhook_ingestor.start()
+    if settings.reconcile_enabled:
+        await transfer_reconciler.start()
+    startup.record("core", time.perf_counter() - started)
+    warm_up_task = asyncio.create_task(warm_up(), name="warm-up")
+    try:
+        yield
+    finally:
+        startup.mark_stopping()
+        warm_up_task.cancel()
+        try:
+            await warm_up_task
+        except asyncio.CancelledError:
+            pass
+        await transfer_reconciler.stop()
+        await webhook_ingestor.stop()
+        await transfer_storage.stop()
+        await token_storage.stop()
+        await link_token_pool.stop()
+        await mesh_client.close()
+        await loop_monitor.stop()
+
+app = FastAPI(title="Mesh Sandbox Integration", lifespan=lifespan)
+
+@app.middleware("http")
+async def flush_shared_state(request: Request, call_next):
+    """Commit buffered state writes before the response goes out, so other workers see them."""
+    response = await call_next(request)
+    await token_storage.commit()
+    await transfer_storage.commit()
+    return response
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Turn away clients over their request rate before any work is done."""
+    if not settings.admission_enabled:
+        return await call_next(request)
+    peer = request.client.host if request.client else "unknown"
+    client = client_address(peer, request.headers.get("x-forwarded-for"), trusted_proxies)
+    rejected = admission.check(client, request.url.path)
+    if rejected is not None:
+        reason, wait = rejected
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests", "reason": reason},
+            headers={"Retry-After": retry_after_header(wait)},
+        )
+    return await call_next(request)
+
+# --- Metrics ---
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests handled, by route template, method and status", ("route", "method", "status")
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to produce the response headers, by route template", ("route", "method")
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "HTTP requests being handled")
+
+def route_label(request: Request, status_code: int) -> str:
+    """
+    Return the route template for a request, keeping metric label cardinality bounded.
+    
+    Args:
+        request: The handled request
+        status_code: Response status
+        
+    Returns:
+        str: The route path template (e.g. ``/api/get_token/{request_id}``),
+            the mount path for mounted apps, or ``unmatched``
+    """
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    if status_code != 404 and request.scope.get("root_path"):
+        return request.scope["root_path"]
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and time them per route template."""
+    if not settings.metrics_enabled:
+        return await call_next(request)
+    HTTP_REQUESTS_IN_FLIGHT.labels().inc()
+    started = asyncio.get_running_loop().time()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_REQUESTS_IN_FLIGHT.labels().dec()
+        route = route_label(request, status_code)
+        HTTP_REQUEST_SECONDS.labels(route, request.method).observe(asyncio.get_running_loop().time() - started)
+        HTTP_REQUESTS.labels(route, request.method, str(status_code)).inc()
+
+@app.middleware("http")
+async def correlate_request(request: Request, call_next):
+    """Tag the request's log lines and Mesh calls with its correlation ID, and echo it back."""
+    request_correlation_id = new_correlation_id(request.headers.get(CORRELATION_HEADER))
+    token = correlation_id.set(request_correlation_id)
+    try:
+        response = await call_next(request)
+    finally:
+        correlation_id.reset(token)
+    response.headers[CORRELATION_HEADER] = request_correlation_id
+    return response
+asset_manifest = AssetManifest("static", os.path.join("static", "dist", "manifest.json"))
+app.mount("/static", PrecompressedStaticFiles(directory="static", manifest=asset_manifest), name="static")
+templates = LazyTemplates("templates", globals={"asset_path": asset_manifest.resolve})
+receiving_addresses_config = FileConfigCache("receiving_addresses.json", default={})
+page_cache = RenderCache(
+    templates,
+    "templates",
+    watch_templates=settings.dev_mode,
+    dependents=(receiving_addresses_config,),
+)
 
 # --- Data Models ---
 class TokenResponse(BaseModel):
@@ -83,25 +453,217 @@ class TransferResult(BaseModel):
     status: str  # "success" | "failed"
     tx_hash: Optional[str] = None
 
+class TransferPreviewSpec(BaseModel):
+    """One candidate transfer in a batch preview request"""
+    auth_token: str
+    from_type: str
+    to_type: str
+    to_address: str
+    amount: float = Field(..., gt=0)
+    symbol: str
+    address_tag: Optional[str] = None
+    network_id: Optional[str] = None
+
+class BatchPreviewRequest(BaseModel):
+    """Payload model for batch transfer previews"""
+    previews: List[TransferPreviewSpec] = Field(..., min_length=1)
+
+class AccountHandle(BaseModel):
+    """One connected account in a portfolio request"""
+    auth_token: str
+    from_type: str
+    label: Optional[str] = None
+
+class PortfolioRequest(BaseModel):
+    """Payload model for portfolio aggregation"""
+    accounts: List[AccountHandle] = Field(..., min_length=1)
+
 # --- In-Memory Storage ---
-token_storage: Dict[str, Dict[str, Any]] = {}
-transfer_storage: Dict[str, Dict[str, Any]] = {}
+STATE_TTLS = {
+    PENDING_STATUS: settings.state_pending_ttl,
+    COMPLETE_STATUS: settings.state_complete_ttl,
+    SUCCESS_STATUS: settings.state_complete_ttl,
+    FAILED_STATUS: settings.state_failed_ttl,
+}
+
+def create_state_store(name: str, fields: tuple) -> StateStore:
+    """
+    Build a state store on the backend selected by ``settings.state_backend``.
+    
+    With ``state_journal_dir`` set, the in-memory backend journals its writes
+    there so the store survives restarts. Shared backends already persist
+    outside the process and are not journaled.
+    
+    Args:
+        name: Store name, also used as the backend table or directory name
+        fields: Field names of a record
+        
+    Returns:
+        StateStore: The configured store
+    """
+    backend = create_backend(
+        kind=settings.state_backend,
+        name=name,
+        fields=fields,
+        max_entries=settings.state_max_entries,
+        sweep_batch=settings.state_sweep_batch,
+        path=settings.state_backend_path,
+        flush_batch=settings.state_flush_batch,
+        busy_timeout=settings.state_busy_timeout,
+    )
+    if settings.state_journal_dir and settings.state_backend == "memory":
+        backend = JournaledBackend(
+            backend,
+            directory=settings.state_journal_dir,
+            name=name,
+            fsync_interval=settings.state_journal_fsync_interval,
+            snapshot_interval=settings.state_snapshot_interval,
+            snapshot_max_records=settings.state_snapshot_max_records,
+        )
+    return StateStore(
+        name=name,
+        fields=fields,
+        ttls=STATE_TTLS,
+        default_ttl=settings.state_complete_ttl,
+        max_entries=settings.state_max_entries,
+        sweep_interval=settings.state_sweep_interval,
+        sweep_batch=settings.state_sweep_batch,
+        backend=backend,
+        poll_interval=settings.state_poll_interval,
+    )
+
+token_storage = create_state_store("token_storage", ("status", "token", "broker_type"))
+transfer_storage = create_state_store("transfer_storage", ("status", "amount", "tx_hash"))
+token_waiters = KeyedWaiters(max_waiters=settings.token_max_waiters)
+# Wake long-poll and event-stream clients whenever a token entry is written
+token_storage.add_listener(lambda request_id, _: token_waiters.notify(request_id))
+transfer_updates = PubSub()
+
+def publish_transfer_update(request_id: str, transfer: Dict[str, Any]) -> None:
+    """
+    Push a transfer_storage write to WebSocket subscribers of that request ID.
+    
+    Args:
+        request_id: Transfer request ID
+        transfer: The transfer entry as written
+    """
+    transfer_updates.publish(request_id, {"type": "status", "request_id": request_id, **transfer})
+
+transfer_storage.add_listener(publish_transfer_update)
+
+REGISTRY.gauge_callback(
+    "state_store_entries",
+    "Entries held by each state store",
+    ("store",),
+    lambda: [((store.name,), len(store)) for store in (token_storage, transfer_storage)],
+)
+REGISTRY.gauge_callback(
+    "token_waiters", "Long-poll and event-stream clients waiting for a token", (), lambda: [((), len(token_waiters))]
+)
+
+def apply_transfer_events(events: List[Dict[str, Any]]) -> int:
+    """
+    Write a batch of Mesh transfer events to transfer_storage.
+    
+    Events are matched to transfers by ``clientTransactionId``, which is the
+    request ID set when the transfer's link token was created. Within a batch
+    only the newest event per transfer is written. Events for unknown
+    transfers and non-final statuses are skipped.
+    
+    Args:
+        events: Verified, normalized webhook events
+        
+    Returns:
+        int: Number of transfer_storage entries changed
+    """
+    latest: Dict[str, Dict[str, Any]] = {}
+    for event in events:
+        request_id = event["client_transaction_id"]
+        status = MESH_TRANSFER_STATUSES.get(str(event["status"]).lower())
+        if not request_id or status is None:
+            continue
+        current = latest.get(request_id)
+        if current is None or event["timestamp"] >= current["timestamp"]:
+            latest[request_id] = {**event, "status": status}
+
+    updated = 0
+    for request_id, event in latest.items():
+        transfer = transfer_storage.get(request_id)
+        if transfer is None:
+            continue
+        tx_hash = event["tx_hash"] or transfer.get("tx_hash")
+        if transfer["status"] == event["status"] and transfer.get("tx_hash") == tx_hash:
+            continue
+        transfer_storage.patch(request_id, status=event["status"], tx_hash=tx_hash)
+        updated += 1
+    # Shared backends commit these at the end of this event-loop iteration
+    return updated
+
+webhook_verifier = (
+    WebhookVerifier(settings.mesh_webhook_secret, tolerance=settings.mesh_webhook_tolerance)
+    if settings.mesh_webhook_secret else None
+)
+webhook_ingestor = WebhookIngestor(
+    apply_transfer_events,
+    max_queue=settings.mesh_webhook_queue_size,
+    batch_size=settings.mesh_webhook_batch_size,
+    batch_interval=settings.mesh_webhook_batch_interval,
+)
+REGISTRY.gauge_callback(
+    "webhook_queue_depth", "Mesh webhook events waiting to be applied", (), lambda: [((), len(webhook_ingestor))]
+)
 
 # --- Mesh API Utility Functions ---
 def get_mesh_headers() -> Dict[str, str]:
     """
     Returns the standard headers required for Mesh API calls.
     
+    Inside a request, the request's correlation ID is passed on as well.
+    
     Returns:
-        Dict[str, str]: Headers dictionary with client ID, secret, and content type
+        Dict[str, str]: Headers dictionary with client ID, secret, content type
+            and, inside a request, the correlation ID
     """
-    return {
+    headers = {
         "X-Client-Id": settings.client_id,
         "X-Client-Secret": settings.client_secret,
         "Content-Type": "application/json"
     }
+    request_correlation_id = correlation_id.get()
+    if request_correlation_id:
+        headers[CORRELATION_HEADER] = request_correlation_id
+    return headers
 
-def get_link_token() -> str:
+def mesh_error(message: str, error: httpx.HTTPError) -> HTTPException:
+    """
+    Turn a failed Mesh call into the HTTPException returned to the client.
+    
+    Args:
+        message: What failed, e.g. "Holdings request failed"
+        error: The error raised by the Mesh client
+        
+    Returns:
+        HTTPException: 503 with Retry-After while the endpoint's circuit
+            breaker is open or the upstream queue is shedding calls,
+            otherwise 502
+    """
+    logger.error("%s: %s", message, error)
+    error_msg = f"{message}: {str(error)}"
+    if isinstance(error, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail=error_msg,
+            headers={"Retry-After": str(int(error.retry_after))},
+        )
+    if isinstance(error, UpstreamOverloaded):
+        return HTTPException(
+            status_code=503,
+            detail=error_msg,
+            headers={"Retry-After": retry_after_header(error.retry_after)},
+        )
+    return HTTPException(status_code=502, detail=error_msg)
+
+async def get_link_token() -> str:
     """
     Retrieve Mesh link token with enhanced error handling.
     
@@ -114,14 +676,15 @@ def get_link_token() -> str:
     headers = get_mesh_headers()
     
     try:
-        response = requests.post(
+        response = await mesh_client.post(
             f"{settings.mesh_api_base}/api/v1/linktoken",
             headers=headers,
             json={
                 "userId": "sandbox_user",
                 "restrictMultipleAccounts": True,
             },
-            timeout=DEFAULT_TIMEOUT
+            retry_on_connect_only=True,
+            priority=LINK_TOKEN,
         )
         
         response.raise_for_status()
@@ -129,12 +692,10 @@ def get_link_token() -> str:
         logger.info("Successfully retrieved link token")
         
         return result['content']['linkToken']
-    except requests.RequestException as e:
-        error_msg = f"Link token request failed: {str(e)}"
-        logger.error(error_msg)
-        raise HTTPException(status_code=502, detail=error_msg)
+    except httpx.HTTPError as e:
+        raise mesh_error("Link token request failed", e)
 
-def get_transfer_preview(
+async def get_transfer_preview(
     auth_token: str, 
     from_type: str, 
     to_type: str, 
@@ -143,7 +704,7 @@ def get_transfer_preview(
     address_tag: str, 
     symbol: str, 
     network_id: str
-) -> Dict[str, Any]:
+) -> UpstreamJSON:
     """
     Get transfer preview from Mesh API.
     
@@ -158,7 +719,7 @@ def get_transfer_preview(
         network_id: Network ID for the transaction
         
     Returns:
-        Dict[str, Any]: Transfer preview data
+        UpstreamJSON: Transfer preview body, undecoded
         
     Raises:
         HTTPException: If the API call fails
@@ -179,15 +740,13 @@ def get_transfer_preview(
     headers = get_mesh_headers()
     
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=DEFAULT_TIMEOUT)
+        response = await mesh_client.post(url, json=payload, headers=headers, idempotent=True, priority=PREVIEW)
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        error_msg = f"Transfer preview request failed: {str(e)}"
-        logger.error(error_msg)
-        raise HTTPException(status_code=502, detail=error_msg)
+        return UpstreamJSON.from_response(response)
+    except httpx.HTTPError as e:
+        raise mesh_error("Transfer preview request failed", e)
 
-def execute_transfer(
+async def execute_transfer(
     auth_token: str, 
     from_type: str, 
     preview_id: str, 
@@ -220,15 +779,14 @@ def execute_transfer(
     headers = get_mesh_headers()
     
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=DEFAULT_TIMEOUT)
+        # Sent exactly once: retrying or hedging an execute could move funds twice
+        response = await mesh_client.post(url, json=payload, headers=headers, priority=EXECUTE)
         response.raise_for_status()
         return response.json()
-    except requests.RequestException as e:
-        error_msg = f"Transfer execution failed: {str(e)}"
-        logger.error(error_msg)
-        raise HTTPException(status_code=502, detail=error_msg)
+    except httpx.HTTPError as e:
+        raise mesh_error("Transfer execution failed", e)
 
-def get_holdings(auth_token: str, from_type: str) -> Dict[str, Any]:
+async def get_holdings(auth_token: str, from_type: str) -> UpstreamJSON:
     """
     Get holdings using Mesh API.
     
@@ -237,7 +795,7 @@ def get_holdings(auth_token: str, from_type: str) -> Dict[str, Any]:
         from_type: Account type
         
     Returns:
-        Dict[str, Any]: Holdings data
+        UpstreamJSON: Holdings body, undecoded
         
     Raises:
         HTTPException: If the API call fails
@@ -252,20 +810,18 @@ def get_holdings(auth_token: str, from_type: str) -> Dict[str, Any]:
     headers = get_mesh_headers()
     
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=DEFAULT_TIMEOUT)
+        response = await mesh_client.post(url, json=payload, headers=headers, idempotent=True, priority=HOLDINGS)
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        error_msg = f"Holdings request failed: {str(e)}"
-        logger.error(error_msg)
-        raise HTTPException(status_code=502, detail=error_msg)
+        return UpstreamJSON.from_response(response)
+    except httpx.HTTPError as e:
+        raise mesh_error("Holdings request failed", e)
 
-def get_networks() -> Dict[str, Any]:
+async def get_networks() -> UpstreamJSON:
     """
     Get networks using Mesh API.
     
     Returns:
-        Dict[str, Any]: Networks data
+        UpstreamJSON: Networks body, undecoded
         
     Raises:
         HTTPException: If the API call fails
@@ -274,13 +830,141 @@ def get_networks() -> Dict[str, Any]:
     headers = get_mesh_headers()
     
     try:
-        response = requests.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+        response = await mesh_client.get(url, headers=headers, idempotent=True, priority=NETWORKS)
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        error_msg = f"Networks request failed: {str(e)}"
-        logger.error(error_msg)
-        raise HTTPException(status_code=502, detail=error_msg)
+        return UpstreamJSON.from_response(response)
+    except httpx.HTTPError as e:
+        raise mesh_error("Networks request failed", e)
+
+async def get_transfer_status(request_id: str) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Look a transfer up in Mesh by the client transaction ID it was created with.
+    
+    Args:
+        request_id: Transfer request ID, sent to Mesh as ``clientTransactionId``
+        
+    Returns:
+        Optional[Tuple[str, Optional[str]]]: (status, tx_hash) once Mesh reports a final status,
+            otherwise None
+        
+    Raises:
+        httpx.HTTPError: If the API call fails
+    """
+    url = f"{settings.mesh_api_base}{settings.mesh_transfer_status_path}"
+    params = {"clientTransactionId": request_id, "count": 1}
+    response = await mesh_client.get(
+        url, params=params, headers=get_mesh_headers(), idempotent=True, priority=RECONCILE
+    )
+    response.raise_for_status()
+    content = response.json().get("content") or {}
+    items = (content.get("items") or []) if isinstance(content, dict) else []
+    for item in items:
+        # Only trust an item that names this transfer, in case the filter was ignored
+        if not isinstance(item, dict) or item.get("clientTransactionId") != request_id:
+            continue
+        status = MESH_TRANSFER_STATUSES.get(str(item.get("status")).lower())
+        if status is not None:
+            return status, item.get("hash") or item.get("txHash")
+    return None
+
+link_token_pool = LinkTokenPool(
+    mint=get_link_token,
+    low_watermark=settings.link_token_pool_low_watermark,
+    high_watermark=settings.link_token_pool_high_watermark,
+    max_age=settings.link_token_pool_max_age,
+)
+
+transfer_reconciler = TransferReconciler(
+    transfer_storage,
+    get_transfer_status,
+    pending_status=PENDING_STATUS,
+    stale_after=settings.reconcile_stale_after,
+    interval=settings.reconcile_interval,
+    batch_size=settings.reconcile_batch_size,
+    rate=settings.reconcile_rate,
+    concurrency=settings.reconcile_concurrency,
+    max_backoff=settings.reconcile_max_backoff,
+)
+if settings.reconcile_enabled:
+    transfer_storage.add_listener(transfer_reconciler.track)
+REGISTRY.gauge_callback(
+    "reconciler_scheduled", "Pending transfers scheduled for a status check", (), lambda: [((), len(transfer_reconciler))]
+)
+
+networks_cache = ReferenceCache(
+    name="networks",
+    loader=get_networks,
+    ttl=settings.networks_cache_ttl,
+    stale_ttl=settings.networks_cache_stale_ttl,
+)
+reference_caches: Dict[str, ReferenceCache] = {networks_cache.name: networks_cache}
+
+holdings_cache = TTLCache(
+    name="holdings",
+    maxsize=settings.holdings_cache_max_entries,
+    ttl=settings.holdings_cache_ttl,
+)
+REGISTRY.gauge_callback(
+    "holdings_cache_entries", "Entries in the holdings cache", (), lambda: [((), len(holdings_cache))]
+)
+
+def holdings_cache_key(auth_token: str, from_type: str) -> str:
+    """
+    Build the holdings cache key so raw auth tokens are never stored as keys.
+    
+    Args:
+        auth_token: User authentication token
+        from_type: Account type
+        
+    Returns:
+        str: SHA-256 digest of the broker type and auth token
+    """
+    return hashlib.sha256(f"{from_type}\0{auth_token}".encode("utf-8")).hexdigest()
+
+# Executed transfers by request fingerprint, replayed to duplicate submissions
+executed_transfers = TTLCache(
+    name="executed_transfers",
+    maxsize=settings.execute_dedup_max_entries,
+    ttl=settings.execute_dedup_ttl,
+)
+# Client Idempotency-Key -> fingerprint of the request it was first used with
+idempotency_keys = TTLCache(
+    name="idempotency_keys",
+    maxsize=settings.execute_dedup_max_entries,
+    ttl=settings.execute_dedup_ttl,
+)
+
+def execute_transfer_key(payload: ExecuteTransferPayload) -> str:
+    """
+    Fingerprint an execute request for deduplication.
+    
+    The MFA code is part of the fingerprint: the Rainbow flow executes a
+    preview once without a code to trigger the MFA challenge and again with
+    the code, and those are different upstream calls.
+    
+    Args:
+        payload: Transfer execution payload
+        
+    Returns:
+        str: SHA-256 digest of the broker type, auth token, preview ID and MFA code
+    """
+    parts = (payload.from_type, payload.auth_token, payload.preview_id, payload.mfa_code)
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Dependency guarding operator endpoints with the configured admin token.
+    
+    Args:
+        x_admin_token: Value of the X-Admin-Token request header
+        
+    Raises:
+        HTTPException: 404 if no admin token is configured, 403 if it does not match
+    """
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
 # --- HTML Page Routes ---
 @app.get("/", response_class=HTMLResponse)
@@ -295,7 +979,7 @@ async def auth_interface(request: Request):
         HTMLResponse: The authentication interface page
     """
     try:
-        link_token = get_link_token()
+        link_token = await link_token_pool.acquire()
         auth_url = base64.b64decode(link_token).decode('utf-8')
         return templates.TemplateResponse(
             "auth_frame.html",
@@ -305,28 +989,28 @@ async def auth_interface(request: Request):
             }
         )
     except Exception as e:
-        logger.error(f"Initialization failed: {str(e)}")
+        logger.error("Initialization failed: %s", e)
         raise HTTPException(status_code=500, detail="Initialization failed")
 
 @app.get("/preview_transfer", response_class=HTMLResponse)
 async def preview_transfer_page(request: Request):
     """Render the transfer preview page."""
-    return templates.TemplateResponse("preview_transfer.html", {"request": request})
+    return page_cache.response(request, "preview_transfer.html")
 
 @app.get("/execute_transfer", response_class=HTMLResponse)
 async def execute_transfer_page(request: Request):
     """Render the transfer execution page."""
-    return templates.TemplateResponse("execute_transfer.html", {"request": request})
+    return page_cache.response(request, "execute_transfer.html")
 
 @app.get("/holdings", response_class=HTMLResponse)
 async def holdings_page(request: Request):
     """Render the holdings page."""
-    return templates.TemplateResponse("holdings.html", {"request": request})
+    return page_cache.response(request, "holdings.html")
 
 @app.get("/rainbow_payment", response_class=HTMLResponse)
 async def rainbow_payment_page(request: Request):
     """Page for starting the $5 payment to RainbowWallet."""
-    return templates.TemplateResponse("rainbow_payment.html", {"request": request})
+    return page_cache.response(request, "rainbow_payment.html")
 
 @app.get("/rainbow_preview", response_class=HTMLResponse)
 async def rainbow_preview_page(request: Request):
@@ -339,7 +1023,7 @@ async def rainbow_preview_page(request: Request):
 @app.get("/rainbow_mfa", response_class=HTMLResponse)
 async def rainbow_mfa_page(request: Request):
     """Page for MFA verification for RainbowWallet payment."""
-    return templates.TemplateResponse("rainbow_mfa.html", {"request": request})
+    return page_cache.response(request, "rainbow_mfa.html")
 
 @app.get("/rainbow_success", response_class=HTMLResponse)
 async def rainbow_success_page(request: Request):
@@ -361,7 +1045,7 @@ async def rainbow_to_coinbase_page(request: Request):
         HTMLResponse: The Rainbow to Coinbase transfer page
     """
     try:
-        link_token = get_link_token()
+        link_token = await link_token_pool.acquire()
         return templates.TemplateResponse(
             "rainbow_to_coinbase.html",
             {
@@ -372,7 +1056,7 @@ async def rainbow_to_coinbase_page(request: Request):
             },
         )
     except Exception as e:
-        logger.error(f"Failed to load rainbow_to_coinbase page: {e}")
+        logger.error("Failed to load rainbow_to_coinbase page: %s", e)
         raise HTTPException(status_code=500, detail="Failed to initialize transfer page")
 
 @app.get("/iframe_link", response_class=HTMLResponse)
@@ -389,7 +1073,9 @@ async def iframe_link(request: Request):
         HTMLResponse: The iframe link page
     """
     try:
-        link_token = get_link_token()
+        link_token = await link_token_pool.acquire()
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Could not get link token")
         raise HTTPException(status_code=500, detail="Failed to create link token")
@@ -415,23 +1101,13 @@ async def demo_page(request: Request):
     Returns:
         HTMLResponse: The demo page
     """
-    addresses = []
-    try:
-        with open("receiving_addresses.json", "r") as f:
-            logger.info("Loading receiving addresses from JSON file.")
-            data = json.load(f)
-            addresses = data.get("addresses", [])
-    except FileNotFoundError:
-        logger.warning("receiving_addresses.json not found. Demo page will have an empty address list.")
-    except json.JSONDecodeError:
-        logger.warning("receiving_addresses.json is not valid JSON. Demo page will have an empty address list.")
-    
-    return templates.TemplateResponse(
+    config = receiving_addresses_config.get()
+    addresses = config.get("addresses", []) if isinstance(config, dict) else []
+    return page_cache.response(
+        request,
         "demo.html",
-        {
-            "request": request,
-            "receiving_addresses": addresses
-        }
+        {"receiving_addresses": addresses},
+        version=receiving_addresses_config.version,
     )
 
 @app.get("/init_auth", response_class=HTMLResponse)
@@ -451,17 +1127,17 @@ async def initialize_auth(request: Request, request_id: Optional[str] = None):
     if request_id is None:
         request_id = str(uuid.uuid4())
         # Initialize token storage with pending status
-        logger.info(f"Generated new request ID: {request_id}")
+        logger.info("Generated new request ID: %s", request_id)
         token_storage[request_id] = {"status": PENDING_STATUS, "token": None}
     elif request_id not in token_storage:
-        logger.info(f"Request ID {request_id} not found in storage. Generating a new one.")
+        logger.info("Request ID %s not found in storage. Generating a new one.", request_id)
         request_id = str(uuid.uuid4())
         token_storage[request_id] = {"status": PENDING_STATUS, "token": None}
     else:
-        logger.info(f"Using existing request ID: {request_id}")
+        logger.info("Using existing request ID: %s", request_id)
 
     # Auth URL from Mesh Connect
-    link_token = get_link_token()
+    link_token = await link_token_pool.acquire()
     auth_url = base64.b64decode(link_token).decode('utf-8')
     
     # Return the HTML with request_id embedded
@@ -479,7 +1155,7 @@ async def transfer_test(request: Request):
       • calls /api/transfer_request
       • opens Mesh Link
       • sends /api/transfer_result when finished
-      • polls /api/transfer_status every 3 s
+      • follows the transfer over /ws/transfer_status
       
     Args:
         request: FastAPI request object
@@ -487,7 +1163,7 @@ async def transfer_test(request: Request):
     Returns:
         HTMLResponse: The transfer test page
     """
-    link_token = get_link_token()  # for the initial wallet link
+    link_token = await link_token_pool.acquire()  # for the initial wallet link
     return templates.TemplateResponse(
         "transfer_test.html",
         {
@@ -513,6 +1189,32 @@ async def dummy_endpoint(request: Request):
     """
     return JSONResponse(content={"status": "ok"})
 
+@app.get("/health/live")
+async def liveness():
+    """
+    Liveness probe: the process is up and its event loop is answering.
+    
+    Returns:
+        Dict: Always ``{"status": "ok"}``
+    """
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    Readiness probe: whether this process should receive traffic.
+    
+    Ready once start-up warm-up has finished, and not ready again once
+    shutdown begins.
+    
+    Returns:
+        JSONResponse: State, import and start-up timings and per-phase
+            outcomes; 503 with ``Retry-After`` while not ready
+    """
+    if not startup.ready:
+        return JSONResponse(status_code=503, content=startup.report(), headers={"Retry-After": "1"})
+    return JSONResponse(content=startup.report())
+
 @app.get("/api/request_id", response_class=JSONResponse)
 async def request_id(request: Request):
     """
@@ -548,37 +1250,154 @@ async def store_token(request_id: str, token_data: dict):
     
     # Store the token
     token_storage[request_id] = {
-        "status": "complete",
+        "status": COMPLETE_STATUS,
         "token": token_data.get("access_token"),
         "broker_type": token_data.get("broker_type")
     }
     return {"status": SUCCESS_STATUS}
 
+def sse_event(event: str, data: str) -> str:
+    """
+    Format a single Server-Sent Events message.
+    
+    Args:
+        event: Event name
+        data: Event payload (a single line)
+        
+    Returns:
+        str: The encoded event
+    """
+    return f"event: {event}\ndata: {data}\n\n"
+
+def token_wait_slice(timeout: float) -> float:
+    """
+    Cap how long a token waiter sleeps before re-checking storage.
+    
+    Writes made by other workers to a shared backend may arrive without a
+    local notification, so waiters on a shared store re-check every
+    ``state_poll_interval`` seconds.
+    
+    Args:
+        timeout: Seconds the caller is willing to wait
+        
+    Returns:
+        float: Seconds to wait for a notification before re-checking
+    """
+    if token_storage.shared:
+        return min(timeout, settings.state_poll_interval)
+    return timeout
+
 @app.get("/api/get_token/{request_id}")
-async def get_token(request_id: str):
+async def get_token(request_id: str, wait: float = 0):
     """
     Retrieve a stored token.
     
+    With ``wait`` set, the request long-polls: it is held open until the token
+    is stored or ``wait`` seconds (capped by ``token_wait_max``) pass.
+    
     Args:
         request_id: Request ID associated with the token
+        wait: Seconds to wait for a pending token before answering
         
     Returns:
         TokenResponse or Dict: Token data or pending status
         
     Raises:
-        HTTPException: If request ID is not found
+        HTTPException: If request ID is not found, or too many requests are waiting
     """
     if request_id not in token_storage:
         raise HTTPException(status_code=404, detail="Request ID not found")
     
     token_data = token_storage[request_id]
+    if token_data["status"] == PENDING_STATUS and wait > 0:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(wait, settings.token_wait_max)
+        try:
+            with token_waiters.subscribe(request_id) as waiter:
+                while token_data["status"] == PENDING_STATUS:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    await waiter.wait(token_wait_slice(remaining))
+                    token_data = token_storage.get(request_id)
+                    if token_data is None:
+                        raise HTTPException(status_code=404, detail="Request ID not found")
+        except WaiterLimitExceeded:
+            raise HTTPException(
+                status_code=503, detail="Too many waiting requests", headers={"Retry-After": "2"}
+            )
+
     if token_data["status"] == PENDING_STATUS:
         return {"status": PENDING_STATUS, "message": "Token not yet available"}
     
-    logger.info(f"Returning token data for request ID: {request_id}")
+    logger.info("Returning token data for request ID: %s", request_id)
     
     return TokenResponse(access_token=token_data["token"], broker_type=token_data["broker_type"])
 
+@app.get("/api/get_token/{request_id}/events")
+async def get_token_events(request: Request, request_id: str):
+    """
+    Stream token status as Server-Sent Events.
+    
+    Emits a ``pending`` event, then a ``token`` event carrying the TokenResponse
+    as soon as ``/api/store_token`` writes the token. Comment heartbeats keep the
+    connection open; after ``token_stream_timeout`` seconds a ``timeout`` event
+    is sent and the stream closes so the client reconnects.
+    
+    Args:
+        request: FastAPI request object
+        request_id: Request ID associated with the token
+        
+    Returns:
+        StreamingResponse: The ``text/event-stream`` response
+        
+    Raises:
+        HTTPException: If request ID is not found, or too many requests are waiting
+    """
+    if request_id not in token_storage:
+        raise HTTPException(status_code=404, detail="Request ID not found")
+    if token_waiters.full:
+        raise HTTPException(
+            status_code=503, detail="Too many waiting requests", headers={"Retry-After": "2"}
+        )
+
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.token_stream_timeout
+        next_heartbeat = loop.time() + settings.token_stream_heartbeat
+        try:
+            with token_waiters.subscribe(request_id) as waiter:
+                yield sse_event(PENDING_STATUS, json.dumps({"status": PENDING_STATUS}))
+                while True:
+                    token_data = token_storage.get(request_id)
+                    if token_data is None:
+                        yield sse_event("not_found", json.dumps({"detail": "Request ID not found"}))
+                        return
+                    if token_data["status"] != PENDING_STATUS:
+                        token = TokenResponse(
+                            access_token=token_data["token"], broker_type=token_data["broker_type"]
+                        )
+                        yield sse_event("token", token.model_dump_json())
+                        return
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        yield sse_event("timeout", json.dumps({"status": PENDING_STATUS}))
+                        return
+                    await waiter.wait(token_wait_slice(min(next_heartbeat - loop.time(), remaining)))
+                    if await request.is_disconnected():
+                        return
+                    if loop.time() >= next_heartbeat:
+                        next_heartbeat = loop.time() + settings.token_stream_heartbeat
+                        yield ": keepalive\n\n"
+        except WaiterLimitExceeded:
+            yield sse_event("timeout", json.dumps({"status": PENDING_STATUS}))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/api/get_linktoken", response_class=JSONResponse)
 async def get_linktoken_endpoint(request: Request):
     """
@@ -594,10 +1413,12 @@ async def get_linktoken_endpoint(request: Request):
         HTTPException: If token retrieval fails
     """
     try:
-        link_token = get_link_token()
+        link_token = await link_token_pool.acquire()
         return JSONResponse(content={"link_token": link_token})
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to get link token: {str(e)}")
+        logger.error("Failed to get link token: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get link token")
 
 @app.get("/api/transfer_preview", response_class=JSONResponse)
@@ -625,7 +1446,7 @@ async def transfer_preview_endpoint(
         address_tag: Optional address tag
         
     Returns:
-        JSONResponse: Transfer preview data
+        Response: Mesh's preview body, forwarded unchanged
         
     Raises:
         HTTPException: If preview request fails
@@ -633,7 +1454,7 @@ async def transfer_preview_endpoint(
     try:
         network_id = settings.coinbase_network_id
         
-        transfer_preview_data = get_transfer_preview(
+        transfer_preview_data = await get_transfer_preview(
             auth_token,
             from_type,
             to_type,
@@ -644,40 +1465,273 @@ async def transfer_preview_endpoint(
             network_id
         )
         
-        return JSONResponse(content=transfer_preview_data)
+        return passthrough_response(transfer_preview_data)
+    except HTTPException:
+        # Mesh errors already carry the right status (502, or 503 while the circuit is open)
+        raise
     except Exception as e:
-        logger.error(f"Transfer preview failed: {str(e)}")
+        logger.error("Transfer preview failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Transfer preview failed: {str(e)}")
 
+async def run_preview_spec(index: int, spec: TransferPreviewSpec, limit: asyncio.Semaphore) -> Dict[str, Any]:
+    """
+    Preview one item of a batch, turning failures into a result entry.
+    
+    Args:
+        index: Position of the item in the request
+        spec: Transfer to preview
+        limit: Semaphore bounding concurrent Mesh calls for the batch
+        
+    Returns:
+        Dict[str, Any]: The item's index and status, plus the preview or an error
+    """
+    async with limit:
+        try:
+            preview = await get_transfer_preview(
+                spec.auth_token,
+                spec.from_type,
+                spec.to_type,
+                spec.to_address,
+                spec.amount,
+                spec.address_tag,
+                spec.symbol,
+                spec.network_id or settings.coinbase_network_id,
+            )
+            return {"index": index, "status": SUCCESS_STATUS, "preview": preview.data()}
+        except HTTPException as e:
+            return {"index": index, "status": FAILED_STATUS, "status_code": e.status_code, "error": e.detail}
+        except Exception as e:
+            logger.error("Batch preview item %s failed: %s", index, e)
+            return {"index": index, "status": FAILED_STATUS, "status_code": 500, "error": str(e)}
+
+@app.post("/api/transfer_preview/batch")
+async def batch_transfer_preview_endpoint(payload: BatchPreviewRequest, stream: bool = False):
+    """
+    Preview many candidate transfers against Mesh in parallel.
+    
+    At most ``PREVIEW_BATCH_CONCURRENCY`` previews of a batch run at once.
+    A failed item does not fail the batch; it is reported in its own entry.
+    
+    Args:
+        payload: List of transfers to preview
+        stream: Return NDJSON lines as items complete instead of one
+            JSON document in request order
+        
+    Returns:
+        JSONResponse | StreamingResponse: Per-item results
+        
+    Raises:
+        HTTPException: If the batch has more than ``PREVIEW_BATCH_MAX_ITEMS`` items
+    """
+    if len(payload.previews) > settings.preview_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.preview_batch_max_items} previews per batch",
+        )
+    limit = asyncio.Semaphore(settings.preview_batch_concurrency)
+    tasks = [
+        asyncio.create_task(run_preview_spec(index, spec, limit))
+        for index, spec in enumerate(payload.previews)
+    ]
+
+    if not stream:
+        results = await asyncio.gather(*tasks)
+        succeeded = sum(1 for result in results if result["status"] == SUCCESS_STATUS)
+        return FastJSONResponse(content={
+            "results": results,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+        })
+
+    async def result_lines():
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield dumps(await next_result) + b"\n"
+        finally:
+            # Client went away: stop previews that have not finished
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
 @app.post("/api/execute_transfer")
-async def api_execute_transfer_endpoint(payload: ExecuteTransferPayload):
+async def api_execute_transfer_endpoint(
+    payload: ExecuteTransferPayload,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+):
     """
     Endpoint to execute a transfer.
     
+    Resubmissions of the same request (same preview, token and MFA code)
+    never reach Mesh twice: while the first is in flight they await its
+    result, and for ``execute_dedup_ttl`` seconds afterwards its successful
+    result is replayed with an ``Idempotent-Replayed: true`` header. Failures
+    are not kept, so a retry after an error goes upstream again.
+    
     Args:
         payload: Transfer execution payload
+        response: Outgoing response, for the replay header
+        idempotency_key: Optional client-chosen key; reusing it for a
+            different request is rejected
         
     Returns:
         Dict: Transfer result data
         
     Raises:
-        HTTPException: If transfer execution fails
+        HTTPException: If transfer execution fails, or the idempotency key
+            was already used for a different request
     """
-    try:
-        transfer_result = execute_transfer(
+    key = execute_transfer_key(payload)
+
+    async def execute_once() -> Dict[str, Any]:
+        transfer_result = await execute_transfer(
             auth_token=payload.auth_token,
             from_type=payload.from_type,
             preview_id=payload.preview_id,
             mfa_code=payload.mfa_code
         )
+        # Balances changed: the next holdings read must go to Mesh
+        holdings_cache.invalidate(holdings_cache_key(payload.auth_token, payload.from_type))
+        return transfer_result
+
+    async def bind_key() -> str:
+        return key
+
+    try:
+        if idempotency_key:
+            # Scoped to the auth token so one user's keys can't collide with another's
+            scoped_key = hashlib.sha256(f"{payload.auth_token}\0{idempotency_key}".encode("utf-8")).hexdigest()
+            bound_key, _ = await idempotency_keys.get_or_load(scoped_key, bind_key)
+            if bound_key != key:
+                raise HTTPException(
+                    status_code=422, detail="Idempotency-Key was already used for a different transfer"
+                )
+        # The upstream call is shielded: a client that disconnects mid-call
+        # doesn't cancel it, and its result is still kept for the retry
+        transfer_result, cache_status = await executed_transfers.get_or_load(key, execute_once)
+        if cache_status == CACHE_HIT:
+            logger.info("Replaying executed transfer for preview ID: %s", payload.preview_id)
+            response.headers["Idempotent-Replayed"] = "true"
         return transfer_result
     except HTTPException as e:
         # Re-raise HTTPExceptions that might come from execute_transfer
         raise e
     except Exception as e:
-        logger.error(f"Unexpected error in execute_transfer endpoint: {str(e)}")
+        logger.error("Unexpected error in execute_transfer endpoint: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
     
+async def fetch_account_holdings(index: int, account: AccountHandle) -> Dict[str, Any]:
+    """
+    Fetch one account's holdings for a portfolio, within the per-account timeout.
+    
+    A load that times out keeps running in the holdings cache, so a retry
+    shortly afterwards is likely to be a hit.
+    
+    Args:
+        index: Position of the account in the request
+        account: Account to fetch
+        
+    Returns:
+        Dict[str, Any]: The account's status, identity and crypto positions
+    """
+    result = {"account": index, "label": account.label, "from_type": account.from_type}
+    try:
+        holdings, cache_status = await asyncio.wait_for(
+            holdings_cache.get_or_load(
+                holdings_cache_key(account.auth_token, account.from_type),
+                lambda: get_holdings(account.auth_token, account.from_type),
+            ),
+            timeout=settings.portfolio_account_timeout,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Holdings for portfolio account %s (%s) timed out", index, account.from_type)
+        return {**result, "status": "timeout", "positions": []}
+    except HTTPException as e:
+        return {**result, "status": FAILED_STATUS, "error": e.detail, "positions": []}
+    except Exception as e:
+        logger.error("Holdings for portfolio account %s failed: %s", index, e)
+        return {**result, "status": FAILED_STATUS, "error": str(e), "positions": []}
+
+    content = holdings.data().get("content") or {}
+    return {
+        **result,
+        "status": SUCCESS_STATUS,
+        "cache": cache_status,
+        "institution_name": content.get("institutionName"),
+        "account_name": content.get("accountName"),
+        "positions": content.get("cryptocurrencyPositions") or [],
+    }
+
+def merge_positions(accounts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Total positions across accounts by symbol.
+    
+    Args:
+        accounts: Per-account results from fetch_account_holdings
+        
+    Returns:
+        List[Dict[str, Any]]: One entry per symbol, sorted by symbol, with the
+            total amount and each contributing account's amount
+    """
+    by_symbol: Dict[str, Dict[str, Any]] = {}
+    for account in accounts:
+        for position in account["positions"]:
+            symbol = position.get("symbol")
+            if not symbol:
+                continue
+            try:
+                amount = float(position.get("amount") or 0)
+            except (TypeError, ValueError):
+                continue
+            total = by_symbol.setdefault(symbol, {"symbol": symbol, "name": position.get("name"), "amounts": []})
+            total["name"] = total["name"] or position.get("name")
+            total["amounts"].append({"account": account["account"], "amount": amount})
+    return [
+        {
+            "symbol": total["symbol"],
+            "name": total["name"],
+            "amount": math.fsum(item["amount"] for item in total["amounts"]),
+            "by_account": total["amounts"],
+        }
+        for _, total in sorted(by_symbol.items())
+    ]
+
+@app.post("/api/portfolio")
+async def api_portfolio(payload: PortfolioRequest):
+    """
+    Aggregate holdings across several connected accounts.
+    
+    Holdings are fetched concurrently through the holdings cache. An account
+    that fails or exceeds ``PORTFOLIO_ACCOUNT_TIMEOUT`` is reported in its own
+    entry and left out of the totals instead of failing the request.
+    
+    Args:
+        payload: Accounts to aggregate
+        
+    Returns:
+        JSONResponse: Totals by symbol plus per-account breakdowns
+        
+    Raises:
+        HTTPException: If more than ``PORTFOLIO_MAX_ACCOUNTS`` accounts are given
+    """
+    if len(payload.accounts) > settings.portfolio_max_accounts:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.portfolio_max_accounts} accounts per portfolio",
+        )
+    accounts = await asyncio.gather(
+        *(fetch_account_holdings(index, account) for index, account in enumerate(payload.accounts))
+    )
+    succeeded = sum(1 for account in accounts if account["status"] == SUCCESS_STATUS)
+    return FastJSONResponse(content={
+        "totals": merge_positions(accounts),
+        "accounts": accounts,
+        "complete": succeeded == len(accounts),
+        "succeeded": succeeded,
+        "failed": len(accounts) - succeeded,
+    })
+
 @app.get("/api/get_holdings")
 async def api_get_holdings(request: Request, auth_token: str, from_type: str):
     """
@@ -689,16 +1743,21 @@ async def api_get_holdings(request: Request, auth_token: str, from_type: str):
         from_type: Account type
         
     Returns:
-        JSONResponse: Holdings data
+        Response: Mesh's holdings body, forwarded unchanged
         
     Raises:
         HTTPException: If holdings request fails
     """
     try:
-        holdings_data = get_holdings(auth_token, from_type)
-        return JSONResponse(content=holdings_data)
+        holdings_data, cache_status = await holdings_cache.get_or_load(
+            holdings_cache_key(auth_token, from_type),
+            lambda: get_holdings(auth_token, from_type),
+        )
+        return passthrough_response(holdings_data, headers={"X-Cache": cache_status})
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Holdings request failed: {str(e)}")
+        logger.error("Holdings request failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Holdings request failed: {str(e)}")
 
 @app.get("/api/get_networks")
@@ -710,36 +1769,40 @@ async def api_get_networks(request: Request):
         request: FastAPI request object
         
     Returns:
-        JSONResponse: Networks data
+        Response: Mesh's networks body, forwarded unchanged
         
     Raises:
         HTTPException: If networks request fails
     """
     try:
-        networks_data = get_networks()
-        return JSONResponse(content=networks_data)
+        networks_data, cache_status = await networks_cache.get_with_status()
+        return passthrough_response(networks_data, headers={"X-Cache": cache_status})
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Networks request failed: {str(e)}")
+        logger.error("Networks request failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Networks request failed: {str(e)}")
 
-@app.post("/api/linktoken_transfer")
-async def linktoken_transfer(
-    amount: float = Body(..., embed=True)
-):
+async def create_transfer_link_token(amount: float, client_transaction_id: Optional[str] = None) -> str:
     """
-    Create a link token for a transfer.
+    Mint a link token for a USDC transfer to the configured address.
+    
+    Only server-side callers pass ``client_transaction_id``: Mesh echoes it
+    back in transfer webhooks, which then update that transfer's entry, so
+    it must be a request ID this backend issued.
     
     Args:
         amount: Transfer amount
+        client_transaction_id: ID Mesh echoes back in transfer webhooks
         
     Returns:
-        Dict: Link token data
+        str: The link token
         
     Raises:
-        HTTPException: If token creation fails
+        HTTPException: 502 or 503 if the Mesh call fails
     """
     try:
-        resp = requests.post(
+        resp = await mesh_client.post(
             f"{settings.mesh_api_base}/api/v1/linktoken",
             headers=get_mesh_headers(),
             json={
@@ -755,13 +1818,35 @@ async def linktoken_transfer(
                             "amount": amount,
                         }
                     ],
+                    **({"clientTransactionId": client_transaction_id} if client_transaction_id else {}),
                 },
             },
-            timeout=DEFAULT_TIMEOUT,
+            retry_on_connect_only=True,
+            priority=LINK_TOKEN,
         )
         resp.raise_for_status()
-        link_token = resp.json()["content"]["linkToken"]
-        return {"link_token": link_token}
+        return resp.json()["content"]["linkToken"]
+    except httpx.HTTPError as e:
+        raise mesh_error("Transfer token failed", e)
+
+@app.post("/api/linktoken_transfer")
+async def linktoken_transfer(amount: float = Body(..., embed=True)):
+    """
+    Create a link token for a transfer.
+    
+    Args:
+        amount: Transfer amount
+        
+    Returns:
+        Dict: Link token data
+        
+    Raises:
+        HTTPException: If token creation fails
+    """
+    try:
+        return {"link_token": await create_transfer_link_token(amount)}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Transfer token failed")
         raise HTTPException(status_code=500, detail=str(e))
@@ -785,7 +1870,7 @@ async def rainbow_to_coinbase_transfer(request_data: TransferRequest):
     
     try:
         # Create a link token with Coinbase as the destination
-        resp = requests.post(
+        resp = await mesh_client.post(
             f"{settings.mesh_api_base}/api/v1/linktoken",
             headers=get_mesh_headers(),
             json={
@@ -801,9 +1886,12 @@ async def rainbow_to_coinbase_transfer(request_data: TransferRequest):
                             "amount": request_data.amount,
                         }
                     ],
+                    # Echoed back in Mesh's transfer webhooks
+                    "clientTransactionId": request_id,
                 },
             },
-            timeout=DEFAULT_TIMEOUT,
+            retry_on_connect_only=True,
+            priority=LINK_TOKEN,
         )
         resp.raise_for_status()
         link_token = resp.json()["content"]["linkToken"]
@@ -816,6 +1904,8 @@ async def rainbow_to_coinbase_transfer(request_data: TransferRequest):
         }
         
         return {"request_id": request_id, "link_token": link_token}
+    except httpx.HTTPError as e:
+        raise mesh_error("Rainbow to Coinbase transfer initialization failed", e)
     except Exception as e:
         logger.exception("Rainbow to Coinbase transfer initialization failed")
         raise HTTPException(status_code=500, detail=str(e))
@@ -836,9 +1926,7 @@ async def transfer_request(req: TransferRequest):
     """
     request_id = req.request_id or str(uuid.uuid4())
     try:
-        # Call the helper that hits Mesh
-        mesh_resp = await linktoken_transfer(amount=req.amount)
-        link_token = mesh_resp["link_token"]
+        link_token = await create_transfer_link_token(req.amount, client_transaction_id=request_id)
 
         # Record as pending
         transfer_storage[request_id] = {
@@ -847,8 +1935,9 @@ async def transfer_request(req: TransferRequest):
             "tx_hash": None,
         }
         return {"request_id": request_id, "link_token": link_token}
-    except HTTPException as e:
-        raise e
+    except HTTPException:
+        # Mesh errors already carry the right status (502, or 503 with Retry-After)
+        raise
     except Exception as e:
         logger.exception("Transfer_request failed")
         raise HTTPException(status_code=500, detail=str(e))
@@ -869,11 +1958,78 @@ async def transfer_result(result: TransferResult):
     """
     if result.request_id not in transfer_storage:
         raise HTTPException(status_code=404, detail="Unknown request_id")
-    transfer_storage[result.request_id].update(
-        status=result.status, tx_hash=result.tx_hash
+    transfer_storage.patch(
+        result.request_id, status=result.status, tx_hash=result.tx_hash
     )
     return {"status": "recorded"}
 
+async def read_capped_body(request: Request, limit: int) -> Optional[bytes]:
+    """
+    Read a request body, giving up as soon as it grows past a size limit.
+    
+    A declared Content-Length over the limit is rejected before anything is
+    read; otherwise the body is streamed and reading stops at the first
+    chunk past the limit, so an oversized body is never held in full.
+    
+    Args:
+        request: The incoming request
+        limit: Maximum body size in bytes
+        
+    Returns:
+        Optional[bytes]: The body, or None if it is larger than ``limit``
+    """
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > limit:
+        return None
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            return None
+    return bytes(body)
+
+@app.post("/api/mesh/webhook", status_code=202)
+async def mesh_webhook(request: Request):
+    """
+    Receive a signed Mesh transfer event.
+    
+    The event is verified and queued; transfer_storage is updated by the
+    webhook ingestor's next micro-batch, so the delivery is acknowledged
+    without waiting on storage.
+    
+    Args:
+        request: The delivery; its raw body is what Mesh signed
+        
+    Returns:
+        Dict: ``queued``, or ``duplicate`` for a redelivered event
+        
+    Raises:
+        HTTPException: 404 if no webhook secret is configured, 413 if the body
+            is too large, 401/400 if verification fails, 503 if the queue is full
+    """
+    if webhook_verifier is None:
+        raise HTTPException(status_code=404, detail="Webhooks disabled")
+    body = await read_capped_body(request, settings.mesh_webhook_max_body)
+    if body is None:
+        WEBHOOK_DELIVERIES.labels("too_large").inc()
+        raise HTTPException(status_code=413, detail="Webhook body too large")
+    try:
+        event = webhook_verifier.verify(body, request.headers.get(settings.mesh_webhook_signature_header))
+    except WebhookRejected as e:
+        WEBHOOK_DELIVERIES.labels(e.reason).inc()
+        logger.warning("Rejected Mesh webhook (%s): %s", e.reason, e.detail)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if not webhook_verifier.first_delivery(event["event_id"]):
+        WEBHOOK_DELIVERIES.labels("duplicate").inc()
+        return {"status": "duplicate"}
+    if not webhook_ingestor.submit(event):
+        # Let Mesh's retry through once there's room
+        webhook_verifier.forget(event["event_id"])
+        WEBHOOK_DELIVERIES.labels("queue_full").inc()
+        raise HTTPException(status_code=503, detail="Webhook queue full", headers={"Retry-After": "1"})
+    WEBHOOK_DELIVERIES.labels("queued").inc()
+    return {"status": "queued"}
+
 @app.get("/api/transfer_status/{request_id}")
 async def transfer_status(request_id: str):
     """
@@ -892,9 +2048,255 @@ async def transfer_status(request_id: str):
         raise HTTPException(status_code=404, detail="Unknown request_id")
     return transfer_storage[request_id]
 
+@app.websocket("/ws/transfer_status")
+async def transfer_status_ws(websocket: WebSocket):
+    """
+    Push transfer status transitions over a WebSocket.
+    
+    Subscribe with ``request_id`` query parameters (repeatable) or by sending
+    ``{"action": "subscribe", "request_ids": [...]}``; ``unsubscribe`` works the
+    same way. The current status is sent on subscribe, then every write to
+    ``transfer_storage`` for a subscribed ID is pushed as
+    ``{"type": "status", "request_id", "status", "amount", "tx_hash"}``.
+    A ``{"type": "ping"}`` heartbeat is sent when the connection is idle, and
+    ``{"action": "ping"}`` is answered with ``{"type": "pong"}``.
+    Clients that cannot keep up only receive the latest status per ID, and
+    clients that stop reading are disconnected.
+    
+    Args:
+        websocket: FastAPI WebSocket connection
+    """
+    await websocket.accept()
+    subscription = transfer_updates.open(max_topics=settings.ws_max_subscriptions)
+
+    def subscribe(request_ids: List[str]) -> None:
+        try:
+            transfer_updates.subscribe(subscription, request_ids)
+        except TooManyTopics as e:
+            subscription.deliver("_control", {"type": "error", "detail": str(e)})
+            return
+        for request_id in request_ids:
+            transfer = transfer_storage.get(request_id)
+            if transfer is None:
+                message = {"type": "error", "request_id": request_id, "detail": "Unknown request_id"}
+            else:
+                message = {"type": "status", "request_id": request_id, **transfer}
+            subscription.deliver(request_id, message)
+
+    async def read_commands() -> None:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                action = message.get("action")
+                request_ids = [str(r) for r in message.get("request_ids", [])]
+            except (ValueError, AttributeError, TypeError):
+                subscription.deliver("_control", {"type": "error", "detail": "Invalid message"})
+                continue
+            if action == "subscribe":
+                subscribe(request_ids)
+            elif action == "unsubscribe":
+                transfer_updates.unsubscribe(subscription, request_ids)
+            elif action == "ping":
+                subscription.deliver("_control", {"type": "pong"})
+            else:
+                subscription.deliver("_control", {"type": "error", "detail": "Unknown action"})
+
+    async def write_updates() -> None:
+        while True:
+            batch = await subscription.next_batch(timeout=settings.ws_heartbeat_interval)
+            messages = [message for _, message in batch] or [{"type": "ping"}]
+            for message in messages:
+                await asyncio.wait_for(websocket.send_json(message), timeout=settings.ws_send_timeout)
+
+    subscribe(websocket.query_params.getlist("request_id"))
+    tasks = [asyncio.create_task(read_commands()), asyncio.create_task(write_updates())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if isinstance(error, asyncio.TimeoutError):
+                logger.warning("Closing slow transfer status WebSocket client")
+                await websocket.close(code=1013)
+            elif error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.error("Transfer status WebSocket failed: %s", error)
+    finally:
+        for task in tasks:
+            task.cancel()
+        transfer_updates.close(subscription)
+
+# --- Admin Routes ---
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Export metrics in the Prometheus text format.
+    
+    Returns:
+        PlainTextResponse: Request, Mesh upstream and store metrics
+        
+    Raises:
+        HTTPException: If metrics are disabled
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/admin/caches", dependencies=[Depends(require_admin)])
+async def admin_cache_stats():
+    """
+    Report hit/miss counters for the reference-data, holdings, execute-dedup and page caches.
+    
+    Returns:
+        Dict: Cache stats keyed by cache name
+    """
+    stats = {name: cache.stats() for name, cache in reference_caches.items()}
+    stats[holdings_cache.name] = holdings_cache.stats()
+    stats[executed_transfers.name] = executed_transfers.stats()
+    stats[idempotency_keys.name] = idempotency_keys.stats()
+    stats[page_cache.name] = page_cache.stats()
+    stats["receiving_addresses"] = receiving_addresses_config.stats()
+    return stats
+
+@app.post("/admin/caches/{name}/refresh", dependencies=[Depends(require_admin)])
+async def admin_refresh_cache(name: str):
+    """
+    Force a reference-data cache to reload from Mesh.
+    
+    Args:
+        name: Name of the cache to refresh
+        
+    Returns:
+        Dict: Cache stats after the refresh
+        
+    Raises:
+        HTTPException: If the cache is unknown or the refresh fails
+    """
+    cache = reference_caches.get(name)
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Unknown cache")
+    try:
+        await cache.refresh()
+    except Exception as e:
+        logger.error("Forced refresh of %s cache failed: %s", name, e)
+        raise HTTPException(status_code=502, detail=f"Cache refresh failed: {str(e)}")
+    return cache.stats()
+
+@app.get("/admin/upstream", dependencies=[Depends(require_admin)])
+async def admin_upstream_stats():
+    """
+    Report Mesh retry and hedging counters and per-endpoint circuit breaker state.
+    
+    Returns:
+        Dict: Client counters and breaker state keyed by endpoint path
+    """
+    return mesh_client.stats()
+
+@app.get("/admin/admission", dependencies=[Depends(require_admin)])
+async def admin_admission_stats():
+    """
+    Report rate-limit counters and the upstream scheduler's occupancy.
+    
+    Returns:
+        Dict: Request admission counters and limits, and per-class upstream
+            scheduler state and queue wait
+    """
+    return {"requests": admission.stats(), "upstream": mesh_client.scheduler.stats()}
+
+@app.get("/admin/loop", dependencies=[Depends(require_admin)])
+async def admin_loop_stats():
+    """
+    Report event loop lag and recent stalls with the stacks that caused them.
+    
+    Returns:
+        Dict: Monitor settings, worst lag and recent stalls, newest first
+        
+    Raises:
+        HTTPException: If the loop monitor is disabled
+    """
+    if not settings.loop_monitor_enabled:
+        raise HTTPException(status_code=404, detail="Loop monitor disabled")
+    return loop_monitor.stats()
+
+def require_profiler() -> None:
+    """
+    Dependency guarding the profiler endpoints.
+    
+    Raises:
+        HTTPException: If the profiler is disabled
+    """
+    if not settings.profiler_enabled:
+        raise HTTPException(status_code=404, detail="Profiler disabled")
+
+@app.post("/admin/profile/cpu", dependencies=[Depends(require_admin), Depends(require_profiler)])
+async def admin_profile_cpu(seconds: float = 5.0, include_idle: bool = False, format: str = "json"):
+    """
+    Sample the event loop thread's stack for a few seconds.
+    
+    Args:
+        seconds: Profile duration, capped at PROFILER_MAX_SECONDS
+        include_idle: Keep samples taken while the loop was waiting for I/O
+        format: ``json`` for counts plus folded stacks, ``folded`` for the
+            folded stacks alone as plain text
+        
+    Returns:
+        JSONResponse | PlainTextResponse: The profile
+        
+    Raises:
+        HTTPException: If another profile is running
+    """
+    try:
+        result = await profiler.cpu(seconds, include_idle=include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "folded":
+        return PlainTextResponse(result["folded"])
+    return result
+
+@app.post("/admin/profile/memory", dependencies=[Depends(require_admin), Depends(require_profiler)])
+async def admin_profile_memory(seconds: float = 5.0, limit: int = 25, format: str = "json"):
+    """
+    Report which code allocated the most new memory over a few seconds.
+    
+    Args:
+        seconds: Profile duration, capped at PROFILER_MAX_SECONDS
+        limit: Number of allocation sites returned
+        format: ``json`` for the top sites plus folded stacks, ``folded`` for
+            the folded stacks (weighted by bytes) alone as plain text
+        
+    Returns:
+        JSONResponse | PlainTextResponse: The allocation diff
+        
+    Raises:
+        HTTPException: If another profile is running
+    """
+    try:
+        result = await profiler.memory(seconds, limit=limit)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "folded":
+        return PlainTextResponse(result["folded"])
+    return result
+
+@app.get("/admin/state", dependencies=[Depends(require_admin)])
+async def admin_state_stats():
+    """
+    Report token and transfer store stats, WebSocket fan-out, webhook ingestion and reconciler counters.
+    
+    Returns:
+        Dict: Store stats keyed by store name
+    """
+    stats = {store.name: store.stats() for store in (token_storage, transfer_storage)}
+    stats["transfer_updates"] = transfer_updates.stats()
+    stats["webhooks"] = webhook_ingestor.stats()
+    stats["reconciler"] = transfer_reconciler.stats()
+    return stats
+
+startup.record_import(time.perf_counter() - IMPORT_STARTED)
+
 # --- Main Entry Point ---
 
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting Mesh Backend server on localhost:3000")
-    uvicorn.run(app, host="localhost", port=3000)
+    # log_config=None keeps uvicorn's loggers on the queue handler
+    uvicorn.run(app, host="localhost", port=3000, log_config=None)
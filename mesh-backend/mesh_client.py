@@ -0,0 +1,364 @@
+"""
+Mesh API HTTP Client
+
+Shared asynchronous HTTP client used for every call to the Mesh Connect API.
+
+A single pooled ``httpx.AsyncClient`` is opened with the application lifespan,
+so upstream requests reuse keep-alive connections and never block the event
+loop while waiting on Mesh.
+
+Every endpoint gets its own circuit breaker. Calls marked idempotent are also
+retried with jittered backoff on transport errors, 429 and 5xx responses, and
+can be hedged with a second request once they run past the endpoint's p95
+latency (see ``resilience.py``). Calls that create something upstream, such
+as minting a link token, can ask to be retried only when the connection
+could not be opened, since Mesh then never saw the request. Other calls,
+such as executing a transfer, are sent exactly once.
+
+An optional ``UpstreamScheduler`` (see ``upstream_scheduler.py``) caps how
+many calls are in flight across all endpoints, lets each call through in
+order of its priority class, and sheds calls once its queue is full.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, Any
+from urllib.parse import urlsplit
+
+# --- Third-Party Imports ---
+import httpx
+
+# --- Local Imports ---
+from metrics import REGISTRY
+from resilience import CircuitBreaker, CircuitOpenError, LatencyWindow, backoff_delay
+from upstream_scheduler import UpstreamScheduler
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying an idempotent call on
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+HEDGE_PERCENTILE = 95
+
+# --- Metrics ---
+MESH_REQUEST_SECONDS = REGISTRY.histogram(
+    "mesh_request_duration_seconds", "Latency of each Mesh API request attempt", ("endpoint",)
+)
+MESH_REQUEST_ERRORS = REGISTRY.counter(
+    "mesh_request_errors_total",
+    "Mesh API request attempts that failed, by HTTP status, transport error or open circuit",
+    ("endpoint", "reason"),
+)
+MESH_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "mesh_requests_in_flight", "Mesh API requests awaiting a response", ("endpoint",)
+)
+MESH_RETRIES = REGISTRY.counter("mesh_retries_total", "Retried Mesh API requests", ("endpoint",))
+
+
+class MeshClient:
+    """
+    Pooled async HTTP client for the Mesh API.
+
+    The global pool size is enforced by httpx; an additional per-host
+    semaphore caps how many requests may be in flight to any single host.
+    """
+
+    def __init__(
+        self,
+        timeout: float,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        max_connections_per_host: int,
+        retry_attempts: int = 3,
+        retry_base_delay: float = 0.1,
+        retry_max_delay: float = 2.0,
+        breaker_failure_threshold: int = 5,
+        breaker_reset_timeout: float = 30.0,
+        hedge: bool = False,
+        hedge_min_delay: float = 0.05,
+        scheduler: Optional[UpstreamScheduler] = None,
+    ):
+        """
+        Args:
+            timeout: Timeout in seconds for connecting, reading and pool waits
+            max_connections: Maximum number of open connections in the pool
+            max_keepalive_connections: Maximum number of idle keep-alive connections
+            keepalive_expiry: Seconds an idle keep-alive connection is kept open
+            max_connections_per_host: Maximum concurrent requests to a single host
+            retry_attempts: Total attempts for an idempotent call
+            retry_base_delay: Backoff cap in seconds before the first retry
+            retry_max_delay: Upper bound in seconds on any retry delay
+            breaker_failure_threshold: Consecutive failures that open an
+                endpoint's circuit breaker
+            breaker_reset_timeout: Seconds a breaker stays open before probing
+            hedge: Send a second copy of a slow idempotent call
+            hedge_min_delay: Minimum seconds before hedging, however low the p95
+            scheduler: Orders calls by priority under a global in-flight cap;
+                calls it sheds raise ``UpstreamOverloaded``
+        """
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.max_connections_per_host = max_connections_per_host
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self.retry_attempts = max(1, retry_attempts)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.scheduler = scheduler
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyWindow] = {}
+        self._stats = {"requests": 0, "retries": 0, "hedged": 0, "hedge_wins": 0}
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the underlying connection pool is open."""
+        return self._client is not None and not self._client.is_closed
+
+    async def start(self) -> None:
+        """Open the connection pool. Safe to call more than once."""
+        if self.is_open:
+            return
+        self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        logger.info(
+            "Mesh client started (max_connections=%s, per_host=%s)",
+            self.limits.max_connections,
+            self.max_connections_per_host,
+        )
+
+    async def close(self) -> None:
+        """Close the connection pool and release all connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Mesh client closed")
+
+    async def warm_up(self, url: str, connections: int = 1) -> int:
+        """
+        Open pooled connections to a host before the first real request.
+
+        Sends ``connections`` concurrent HEAD requests, so each opens its own
+        connection (DNS, TCP and TLS) and leaves it in the keep-alive pool.
+        Any HTTP response counts; the status doesn't matter.
+
+        Args:
+            url: Any URL on the upstream host
+            connections: Number of connections to open
+
+        Returns:
+            int: Number of connections that got a response
+
+        Raises:
+            httpx.HTTPError: If no connection could be opened
+        """
+        results = await asyncio.gather(
+            *(self._client.head(url) for _ in range(max(1, connections))), return_exceptions=True
+        )
+        opened = sum(1 for result in results if isinstance(result, httpx.Response))
+        if not opened:
+            raise next(result for result in results if isinstance(result, BaseException))
+        return opened
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_limits.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections_per_host)
+            self._host_limits[host] = semaphore
+        return semaphore
+
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = CircuitBreaker(endpoint, self.breaker_failure_threshold, self.breaker_reset_timeout)
+            self._breakers[endpoint] = breaker
+        return breaker
+
+    def _latency(self, endpoint: str) -> LatencyWindow:
+        window = self._latencies.get(endpoint)
+        if window is None:
+            window = LatencyWindow()
+            self._latencies[endpoint] = window
+        return window
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        idempotent: bool = False,
+        retry_on_connect_only: bool = False,
+        priority: Optional[str] = None,
+    ) -> httpx.Response:
+        """
+        Send a request through the shared pool.
+
+        The pool is opened lazily if a request arrives outside the app lifespan.
+
+        Args:
+            method: HTTP method
+            url: Absolute request URL
+            headers: Request headers
+            json: JSON request body
+            params: Query string parameters
+            idempotent: Whether the call is safe to send more than once; only
+                idempotent calls are retried and hedged
+            retry_on_connect_only: Retry a call that is not idempotent when
+                the connection could not be opened, and in no other case
+            priority: The call's scheduler priority class (see
+                ``upstream_scheduler.PRIORITIES``); defaults to the lowest
+
+        Returns:
+            httpx.Response: The upstream response (the last one, if every
+                attempt returned a retryable status)
+
+        Raises:
+            CircuitOpenError: If the endpoint's circuit breaker is open
+            UpstreamOverloaded: If the scheduler shed the call
+            httpx.HTTPError: If the request could not be completed
+        """
+        if not self.is_open:
+            await self.start()
+        endpoint = urlsplit(url).path or "/"
+        breaker = self._breaker(endpoint)
+        attempts = self.retry_attempts if idempotent or retry_on_connect_only else 1
+        kwargs = {"headers": headers, "json": json, "params": params}
+
+        for attempt in range(attempts):
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                MESH_REQUEST_ERRORS.labels(endpoint, "circuit_open").inc()
+                raise
+            self._stats["requests"] += 1
+            try:
+                if idempotent and self.hedge:
+                    response = await self._send_hedged(endpoint, method, url, kwargs, priority)
+                else:
+                    response = await self._send(endpoint, method, url, kwargs, priority)
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                if attempt + 1 >= attempts or not (idempotent or isinstance(e, httpx.ConnectError)):
+                    raise
+                delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+                logger.warning("Mesh %s %s failed (%s); retrying in %.2fs", method, endpoint, e, delay)
+            except BaseException:
+                # Cancelled or unexpected: don't leave a half-open probe hanging
+                breaker.release()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if attempt + 1 >= attempts or not idempotent:
+                    return response
+                delay = max(
+                    backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay),
+                    self._retry_after(response),
+                )
+                logger.warning(
+                    "Mesh %s %s returned %s; retrying in %.2fs",
+                    method, endpoint, response.status_code, delay,
+                )
+            self._stats["retries"] += 1
+            MESH_RETRIES.labels(endpoint).inc()
+            await asyncio.sleep(delay)
+
+    async def _send(
+        self, endpoint: str, method: str, url: str, kwargs: Dict[str, Any], priority: Optional[str]
+    ) -> httpx.Response:
+        if self.scheduler is None:
+            return await self._send_now(endpoint, method, url, kwargs)
+        async with self.scheduler.slot(priority):
+            return await self._send_now(endpoint, method, url, kwargs)
+
+    async def _send_now(self, endpoint: str, method: str, url: str, kwargs: Dict[str, Any]) -> httpx.Response:
+        in_flight = MESH_REQUESTS_IN_FLIGHT.labels(endpoint)
+        in_flight.inc()
+        started = time.monotonic()
+        try:
+            async with self._host_limit(url):
+                response = await self._client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            MESH_REQUEST_ERRORS.labels(endpoint, "transport").inc()
+            raise
+        finally:
+            in_flight.dec()
+            elapsed = time.monotonic() - started
+            MESH_REQUEST_SECONDS.labels(endpoint).observe(elapsed)
+        if response.status_code >= 400:
+            MESH_REQUEST_ERRORS.labels(endpoint, str(response.status_code)).inc()
+        if response.status_code < 500:
+            self._latency(endpoint).record(elapsed)
+        return response
+
+    async def _send_hedged(
+        self, endpoint: str, method: str, url: str, kwargs: Dict[str, Any], priority: Optional[str]
+    ) -> httpx.Response:
+        p95 = self._latency(endpoint).percentile(HEDGE_PERCENTILE)
+        if p95 is None:
+            return await self._send(endpoint, method, url, kwargs, priority)
+        primary = asyncio.ensure_future(self._send(endpoint, method, url, kwargs, priority))
+        done, _ = await asyncio.wait({primary}, timeout=max(p95, self.hedge_min_delay))
+        if done:
+            return primary.result()
+
+        self._stats["hedged"] += 1
+        hedge = asyncio.ensure_future(self._send(endpoint, method, url, kwargs, priority))
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code not in RETRYABLE_STATUS_CODES:
+                        if task is hedge:
+                            self._stats["hedge_wins"] += 1
+                        return task.result()
+                if not pending:
+                    # Both copies failed: surface the last one's outcome
+                    return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _retry_after(self, response: httpx.Response) -> float:
+        try:
+            return min(float(response.headers.get("retry-after", 0)), self.retry_max_delay)
+        except ValueError:
+            return 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report retry and hedging counters and per-endpoint breaker state.
+
+        Returns:
+            Dict[str, Any]: Counters, scheduler occupancy, plus breaker state and
+                p95 latency by endpoint
+        """
+        endpoints = {}
+        for endpoint, breaker in self._breakers.items():
+            p95 = self._latency(endpoint).percentile(HEDGE_PERCENTILE)
+            endpoints[endpoint] = {**breaker.stats(), "p95_seconds": p95}
+        scheduler = self.scheduler.stats() if self.scheduler is not None else None
+        return {**self._stats, "hedging": self.hedge, "scheduler": scheduler, "endpoints": endpoints}
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a GET request through the shared pool."""
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a POST request through the shared pool."""
+        return await self.request("POST", url, **kwargs)
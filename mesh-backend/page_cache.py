@@ -0,0 +1,233 @@
+"""
+Page Caches
+
+Caches for HTML pages whose output does not depend on the request.
+
+``RenderCache`` keeps the rendered bytes and ETag of such pages, so each page
+is rendered once and repeat visits can be answered with 304 Not Modified.
+``FileConfigCache`` keeps a parsed JSON config file (such as
+``receiving_addresses.json``) and reloads it only when the file changes on
+disk.
+
+In dev mode the render cache also watches the template directory and drops
+every rendered page when a template is edited.
+
+``LazyTemplates`` defers importing Jinja2 and building the template
+environment until the first render, or until start-up warm-up precompiles
+the templates, so importing the app stays fast.
+"""
+
+# --- Standard Library Imports ---
+import hashlib
+import json
+import logging
+import os
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Tuple
+
+# --- Third-Party Imports ---
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+
+if TYPE_CHECKING:
+    from fastapi.templating import Jinja2Templates
+
+logger = logging.getLogger(__name__)
+
+
+class LazyTemplates:
+    """``Jinja2Templates`` built on first use; attribute access is forwarded to it."""
+
+    def __init__(self, directory: str, globals: Optional[Dict[str, Callable]] = None):
+        """
+        Args:
+            directory: Template directory
+            globals: Names added to the template environment's globals
+        """
+        self.directory = directory
+        self.globals = globals or {}
+        self._templates: Optional["Jinja2Templates"] = None
+
+    def load(self) -> "Jinja2Templates":
+        """Return the template renderer, building it on first call."""
+        if self._templates is None:
+            from fastapi.templating import Jinja2Templates
+
+            templates = Jinja2Templates(directory=self.directory)
+            templates.env.globals.update(self.globals)
+            self._templates = templates
+        return self._templates
+
+    def precompile(self) -> int:
+        """
+        Compile every template in the directory ahead of the first request.
+
+        Returns:
+            int: Number of templates compiled
+        """
+        env = self.load().env
+        names = env.list_templates(extensions=["html"])
+        for name in names:
+            env.get_template(name)
+        return len(names)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
+
+
+class FileConfigCache:
+    """Parsed contents of a JSON file, reloaded when its mtime or size changes."""
+
+    def __init__(self, path: str, default: Any):
+        """
+        Args:
+            path: Path of the JSON file
+            default: Value returned while the file is missing or invalid
+        """
+        self.path = path
+        self.default = default
+        self._signature: Optional[Tuple[float, int]] = None
+        self._loaded = False
+        self._value = default
+        self._stats = {"loads": 0, "errors": 0}
+
+    @property
+    def version(self) -> Optional[Tuple[float, int]]:
+        """The (mtime, size) of the file as last loaded, or None if absent."""
+        return self._signature
+
+    def get(self) -> Any:
+        """
+        Return the file contents, reloading them if the file changed.
+
+        Returns:
+            Any: Parsed JSON, or the default if the file is missing or invalid
+        """
+        try:
+            stat_result = os.stat(self.path)
+            signature = (stat_result.st_mtime, stat_result.st_size)
+        except FileNotFoundError:
+            signature = None
+        if self._loaded and signature == self._signature:
+            return self._value
+
+        self._loaded = True
+        self._signature = signature
+        self._stats["loads"] += 1
+        if signature is None:
+            logger.warning("%s not found; using the default", self.path)
+            self._value = self.default
+            return self._value
+        try:
+            with open(self.path, "r") as f:
+                self._value = json.load(f)
+            logger.info("Loaded %s", self.path)
+        except (OSError, ValueError) as e:
+            self._stats["errors"] += 1
+            logger.warning("%s could not be loaded (%s); using the default", self.path, e)
+            self._value = self.default
+        return self._value
+
+    def invalidate(self) -> None:
+        """Force the next ``get`` to re-read the file."""
+        self._loaded = False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report reload counters.
+
+        Returns:
+            Dict[str, Any]: Path, load and error counts
+        """
+        return {"path": self.path, "present": self._signature is not None, **self._stats}
+
+
+class RenderCache:
+    """Rendered bytes and ETags of pages that need no per-request data."""
+
+    def __init__(
+        self,
+        templates: "Jinja2Templates",
+        template_dir: str,
+        watch_templates: bool = False,
+        dependents: Tuple[FileConfigCache, ...] = (),
+    ):
+        """
+        Args:
+            templates: Template renderer
+            template_dir: Directory the templates are loaded from
+            watch_templates: Re-render pages after a template changes (dev mode)
+            dependents: Config caches to invalidate along with the pages
+        """
+        self.name = "pages"
+        self.templates = templates
+        self.template_dir = template_dir
+        self.watch_templates = watch_templates
+        self.dependents = dependents
+        self._pages: Dict[Hashable, Tuple[Any, bytes, str]] = {}
+        self._templates_mtime: Optional[float] = None
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def response(
+        self,
+        request: Request,
+        name: str,
+        context: Optional[Dict[str, Any]] = None,
+        version: Any = None,
+    ) -> Response:
+        """
+        Serve a page from the cache, rendering it on first use.
+
+        Args:
+            request: FastAPI request object
+            name: Template name
+            context: Template variables; must be the same for every request
+                with the same ``version``
+            version: Identity of the data in ``context``; a different value
+                re-renders the page
+
+        Returns:
+            Response: The page, or 304 if the client's ETag still matches
+        """
+        if self.watch_templates:
+            self._check_templates()
+        cached = self._pages.get(name)
+        if cached is not None and cached[0] == version:
+            self._stats["hits"] += 1
+            _, body, etag = cached
+        else:
+            self._stats["misses"] += 1
+            body = self.templates.get_template(name).render({"request": request, **(context or {})}).encode()
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            self._pages[name] = (version, body, etag)
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip(" W/") for tag in if_none_match.split(",")):
+            self._stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return HTMLResponse(body, headers=headers)
+
+    def clear(self) -> None:
+        """Drop every rendered page and invalidate dependent config caches."""
+        self._pages.clear()
+        for dependent in self.dependents:
+            dependent.invalidate()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report hit/miss counters and the number of cached pages.
+
+        Returns:
+            Dict[str, Any]: Page count and counters
+        """
+        return {"pages": len(self._pages), "watch_templates": self.watch_templates, **self._stats}
+
+    def _check_templates(self) -> None:
+        mtime = max(
+            (entry.stat().st_mtime for entry in os.scandir(self.template_dir) if entry.is_file()),
+            default=0.0,
+        )
+        if self._templates_mtime is not None and mtime != self._templates_mtime:
+            logger.info("Templates changed; clearing rendered pages")
+            self.clear()
+        self._templates_mtime = mtime
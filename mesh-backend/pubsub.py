@@ -0,0 +1,170 @@
+"""
+In-Process Pub/Sub
+
+Topic-based fan-out used to push state changes (such as transfer status
+transitions) to WebSocket subscribers in the same worker.
+
+Each subscriber owns a mailbox that keeps only the latest undelivered message
+per topic. A slow client therefore never builds up a backlog: newer status
+updates replace older ones it has not read yet, and publishing never blocks.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+
+class Subscription:
+    """A subscriber's topic set and coalescing mailbox."""
+
+    def __init__(self, max_topics: int):
+        """
+        Args:
+            max_topics: Maximum number of topics this subscriber may follow
+        """
+        self.max_topics = max_topics
+        self.topics: Set[str] = set()
+        self._mailbox: "OrderedDict[str, Any]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self.coalesced = 0
+
+    def deliver(self, topic: str, message: Any) -> None:
+        """
+        Queue a message, replacing any undelivered message for the same topic.
+
+        Args:
+            topic: Topic the message was published on
+            message: Message payload
+        """
+        if topic in self._mailbox:
+            self.coalesced += 1
+            self._mailbox.move_to_end(topic)
+        self._mailbox[topic] = message
+        self._ready.set()
+
+    async def next_batch(self, timeout: float) -> List[Tuple[str, Any]]:
+        """
+        Wait for pending messages and take all of them.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            List[Tuple[str, Any]]: (topic, message) pairs in publish order;
+                empty if the timeout passed first
+        """
+        if not self._mailbox:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        batch = list(self._mailbox.items())
+        self._mailbox.clear()
+        return batch
+
+
+class TooManyTopics(Exception):
+    """Raised when a subscriber asks for more topics than it is allowed."""
+
+
+class PubSub:
+    """Topic registry that fans published messages out to subscribers."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._connections: Set[Subscription] = set()
+        self._stats = {"published": 0, "delivered": 0}
+
+    def open(self, max_topics: int) -> Subscription:
+        """
+        Create a subscriber.
+
+        Args:
+            max_topics: Maximum number of topics the subscriber may follow
+
+        Returns:
+            Subscription: The new subscriber
+        """
+        subscription = Subscription(max_topics)
+        self._connections.add(subscription)
+        return subscription
+
+    def close(self, subscription: Subscription) -> None:
+        """
+        Remove a subscriber from every topic it follows.
+
+        Args:
+            subscription: Subscriber to remove
+        """
+        self.unsubscribe(subscription, list(subscription.topics))
+        self._connections.discard(subscription)
+
+    def subscribe(self, subscription: Subscription, topics: Iterable[str]) -> None:
+        """
+        Add topics to a subscriber.
+
+        Args:
+            subscription: Subscriber
+            topics: Topics to follow
+
+        Raises:
+            TooManyTopics: If the subscriber would exceed its topic limit
+        """
+        new_topics = set(topics) - subscription.topics
+        if len(subscription.topics) + len(new_topics) > subscription.max_topics:
+            raise TooManyTopics(f"At most {subscription.max_topics} topics per subscriber")
+        for topic in new_topics:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        subscription.topics |= new_topics
+
+    def unsubscribe(self, subscription: Subscription, topics: Iterable[str]) -> None:
+        """
+        Remove topics from a subscriber.
+
+        Args:
+            subscription: Subscriber
+            topics: Topics to stop following
+        """
+        for topic in topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+            subscription.topics.discard(topic)
+
+    def publish(self, topic: str, message: Any) -> int:
+        """
+        Deliver a message to every subscriber of a topic without blocking.
+
+        Args:
+            topic: Topic to publish on
+            message: Message payload
+
+        Returns:
+            int: Number of subscribers the message was delivered to
+        """
+        self._stats["published"] += 1
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return 0
+        for subscription in subscribers:
+            subscription.deliver(topic, message)
+        self._stats["delivered"] += len(subscribers)
+        return len(subscribers)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report subscriber and topic counts and delivery counters.
+
+        Returns:
+            Dict[str, Any]: Connection, topic and message counters
+        """
+        return {
+            "subscribers": len(self._connections),
+            "topics": len(self._subscribers),
+            "coalesced": sum(s.coalesced for s in self._connections),
+            **self._stats,
+        }
@@ -0,0 +1,232 @@
+"""
+Transfer Reconciliation
+
+Resolves transfers that stay ``pending`` because the browser that started
+them never reported back and no webhook arrived.
+
+The reconciler follows ``transfer_storage`` writes through a store listener.
+When a transfer is written as pending it goes onto a min-heap keyed by the
+time it becomes due for a check, ``stale_after`` seconds later. Each tick
+only pops the entries that are due, so the cost of a tick depends on the
+number of due transfers, not on the size of the store. Entries that were
+resolved or expired in the meantime are skipped when popped.
+
+Due transfers are checked against Mesh in batches of up to ``batch_size``,
+at most ``concurrency`` at a time and no faster than ``rate`` checks per
+second. A final status is written back with its transaction hash. A
+transfer that is still pending, or whose check failed, is checked again
+later with exponential backoff, until it leaves the store.
+
+With a shared state backend every worker follows every write, so each
+worker checks the transfers independently.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+import heapq
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# --- Local Imports ---
+from admission import TokenBucket
+from metrics import REGISTRY
+from state_store import StateStore
+
+logger = logging.getLogger(__name__)
+
+# --- Metrics ---
+RECONCILER_CHECKS = REGISTRY.counter(
+    "reconciler_checks_total", "Pending transfers checked against Mesh, by outcome", ("outcome",)
+)
+RECONCILER_LAG_SECONDS = REGISTRY.histogram(
+    "reconciler_lag_seconds",
+    "How long after falling due a pending transfer was checked",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+# Outcome of one check: a final status and transaction hash, or None while still pending
+CheckResult = Optional[Tuple[str, Optional[str]]]
+
+
+class TransferReconciler:
+    """Checks stale pending transfers against Mesh on a due-time schedule."""
+
+    def __init__(
+        self,
+        store: StateStore,
+        check: Callable[[str], Awaitable[CheckResult]],
+        pending_status: str = "pending",
+        stale_after: float = 120.0,
+        interval: float = 5.0,
+        batch_size: int = 50,
+        rate: float = 5.0,
+        concurrency: int = 5,
+        max_backoff: float = 600.0,
+    ):
+        """
+        Args:
+            store: The transfer store to follow and resolve entries in
+            check: Looks a transfer up in Mesh by request ID
+            pending_status: Status of an unresolved transfer
+            stale_after: Seconds a transfer may stay pending before it is checked
+            interval: Seconds between ticks
+            batch_size: Maximum transfers checked per tick
+            rate: Maximum checks per second
+            concurrency: Maximum checks in flight at once
+            max_backoff: Upper bound in seconds between checks of one transfer
+        """
+        self.store = store
+        self.check = check
+        self.pending_status = pending_status
+        self.stale_after = stale_after
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_backoff = max_backoff
+        self._bucket = TokenBucket(rate, max(1.0, rate), time.monotonic())
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}
+        self._attempts: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, Any] = {
+            "tracked": 0, "checked": 0, "resolved": 0, "still_pending": 0,
+            "skipped": 0, "errors": 0, "ticks": 0, "last_tick": None,
+        }
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def track(self, request_id: str, transfer: Dict[str, Any]) -> None:
+        """
+        Store listener: schedule a check for a transfer written as pending.
+
+        Args:
+            request_id: Transfer request ID
+            transfer: The entry as written
+        """
+        if transfer.get("status") != self.pending_status or request_id in self._due:
+            return
+        self._stats["tracked"] += 1
+        self._schedule(request_id, time.monotonic() + self.stale_after)
+
+    async def start(self) -> None:
+        """Schedule transfers already pending (e.g. replayed from a journal) and start ticking."""
+        if self._task is not None:
+            return
+        now = time.monotonic()
+        for request_id in list(self.store):
+            transfer = self.store.get(request_id)
+            if transfer is not None and transfer["status"] == self.pending_status and request_id not in self._due:
+                # How long they have been pending is unknown: check them soon
+                self._schedule(request_id, now)
+        self._task = asyncio.create_task(self._run(), name="transfer-reconciler")
+
+    async def stop(self) -> None:
+        """Stop ticking; checks in flight are cancelled."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _schedule(self, request_id: str, due_at: float) -> None:
+        self._due[request_id] = due_at
+        heapq.heappush(self._heap, (due_at, request_id))
+
+    def _pop_due(self, now: float) -> List[Tuple[str, float]]:
+        batch = []
+        while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+            due_at, request_id = heapq.heappop(self._heap)
+            # A rescheduled transfer leaves its old heap entry behind; skip it
+            if self._due.get(request_id) != due_at:
+                continue
+            del self._due[request_id]
+            batch.append((request_id, due_at))
+        return batch
+
+    async def _run(self) -> None:
+        limit = asyncio.Semaphore(self.concurrency)
+        while True:
+            await asyncio.sleep(self.interval)
+            started = time.monotonic()
+            batch = self._pop_due(started)
+            if batch:
+                resolved = self._stats["resolved"]
+                await asyncio.gather(*(self._reconcile(request_id, due_at, limit) for request_id, due_at in batch))
+                if self._stats["resolved"] > resolved:
+                    await self.store.commit()
+            self._stats["ticks"] += 1
+            self._stats["last_tick"] = {"checked": len(batch), "seconds": time.monotonic() - started}
+
+    async def _throttle(self) -> None:
+        while True:
+            wait = self._bucket.take(time.monotonic())
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def _reconcile(self, request_id: str, due_at: float, limit: asyncio.Semaphore) -> None:
+        async with limit:
+            transfer = self.store.get(request_id)
+            if transfer is None or transfer["status"] != self.pending_status:
+                # Expired, or resolved by the browser or a webhook
+                self._attempts.pop(request_id, None)
+                self._stats["skipped"] += 1
+                RECONCILER_CHECKS.labels("skipped").inc()
+                return
+            await self._throttle()
+            RECONCILER_LAG_SECONDS.labels().observe(time.monotonic() - due_at)
+            self._stats["checked"] += 1
+            try:
+                result = await self.check(request_id)
+            except Exception as e:
+                self._stats["errors"] += 1
+                RECONCILER_CHECKS.labels("error").inc()
+                logger.warning("Reconciling transfer %s failed: %s", request_id, e)
+                self._retry_later(request_id)
+                return
+            if result is None:
+                self._stats["still_pending"] += 1
+                RECONCILER_CHECKS.labels("pending").inc()
+                self._retry_later(request_id)
+                return
+            status, tx_hash = result
+            # The browser or a webhook may have resolved it while Mesh was answering
+            transfer = self.store.get(request_id)
+            if transfer is None or transfer["status"] != self.pending_status:
+                self._attempts.pop(request_id, None)
+                self._stats["skipped"] += 1
+                RECONCILER_CHECKS.labels("skipped").inc()
+                return
+            self.store.patch(request_id, status=status, tx_hash=tx_hash or transfer.get("tx_hash"))
+            self._attempts.pop(request_id, None)
+            self._stats["resolved"] += 1
+            RECONCILER_CHECKS.labels(status).inc()
+            logger.info("Reconciled transfer %s as %s", request_id, status)
+
+    def _retry_later(self, request_id: str) -> None:
+        attempts = self._attempts.get(request_id, 0) + 1
+        self._attempts[request_id] = attempts
+        delay = min(self.max_backoff, self.stale_after * (2 ** (attempts - 1)))
+        self._schedule(request_id, time.monotonic() + delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report schedule depth, lag and throughput counters.
+
+        Returns:
+            Dict[str, Any]: Scheduled and overdue transfers, how overdue the
+                oldest is, and check counters
+        """
+        now = time.monotonic()
+        overdue = [now - due_at for due_at in self._due.values() if due_at <= now]
+        return {
+            "scheduled": len(self._due),
+            "overdue": len(overdue),
+            "max_overdue_seconds": max(overdue, default=0.0),
+            **self._stats,
+        }
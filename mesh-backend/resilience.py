@@ -0,0 +1,155 @@
+"""
+Upstream Resilience
+
+Building blocks ``MeshClient`` uses to ride out a slow or flapping Mesh API.
+
+- ``backoff_delay`` spaces out retries with jittered exponential backoff.
+- ``CircuitBreaker`` fails calls fast while an endpoint keeps erroring, then
+  lets a single probe through to test whether it has recovered.
+- ``LatencyWindow`` tracks recent latencies so hedged requests can be sent
+  once a call is slower than the endpoint's p95.
+"""
+
+# --- Standard Library Imports ---
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# --- Third-Party Imports ---
+import httpx
+
+# --- Breaker States ---
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"Circuit open for {endpoint}; retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    Return a "full jitter" delay before retry number ``attempt``.
+
+    Args:
+        attempt: Retry number, starting at 0
+        base_delay: Delay cap for the first retry, in seconds
+        max_delay: Upper bound on any delay, in seconds
+
+    Returns:
+        float: Seconds to wait, uniformly drawn up to the exponential cap
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream endpoint.
+
+    After ``failure_threshold`` failures in a row the breaker opens and
+    rejects calls for ``reset_timeout`` seconds. It then lets one probe call
+    through; success closes it again, failure re-opens it.
+    """
+
+    def __init__(self, endpoint: str, failure_threshold: int, reset_timeout: float):
+        """
+        Args:
+            endpoint: Endpoint name used in errors and stats
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before probing
+        """
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def before_call(self) -> None:
+        """
+        Check whether a call may go out.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with a
+                probe already in flight
+        """
+        if self.state == CLOSED:
+            return
+        remaining = self._opened_at + self.reset_timeout - time.monotonic()
+        if self.state == OPEN and remaining <= 0:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        self._stats["rejected"] += 1
+        raise CircuitOpenError(self.endpoint, max(remaining, 1.0))
+
+    def record_success(self) -> None:
+        """Close the breaker after a healthy response."""
+        self._failures = 0
+        self._probing = False
+        self.state = CLOSED
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the breaker at the threshold or on a failed probe."""
+        self._failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self._stats["opened"] += 1
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give up on a call without judging the endpoint, freeing a half-open probe slot."""
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the breaker's state and counters.
+
+        Returns:
+            Dict[str, Any]: State, consecutive failures and open/reject counts
+        """
+        return {"state": self.state, "consecutive_failures": self._failures, **self._stats}
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls to one endpoint."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        """
+        Args:
+            size: Number of recent samples kept
+            min_samples: Samples needed before percentiles are reported
+        """
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        """Add a latency sample."""
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """
+        Return a latency percentile over the window.
+
+        Args:
+            pct: Percentile between 0 and 100
+
+        Returns:
+            Optional[float]: Seconds, or None until ``min_samples`` are recorded
+        """
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
@@ -0,0 +1,153 @@
+"""
+Start-up Tracking
+
+Records how long the app took to import and to warm up, and whether it is
+ready for traffic.
+
+The lifespan opens what every request needs (the Mesh connection pool, the
+state stores) before the server accepts connections. Warm-up work that only
+makes the first requests faster runs afterwards, in the background: opening
+and validating upstream connections, compiling templates, and pre-minting a
+link token. ``/health/live`` answers as soon as the server accepts
+connections. ``/health/ready`` answers 503 until warm-up has finished and
+again once shutdown begins, so a load balancer only sends traffic to a warm
+process.
+
+A warm-up step that fails or times out is logged and reported. Most steps
+don't keep the app unready: a cold connection is slower, not broken. A step
+run with ``required=True`` (checking that authenticated Mesh calls work)
+gates readiness: ``mark_ready`` refuses while it has not succeeded.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- States ---
+STARTING = "starting"
+READY = "ready"
+STOPPING = "stopping"
+
+
+class StartupTracker:
+    """Start-up phase timings and the app's readiness state."""
+
+    def __init__(self):
+        self.state = STARTING
+        self.import_seconds: Optional[float] = None
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self._started: Optional[float] = None
+        self._ready_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the app should receive traffic."""
+        return self.state == READY
+
+    def record_import(self, seconds: float) -> None:
+        """Record how long importing the app took."""
+        self.import_seconds = seconds
+
+    def begin(self) -> None:
+        """Mark the start of the lifespan's start-up."""
+        self._started = time.perf_counter()
+        self.state = STARTING
+
+    def record(self, name: str, seconds: float, error: Optional[str] = None, required: bool = False) -> None:
+        """
+        Record the outcome of a start-up phase.
+
+        Args:
+            name: Phase name
+            seconds: How long it took
+            error: Why it failed, if it did
+            required: Whether the app may only become ready once this phase succeeds
+        """
+        self.phases[name] = {"seconds": seconds, "ok": error is None, "error": error, "required": required}
+
+    def succeeded(self, name: str) -> bool:
+        """Whether a phase has been recorded and its last run succeeded."""
+        phase = self.phases.get(name)
+        return phase is not None and phase["ok"]
+
+    async def run(self, name: str, step: Awaitable[Any], timeout: float, required: bool = False) -> Any:
+        """
+        Run a warm-up step, recording its duration and outcome.
+
+        Args:
+            name: Phase name
+            step: Awaitable doing the work
+            timeout: Seconds before the step is abandoned
+            required: Keep the app unready until this step succeeds
+
+        Returns:
+            Any: The step's result, or None if it failed or timed out
+        """
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(step, timeout=timeout)
+        except asyncio.TimeoutError:
+            self.record(name, time.perf_counter() - started, f"timed out after {timeout}s", required)
+            logger.warning("Warm-up step %s timed out after %ss", name, timeout)
+            return None
+        except Exception as e:
+            self.record(name, time.perf_counter() - started, str(e), required)
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            return None
+        self.record(name, time.perf_counter() - started, required=required)
+        return result
+
+    def mark_ready(self) -> bool:
+        """
+        Open the app to traffic and log the start-up timings.
+
+        Returns:
+            bool: Whether the app is now ready; False while a required phase
+                has not succeeded, or once shutdown has begun
+        """
+        if self.state != STARTING:
+            return self.state == READY
+        failed = [name for name, phase in self.phases.items() if phase["required"] and not phase["ok"]]
+        if failed:
+            logger.warning("Not ready: required start-up step(s) failed: %s", ", ".join(failed))
+            return False
+        self.state = READY
+        if self._started is not None:
+            self._ready_seconds = time.perf_counter() - self._started
+        logger.info(
+            "Ready: import %.3fs, start-up %.3fs (%s)",
+            self.import_seconds or 0.0,
+            self._ready_seconds or 0.0,
+            ", ".join(f"{name} {phase['seconds']:.3f}s" for name, phase in self.phases.items()),
+        )
+        return True
+
+    def mark_stopping(self) -> None:
+        """Take the app out of rotation while it shuts down."""
+        self.state = STOPPING
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Report the readiness state and start-up timings.
+
+        Returns:
+            Dict[str, Any]: State, import and start-up seconds, and per-phase outcomes
+        """
+        return {
+            "status": self.state,
+            "import_seconds": self.import_seconds,
+            "startup_seconds": self._ready_seconds,
+            "phases": self.phases,
+        }
+
+    def samples(self) -> Iterator[Tuple[Tuple[str], float]]:
+        """Gauge callback: one sample per phase duration, plus import time."""
+        if self.import_seconds is not None:
+            yield ("import",), self.import_seconds
+        for name, phase in self.phases.items():
+            yield (name,), phase["seconds"]
+
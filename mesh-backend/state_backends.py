@@ -0,0 +1,614 @@
+"""
+Shared State Backends
+
+StateStore backends that several uvicorn workers on one host can use at the
+same time, so a token stored through one worker is visible to a poll that
+lands on another.
+
+``SQLiteBackend`` keeps entries in an SQLite database in WAL mode, so readers
+never block on the writer. ``FileBackend`` keeps one small file per entry in
+a directory, by default on the ``/dev/shm`` shared-memory filesystem.
+
+Both batch writes: ``set`` and ``delete`` land in a local write-behind buffer
+that is committed to the shared store in one batch at the end of the current
+event-loop iteration (group commit). Reads check the buffer first, so a worker
+always sees its own writes; callers that must make writes visible to other
+workers before answering (such as an HTTP response) await ``commit``.
+
+Commits, sweeps and change polling run in a worker thread, one at a time per
+backend, so waiting for another worker's SQLite write lock or scanning a large
+directory never stalls the event loop. Only point reads stay on the loop. A
+commit that still finds the database locked after ``WRITE_BUSY_TIMEOUT``
+seconds keeps its batch and retries ``retry_delay`` seconds later.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+# --- Local Imports ---
+from state_store import MemoryBackend, StateBackend
+
+logger = logging.getLogger(__name__)
+
+# Buffered tombstone marking a pending delete
+_DELETED = object()
+
+# Seconds a commit in a worker thread waits for another worker's write lock
+WRITE_BUSY_TIMEOUT = 5.0
+
+
+class BatchedBackend(StateBackend):
+    """Base class adding a write-behind buffer in front of a shared store."""
+
+    shared = True
+
+    def __init__(self, flush_batch: int, sweep_batch: int, retry_delay: float = 0.1):
+        """
+        Args:
+            flush_batch: Number of buffered writes that starts a commit at once,
+                even while a busy retry is waiting
+            sweep_batch: Maximum expired entries removed per sweep
+            retry_delay: Seconds before retrying a commit that found the store busy
+        """
+        self.flush_batch = flush_batch
+        self.sweep_batch = sweep_batch
+        self.retry_delay = retry_delay
+        # key -> (value, expires_at wall-clock time) or _DELETED
+        self._pending: Dict[str, Any] = {}
+        # Batch a worker thread is writing; reads still see it
+        self._inflight: Dict[str, Any] = {}
+        self._commit_task: Optional[asyncio.Task] = None
+        self._retry_handle: Optional[asyncio.TimerHandle] = None
+        # Commits, sweeps and change polls share the store's connection
+        self._io_lock = asyncio.Lock()
+        self._stats = {"flushes": 0, "flushed_writes": 0, "busy_retries": 0, "evictions": 0, "expirations": 0}
+
+    # --- StateBackend Interface ---
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._inflight.get(key)
+        if pending is _DELETED:
+            return None
+        if pending is not None:
+            value, expires_at = pending
+        else:
+            stored = self._read(key)
+            if stored is None:
+                return None
+            value, expires_at = stored
+        if expires_at <= time.time():
+            return None
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        self._pending[key] = (value, time.time() + ttl)
+        self._after_write()
+
+    def delete(self, key: str) -> bool:
+        existed = self.get(key) is not None
+        self._pending[key] = _DELETED
+        self._after_write()
+        return existed
+
+    def keys(self) -> List[str]:
+        keys = dict.fromkeys(self._stored_keys())
+        for buffered in (self._inflight, self._pending):
+            for key, pending in buffered.items():
+                if pending is _DELETED:
+                    keys.pop(key, None)
+                else:
+                    keys[key] = None
+        return list(keys)
+
+    async def stop(self) -> None:
+        if self._commit_task is not None:
+            await asyncio.gather(self._commit_task, return_exceptions=True)
+        await self.commit(force=True)
+
+    async def commit(self, force: bool = False) -> int:
+        """
+        Write every buffered change to the shared store in one batch, in a
+        worker thread.
+
+        If the store is still busy, the batch stays buffered and a retry is
+        scheduled.
+
+        Args:
+            force: Raise instead of scheduling a retry if the store is busy
+
+        Returns:
+            int: Number of changes written
+        """
+        async with self._io_lock:
+            if self._retry_handle is not None:
+                self._retry_handle.cancel()
+                self._retry_handle = None
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+            writes, deletes = _split_batch(batch)
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._write_batch, writes, deletes)
+            except Exception as e:
+                # Keep the batch; anything written since is newer
+                batch.update(self._pending)
+                self._pending = batch
+                if force or not self._is_busy(e):
+                    raise
+                # Another worker held the write lock throughout: try again shortly
+                self._retry_handle = loop.call_later(self.retry_delay, self._retry)
+                self._stats["busy_retries"] += 1
+                return 0
+            finally:
+                self._inflight = {}
+        self._stats["flushes"] += 1
+        self._stats["flushed_writes"] += len(batch)
+        return len(batch)
+
+    def flush(self) -> int:
+        """
+        Write every buffered change right away, blocking the caller.
+
+        Only for use without an event loop, such as in scripts and benchmarks;
+        code on the loop awaits ``commit`` instead.
+
+        Returns:
+            int: Number of changes written
+        """
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        self._write_batch(*_split_batch(batch))
+        self._stats["flushes"] += 1
+        self._stats["flushed_writes"] += len(batch)
+        return len(batch)
+
+    async def run_blocking(self, func: Callable[..., Any], *args: Any) -> Any:
+        async with self._io_lock:
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending_writes": len(self._pending) + len(self._inflight), **self._stats}
+
+    # --- Storage Hooks ---
+
+    def _read(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        raise NotImplementedError
+
+    def _stored_keys(self) -> List[str]:
+        raise NotImplementedError
+
+    def _write_batch(
+        self, writes: List[Tuple[str, Dict[str, Any], float]], deletes: List[str]
+    ) -> None:
+        """Write one batch to the store; called in a worker thread."""
+        raise NotImplementedError
+
+    def _is_busy(self, error: Exception) -> bool:
+        """Whether a write failed only because another process holds the store."""
+        return False
+
+    # --- Internals ---
+
+    def _after_write(self) -> None:
+        loop = _running_loop()
+        if loop is None:
+            # No event loop (e.g. scripts and benchmarks): write through
+            self.flush()
+            return
+        if self._commit_task is not None:
+            # The running commit picks these writes up when it finishes
+            return
+        if self._retry_handle is not None and len(self._pending) < self.flush_batch:
+            return
+        self._commit_task = loop.create_task(self._scheduled_commit())
+
+    def _retry(self) -> None:
+        self._retry_handle = None
+        self._after_write()
+
+    async def _scheduled_commit(self) -> None:
+        try:
+            await self.commit()
+        except Exception:
+            logger.exception("Committing %s failed", type(self).__name__)
+            return
+        finally:
+            self._commit_task = None
+        if self._pending and self._retry_handle is None:
+            # Written while the batch before was in flight
+            self._after_write()
+
+
+def _split_batch(batch: Dict[str, Any]) -> Tuple[List[Tuple[str, Dict[str, Any], float]], List[str]]:
+    writes = [(k, v[0], v[1]) for k, v in batch.items() if v is not _DELETED]
+    deletes = [k for k, v in batch.items() if v is _DELETED]
+    return writes, deletes
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class SQLiteBackend(BatchedBackend):
+    """Entries in an SQLite table, shared through a WAL-mode database file."""
+
+    def __init__(
+        self,
+        path: str,
+        table: str,
+        max_entries: int,
+        flush_batch: int = 256,
+        sweep_batch: int = 1000,
+        busy_timeout: float = 0.05,
+        retry_delay: float = 0.1,
+    ):
+        """
+        Args:
+            path: Database file path, shared by all workers
+            table: Table holding this store's entries
+            max_entries: Cap on entries; the least recently written are evicted
+            flush_batch: Number of buffered writes that starts a commit at once
+            sweep_batch: Maximum expired entries removed per sweep
+            busy_timeout: Seconds a read on the event loop waits for another worker's lock
+            retry_delay: Seconds before retrying a commit that found the database locked
+        """
+        super().__init__(flush_batch, sweep_batch, retry_delay)
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table):
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self._origin = os.getpid()
+        # Commits, sweeps and change polls run in worker threads on their own
+        # connection, which may wait for the write lock
+        self._writer = sqlite3.connect(
+            path, timeout=WRITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._writer.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, origin INTEGER NOT NULL)"
+        )
+        self._writer.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)"
+        )
+        # Point reads on the event loop only ever wait briefly
+        self._conn = sqlite3.connect(
+            path, timeout=busy_timeout, isolation_level=None, check_same_thread=False
+        )
+
+    def __len__(self) -> int:
+        # Committed entries only; a handful of buffered writes may be missing
+        return self._conn.execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+
+    def sweep(self) -> int:
+        try:
+            with self._writer:
+                self._writer.execute("BEGIN IMMEDIATE")
+                cursor = self._writer.execute(
+                    f"DELETE FROM {self.table} WHERE rowid IN ("
+                    f"SELECT rowid FROM {self.table} WHERE expires_at <= ? LIMIT ?)",
+                    (time.time(), self.sweep_batch),
+                )
+                removed = cursor.rowcount
+                # INSERT OR REPLACE gives every write a new, higher rowid, so the
+                # lowest rowids belong to the least recently written entries.
+                count = self._writer.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+                evicted = min(count - self.max_entries, self.sweep_batch)
+                if evicted > 0:
+                    self._writer.execute(
+                        f"DELETE FROM {self.table} WHERE rowid IN ("
+                        f"SELECT rowid FROM {self.table} ORDER BY rowid LIMIT ?)",
+                        (evicted,),
+                    )
+                    self._stats["evictions"] += evicted
+        except sqlite3.OperationalError as e:
+            if not self._is_busy(e):
+                raise
+            # Another worker is writing; the next sweep catches up
+            return 0
+        self._stats["expirations"] += removed
+        return removed
+
+    def changes_since(self, cursor: Optional[int]) -> Tuple[int, List[Tuple[str, Dict[str, Any]]]]:
+        if cursor is None:
+            row = self._writer.execute(f"SELECT MAX(rowid) FROM {self.table}").fetchone()
+            return row[0] or 0, []
+        rows = self._writer.execute(
+            f"SELECT rowid, key, value FROM {self.table} "
+            "WHERE rowid > ? AND origin != ? ORDER BY rowid",
+            (cursor, self._origin),
+        ).fetchall()
+        if not rows:
+            # Move past this worker's own writes too
+            row = self._writer.execute(f"SELECT MAX(rowid) FROM {self.table}").fetchone()
+            return max(cursor, row[0] or 0), []
+        return rows[-1][0], [(key, json.loads(value)) for _, key, value in rows]
+
+    async def stop(self) -> None:
+        await super().stop()
+        self._conn.close()
+        self._writer.close()
+
+    def _read(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        row = self._conn.execute(
+            f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _stored_keys(self) -> List[str]:
+        return [row[0] for row in self._conn.execute(
+            f"SELECT key FROM {self.table} WHERE expires_at > ?", (time.time(),)
+        )]
+
+    def _is_busy(self, error: Exception) -> bool:
+        return isinstance(error, sqlite3.OperationalError) and (
+            "locked" in str(error) or "busy" in str(error)
+        )
+
+    def _write_batch(
+        self, writes: List[Tuple[str, Dict[str, Any], float]], deletes: List[str]
+    ) -> None:
+        with self._writer:
+            self._writer.execute("BEGIN IMMEDIATE")
+            if writes:
+                self._writer.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, origin) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(k, json.dumps(v), e, self._origin) for k, v, e in writes],
+                )
+            if deletes:
+                self._writer.executemany(
+                    f"DELETE FROM {self.table} WHERE key = ?", [(k,) for k in deletes]
+                )
+
+
+def default_shared_directory() -> str:
+    """
+    Return the default base directory for FileBackend.
+
+    Returns:
+        str: ``/dev/shm/mesh-state`` when shared memory is available, otherwise
+            a directory under the system temp dir
+    """
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "mesh-state")
+
+
+class FileBackend(BatchedBackend):
+    """
+    One file per entry in a shared directory.
+
+    Files are replaced atomically, and each file's mtime is set to the entry's
+    expiry time, so the sweeper can expire entries from ``stat`` alone. When
+    the store is over its cap, the sweeper evicts the entries closest to
+    expiry from each batch it visits, which approximates LRU order.
+
+    Every write also drops an empty marker file named after the write time,
+    the writing process and the entry into a ``.changes`` subdirectory, so
+    other workers can follow writes by listing that small directory instead
+    of the entries. Markers are removed after ``CHANGE_RETENTION`` seconds.
+    """
+
+    #: Seconds a change marker is kept for other workers to see
+    CHANGE_RETENTION = 10.0
+
+    def __init__(
+        self,
+        directory: str,
+        max_entries: int,
+        flush_batch: int = 256,
+        sweep_batch: int = 1000,
+    ):
+        """
+        Args:
+            directory: Directory holding this store's entry files
+            max_entries: Approximate cap on entries
+            flush_batch: Number of buffered writes that starts a commit at once
+            sweep_batch: Maximum files visited per sweep
+        """
+        super().__init__(flush_batch, sweep_batch)
+        self.directory = directory
+        self.max_entries = max_entries
+        self._changes = os.path.join(directory, ".changes")
+        os.makedirs(self._changes, exist_ok=True)
+        self._origin = os.getpid()
+        self._scan: Optional[Iterator[os.DirEntry]] = None
+        self._scan_count = 0
+        # Counted at start and by every full sweep pass
+        self._last_count: Optional[int] = None
+
+    def __len__(self) -> int:
+        if self._last_count is None:
+            self._last_count = self._count_entries()
+        return self._last_count
+
+    async def start(self) -> None:
+        self._last_count = await self.run_blocking(self._count_entries)
+
+    def sweep(self) -> int:
+        self._prune_changes()
+        if self._scan is None:
+            self._scan = os.scandir(self.directory)
+            self._scan_count = 0
+        now = time.time()
+        batch: List[Tuple[float, str]] = []
+        for entry in self._scan:
+            if entry.name.startswith("."):
+                continue
+            try:
+                batch.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+            if len(batch) >= self.sweep_batch:
+                break
+        else:
+            self._scan.close()
+            self._scan = None
+
+        removed = 0
+        excess = len(self) - self.max_entries
+        batch.sort()
+        for expires_at, path in batch:
+            if expires_at <= now or excess > 0:
+                if self._unlink(path):
+                    if expires_at <= now:
+                        removed += 1
+                    else:
+                        excess -= 1
+                        self._stats["evictions"] += 1
+                continue
+            self._scan_count += 1
+        if self._scan is None:
+            self._last_count = self._scan_count
+        self._stats["expirations"] += removed
+        return removed
+
+    def changes_since(self, cursor: Optional[Set[str]]) -> Tuple[Set[str], List[Tuple[str, Dict[str, Any]]]]:
+        # The cursor is the set of markers already seen; markers sort by write time
+        markers = set(os.listdir(self._changes))
+        if cursor is None:
+            return markers, []
+        changes: Dict[str, Dict[str, Any]] = {}
+        now = time.time()
+        for marker in sorted(markers - cursor):
+            _, origin, name = marker.split("-", 2)
+            if int(origin) == self._origin:
+                continue
+            stored = self._load(os.path.join(self.directory, name))
+            if stored is not None and stored[2] > now:
+                changes[stored[0]] = stored[1]
+        return markers, list(changes.items())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def _entries(self) -> Iterator[os.DirEntry]:
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                # Skip temp files being written and the change markers
+                if not entry.name.startswith("."):
+                    yield entry
+
+    def _count_entries(self) -> int:
+        return sum(1 for _ in self._entries())
+
+    def _prune_changes(self) -> None:
+        cutoff = time.time_ns() - int(self.CHANGE_RETENTION * 1e9)
+        for marker in os.listdir(self._changes):
+            if int(marker.split("-", 1)[0]) < cutoff:
+                self._unlink(os.path.join(self._changes, marker))
+
+    @staticmethod
+    def _load(path: str) -> Optional[Tuple[str, Dict[str, Any], float]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return data["key"], data["value"], data["expires_at"]
+
+    @staticmethod
+    def _unlink(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _read(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        stored = self._load(self._path(key))
+        if stored is None or stored[0] != key:
+            return None
+        return stored[1], stored[2]
+
+    def _stored_keys(self) -> List[str]:
+        keys = []
+        now = time.time()
+        for entry in self._entries():
+            stored = self._load(entry.path)
+            if stored is not None and stored[2] > now:
+                keys.append(stored[0])
+        return keys
+
+    def _write_batch(
+        self, writes: List[Tuple[str, Dict[str, Any], float]], deletes: List[str]
+    ) -> None:
+        for key, value, expires_at in writes:
+            path = self._path(key)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "value": value, "expires_at": expires_at}, f)
+            os.utime(tmp_path, (expires_at, expires_at))
+            os.replace(tmp_path, path)
+            marker = f"{time.time_ns():020d}-{self._origin}-{os.path.basename(path)}"
+            open(os.path.join(self._changes, marker), "w").close()
+        for key in deletes:
+            self._unlink(self._path(key))
+
+
+def create_backend(
+    kind: str,
+    name: str,
+    fields: Tuple[str, ...],
+    max_entries: int,
+    sweep_batch: int,
+    path: str,
+    flush_batch: int,
+    busy_timeout: float = 0.05,
+) -> StateBackend:
+    """
+    Build the StateStore backend selected in the settings.
+
+    Args:
+        kind: ``memory``, ``sqlite`` or ``file``
+        name: Store name, used as the table or subdirectory name
+        fields: Field names of a record
+        max_entries: Cap on entries
+        sweep_batch: Maximum entries visited per sweep
+        path: SQLite database file or FileBackend base directory; empty for the default
+        flush_batch: Number of buffered writes that triggers an immediate flush
+        busy_timeout: Seconds an SQLite read on the event loop waits for another worker's lock
+
+    Returns:
+        StateBackend: The configured backend
+
+    Raises:
+        ValueError: If the backend kind is unknown
+    """
+    if kind == "memory":
+        return MemoryBackend(fields, max_entries, sweep_batch)
+    if kind == "sqlite":
+        return SQLiteBackend(
+            path or "mesh_state.db", name, max_entries,
+            flush_batch=flush_batch, sweep_batch=sweep_batch, busy_timeout=busy_timeout,
+        )
+    if kind == "file":
+        return FileBackend(
+            os.path.join(path or default_shared_directory(), name), max_entries,
+            flush_batch=flush_batch, sweep_batch=sweep_batch,
+        )
+    raise ValueError(f"Unknown state backend: {kind}")
@@ -0,0 +1,336 @@
+"""
+State Journal
+
+Makes the in-memory state stores survive restarts and redeploys.
+
+``JournaledBackend`` wraps a ``MemoryBackend``. Reads are served from memory
+as before. Every write and delete is also appended to a write-ahead journal
+on disk. Appends are buffered and group-committed: a background task writes
+everything buffered since the last commit with one ``fsync`` every
+``fsync_interval`` seconds, so a burst of writes costs one disk sync and the
+event loop never waits on the disk. A crash loses at most that interval's
+writes.
+
+The journal is split into numbered segments. Every ``snapshot_interval``
+seconds, or after ``snapshot_max_records`` journal records, the backend
+starts a new segment, writes a compacted snapshot of the live entries, and
+deletes the segments the snapshot covers. On startup the latest snapshot is
+loaded and the segments written after it are replayed, so recovery never
+reads more than one snapshot's worth of journal. Shutdown commits the buffer
+and writes a final snapshot, so a graceful redeploy loses nothing.
+
+Files for a store named ``token_storage``::
+
+    token_storage.snapshot          latest snapshot (JSON lines)
+    token_storage.journal.000042    journal segments (JSON lines)
+
+Expiry times are stored as wall-clock times, so entries keep their remaining
+lifetime across a restart and entries that expired while the process was
+down are dropped on replay.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+# --- Local Imports ---
+from metrics import REGISTRY
+from state_store import MemoryBackend, StateBackend
+
+logger = logging.getLogger(__name__)
+
+# --- Metrics ---
+JOURNAL_COMMIT_SECONDS = REGISTRY.histogram(
+    "state_journal_commit_seconds",
+    "Time to write and fsync one journal group commit",
+    ("store",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+SNAPSHOT_SUFFIX = ".snapshot"
+SEGMENT_PATTERN = r"\.journal\.(\d+)"
+
+
+def fsync_directory(directory: str) -> None:
+    """Persist a directory's entries, so renames and unlinks survive a crash."""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_lines(path: str) -> List[Dict[str, Any]]:
+    """
+    Read a JSON-lines file, stopping at the first damaged line.
+
+    A crash can leave the last line of a journal half written; everything
+    before it is still valid.
+
+    Args:
+        path: File to read
+
+    Returns:
+        List[Dict[str, Any]]: The decoded records
+    """
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning("Ignoring damaged record at %s:%d and anything after it", path, number)
+                break
+    return records
+
+
+class JournaledBackend(StateBackend):
+    """MemoryBackend whose writes are journaled to disk and replayed on startup."""
+
+    def __init__(
+        self,
+        inner: MemoryBackend,
+        directory: str,
+        name: str,
+        fsync_interval: float = 0.05,
+        snapshot_interval: float = 300.0,
+        snapshot_max_records: int = 100000,
+    ):
+        """
+        Args:
+            inner: In-memory backend that serves reads
+            directory: Directory for the snapshot and journal segments
+            name: Store name, used as the file name prefix
+            fsync_interval: Seconds between group commits
+            snapshot_interval: Seconds between snapshots
+            snapshot_max_records: Journal records that trigger an early snapshot
+        """
+        if not re.fullmatch(r"[A-Za-z0-9_.-]+", name):
+            raise ValueError(f"Invalid store name: {name}")
+        self.inner = inner
+        self.directory = directory
+        self.name = name
+        self.fsync_interval = fsync_interval
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_max_records = snapshot_max_records
+        os.makedirs(directory, exist_ok=True)
+        self._buffer: List[str] = []
+        self._segment = 0
+        self._file: Optional[TextIO] = None
+        self._records_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"commits": 0, "committed_records": 0, "snapshots": 0, "commit_errors": 0}
+        self._recovery: Dict[str, Any] = {}
+
+    # --- StateBackend Interface ---
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.inner.get(key)
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        self.inner.set(key, value, ttl)
+        self._append({"k": key, "v": value, "e": time.time() + ttl})
+
+    def delete(self, key: str) -> bool:
+        existed = self.inner.delete(key)
+        if existed:
+            self._append({"k": key, "d": 1})
+        return existed
+
+    def keys(self) -> List[str]:
+        return self.inner.keys()
+
+    def __len__(self) -> int:
+        return len(self.inner)
+
+    def sweep(self) -> int:
+        # Expiry is not journaled: replay drops entries whose time has passed
+        return self.inner.sweep()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.inner.stats(),
+            "journal": {
+                "segment": self._segment,
+                "buffered_records": len(self._buffer),
+                "records_since_snapshot": self._records_since_snapshot,
+                "seconds_since_snapshot": time.monotonic() - self._last_snapshot,
+                "recovery": self._recovery,
+                **self._stats,
+            },
+        }
+
+    async def start(self) -> None:
+        """Replay the snapshot and journal, then start group commits."""
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        entries, segments, records = await loop.run_in_executor(None, self._read_state)
+        self.inner.restore(entries)
+        self._segment = (max(segments) + 1) if segments else 0
+        self._file = await loop.run_in_executor(None, self._open_segment, self._segment)
+        self._recovery = {
+            "entries": len(self.inner),
+            "journal_records": records,
+            "seconds": time.perf_counter() - started,
+        }
+        logger.info(
+            "Recovered %d %s entries (%d journal records replayed) in %.3fs",
+            self._recovery["entries"], self.name, records, self._recovery["seconds"],
+        )
+        # Fold the replayed segments into a fresh snapshot right away
+        await self._snapshot()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run(), name=f"{self.name}-journal")
+
+    async def stop(self) -> None:
+        """Commit buffered records and write a final snapshot."""
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        await self._commit()
+        await self._snapshot()
+        await asyncio.get_running_loop().run_in_executor(None, self._file.close)
+        self._file = None
+
+    # --- Internals ---
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        self._buffer.append(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{self.name}.journal.{segment:06d}")
+
+    def _open_segment(self, segment: int) -> TextIO:
+        f = open(self._segment_path(segment), "a", encoding="utf-8")
+        fsync_directory(self.directory)
+        return f
+
+    def _segments(self) -> List[int]:
+        pattern = re.compile(re.escape(self.name) + SEGMENT_PATTERN + "$")
+        matches = (pattern.match(name) for name in os.listdir(self.directory))
+        return sorted(int(match.group(1)) for match in matches if match)
+
+    def _read_state(self) -> Tuple[List[Tuple[str, Dict[str, Any], float]], List[int], int]:
+        # Runs in a worker thread at startup
+        state: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        first_segment = 0
+        snapshot_path = os.path.join(self.directory, self.name + SNAPSHOT_SUFFIX)
+        if os.path.exists(snapshot_path):
+            lines = read_lines(snapshot_path)
+            if lines:
+                first_segment = lines[0]["next_segment"]
+                for line in lines[1:]:
+                    state[line["k"]] = (line["v"], line["e"])
+
+        segments = self._segments()
+        records = 0
+        for segment in segments:
+            if segment < first_segment:
+                continue
+            for line in read_lines(self._segment_path(segment)):
+                records += 1
+                if "d" in line:
+                    state.pop(line["k"], None)
+                else:
+                    state[line["k"]] = (line["v"], line["e"])
+
+        now = time.time()
+        entries = [(key, value, expires_at - now) for key, (value, expires_at) in state.items()]
+        return entries, segments, records
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.fsync_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self._commit()
+            if self._records_since_snapshot >= self.snapshot_max_records or (
+                time.monotonic() - self._last_snapshot >= self.snapshot_interval
+            ):
+                await self._snapshot()
+
+    async def _commit(self) -> None:
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        started = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_and_sync, "".join(batch))
+        except OSError:
+            # Keep the records for the next commit rather than lose them
+            self._buffer = batch + self._buffer
+            self._stats["commit_errors"] += 1
+            logger.exception("Committing the %s journal failed", self.name)
+            return
+        JOURNAL_COMMIT_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+        self._stats["commits"] += 1
+        self._stats["committed_records"] += len(batch)
+        self._records_since_snapshot += len(batch)
+
+    def _write_and_sync(self, data: str) -> None:
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    async def _snapshot(self) -> None:
+        # Writes after this point go to a new segment; the snapshot covers the
+        # older ones. Records buffered during the commit land in both, which
+        # replay handles since records hold whole values.
+        await self._commit()
+        loop = asyncio.get_running_loop()
+        self._segment += 1
+        self._file = await loop.run_in_executor(None, self._switch_segment, self._file, self._segment)
+        # Only the copy happens on the loop; encoding and syncing run in a worker thread
+        records = self.inner.copy_records()
+        try:
+            await loop.run_in_executor(None, self._write_snapshot, records, self._segment)
+        except OSError:
+            logger.exception("Writing the %s snapshot failed", self.name)
+            return
+        self._stats["snapshots"] += 1
+        self._records_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+
+    def _switch_segment(self, current: TextIO, segment: int) -> TextIO:
+        # Runs in a worker thread
+        current.close()
+        return self._open_segment(segment)
+
+    def _write_snapshot(self, records: List[Tuple[str, Any]], next_segment: int) -> None:
+        # Runs in a worker thread, so encoding a large store doesn't stall the loop
+        now = time.time()
+        offset = now - time.monotonic()
+        fields = self.inner.fields
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{self.name}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"next_segment": next_segment, "created": now}) + "\n")
+                for key, record in records:
+                    expires_at = record.expires_at + offset
+                    if expires_at <= now:
+                        continue
+                    value = dict(zip(fields, record.values))
+                    f.write(json.dumps({"k": key, "v": value, "e": expires_at}, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(self.directory, self.name + SNAPSHOT_SUFFIX))
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+        fsync_directory(self.directory)
+        for segment in self._segments():
+            if segment < next_segment:
+                os.unlink(self._segment_path(segment))
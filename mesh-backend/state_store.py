@@ -0,0 +1,473 @@
+"""
+State Store
+
+Bounded, self-expiring storage for per-request state such as pending auth
+tokens and transfer results.
+
+Each entry expires after a TTL chosen by its status (pending, complete,
+failed), the store never holds more than a fixed number of entries (least
+recently used are evicted first), and a background sweeper removes expired
+entries a small batch at a time instead of scanning the whole map.
+
+``StateStore`` is the mapping the routes use; where entries actually live is
+decided by a ``StateBackend``. ``MemoryBackend`` keeps them in this process
+and is the default. Backends shared between worker processes live in
+``state_backends.py``.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+import heapq
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StateBackend(ABC):
+    """Storage for one StateStore's entries."""
+
+    #: Whether other worker processes see this backend's entries
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the live entry for a key, or None if missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        """Write an entry that expires after ``ttl`` seconds."""
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Remove an entry; return whether it existed."""
+
+    @abstractmethod
+    def keys(self) -> List[str]:
+        """Return a snapshot of the stored keys."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Return the number of stored entries."""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Remove one batch of expired entries; return how many were removed."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Report backend-specific occupancy and counters."""
+        return {}
+
+    def changes_since(self, cursor: Any) -> Tuple[Any, List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Return entries written by other processes since ``cursor``.
+
+        Only shared backends that can follow each other's writes implement
+        this; the returned cursor is passed back on the next call.
+        """
+        raise NotImplementedError
+
+    def flush(self) -> int:
+        """Make buffered writes visible to other processes; return how many were written."""
+        return 0
+
+    async def commit(self) -> int:
+        """Like ``flush``, but without blocking the event loop."""
+        return self.flush()
+
+    async def run_blocking(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a maintenance call such as ``sweep`` or ``changes_since``.
+
+        Backends whose storage blocks (disk, locks shared with other
+        processes) run it in a worker thread; the default runs it in place.
+        """
+        return func(*args)
+
+    async def start(self) -> None:
+        """Start any background work the backend needs."""
+
+    async def stop(self) -> None:
+        """Stop background work and flush anything buffered."""
+
+
+class _Record:
+    """Compact entry: field values in a tuple plus the expiry time."""
+
+    __slots__ = ("values", "expires_at")
+
+    def __init__(self, values: Tuple[Any, ...], expires_at: float):
+        self.values = values
+        self.expires_at = expires_at
+
+
+class MemoryBackend(StateBackend):
+    """Single-process backend: an LRU-ordered dict of compact records."""
+
+    def __init__(self, fields: Tuple[str, ...], max_entries: int, sweep_batch: int = 1000):
+        """
+        Args:
+            fields: Field names of a record; must include ``status``
+            max_entries: Hard cap on entries; least recently used are evicted
+            sweep_batch: Maximum expiry checks per sweep
+        """
+        self.fields = fields
+        self.max_entries = max_entries
+        self.sweep_batch = sweep_batch
+        self._status_index = fields.index("status")
+        self._records: "OrderedDict[str, _Record]" = OrderedDict()
+        # Min-heap of (expires_at, key), so the sweeper only looks at the
+        # earliest expiry. A key has at most one live heap entry, recorded in
+        # _queued: a rewrite that expires later leaves it in place and the
+        # sweeper pushes the key back when it finds the entry is early.
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._queued: Dict[str, float] = {}
+        self._status_counts: Dict[str, int] = {}
+        self._stats = {"evictions": 0, "expirations": 0, "expiry_compactions": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if record.expires_at <= time.monotonic():
+            del self._records[key]
+            self._count(record, -1)
+            self._stats["expirations"] += 1
+            return None
+        self._records.move_to_end(key)
+        return dict(zip(self.fields, record.values))
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        values = tuple(value.get(field) for field in self.fields)
+        expires_at = time.monotonic() + ttl
+        previous = self._records.get(key)
+        if previous is not None:
+            self._count(previous, -1)
+        record = _Record(values, expires_at)
+        self._records[key] = record
+        self._records.move_to_end(key)
+        self._count(record, 1)
+        self._enqueue(key, expires_at)
+        self._evict()
+
+    def delete(self, key: str) -> bool:
+        record = self._records.pop(key, None)
+        if record is None:
+            return False
+        self._count(record, -1)
+        self._queued.pop(key, None)
+        return True
+
+    def keys(self) -> List[str]:
+        return list(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        budget = self.sweep_batch
+        removed = 0
+        heap = self._expiry_heap
+        while heap and budget > 0 and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            budget -= 1
+            # Skip entries superseded by a shorter rewrite or left by a delete or eviction
+            if self._queued.get(key) != expires_at:
+                continue
+            del self._queued[key]
+            record = self._records.get(key)
+            if record is None:
+                continue
+            if record.expires_at > now:
+                # Rewritten since it was queued: wait for the new expiry
+                self._enqueue(key, record.expires_at)
+                continue
+            del self._records[key]
+            self._count(record, -1)
+            removed += 1
+        self._stats["expirations"] += removed
+        return removed
+
+    def items(self) -> List[Tuple[str, Dict[str, Any], float]]:
+        """
+        Return every live entry with its remaining lifetime.
+
+        Returns:
+            List[Tuple[str, Dict[str, Any], float]]: (key, value, seconds left)
+                in least recently used order
+        """
+        now = time.monotonic()
+        return [
+            (key, dict(zip(self.fields, record.values)), record.expires_at - now)
+            for key, record in self._records.items()
+            if record.expires_at > now
+        ]
+
+    def copy_records(self) -> List[Tuple[str, "_Record"]]:
+        """
+        Return a shallow copy of the raw records, cheap enough for the event loop.
+
+        Records are never changed in place (a write replaces the record), so
+        the copy can be encoded in another thread while writes continue.
+
+        Returns:
+            List[Tuple[str, _Record]]: (key, record) in least recently used
+                order; records hold the field values in ``fields`` order and
+                a monotonic ``expires_at``, and may already have expired
+        """
+        return list(self._records.items())
+
+    def restore(self, entries: List[Tuple[str, Dict[str, Any], float]]) -> None:
+        """
+        Load entries that were saved elsewhere, such as a snapshot.
+
+        Args:
+            entries: (key, value, seconds left) for each entry
+        """
+        now = time.monotonic()
+        for key, value, remaining in sorted(entries, key=lambda entry: entry[2]):
+            if remaining <= 0:
+                continue
+            previous = self._records.pop(key, None)
+            if previous is not None:
+                self._count(previous, -1)
+            record = _Record(tuple(value.get(field) for field in self.fields), now + remaining)
+            self._records[key] = record
+            self._count(record, 1)
+            self._enqueue(key, record.expires_at)
+        self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "by_status": dict(self._status_counts),
+            "expiry_backlog": len(self._expiry_heap),
+            **self._stats,
+        }
+
+    def _enqueue(self, key: str, expires_at: float) -> None:
+        queued = self._queued.get(key)
+        if queued is not None and queued <= expires_at:
+            # The existing entry comes up first; the sweeper re-queues the key then
+            return
+        self._queued[key] = expires_at
+        heapq.heappush(self._expiry_heap, (expires_at, key))
+
+    def _evict(self) -> None:
+        while len(self._records) > self.max_entries:
+            key, evicted = self._records.popitem(last=False)
+            self._count(evicted, -1)
+            self._queued.pop(key, None)
+            self._stats["evictions"] += 1
+        # Superseded entries wait in the heap until they come up; past twice the
+        # entry cap, rebuild it from the live records so it stays bounded
+        if len(self._expiry_heap) > 2 * self.max_entries:
+            self._queued = {key: record.expires_at for key, record in self._records.items()}
+            self._expiry_heap = [(expires_at, key) for key, expires_at in self._queued.items()]
+            heapq.heapify(self._expiry_heap)
+            self._stats["expiry_compactions"] += 1
+
+    def _count(self, record: _Record, delta: int) -> None:
+        status = record.values[self._status_index]
+        self._status_counts[status] = self._status_counts.get(status, 0) + delta
+        if not self._status_counts[status]:
+            del self._status_counts[status]
+
+
+class StateStore(MutableMapping):
+    """
+    Mapping of request IDs to state dictionaries with per-status TTLs.
+
+    Values are handed back as new dictionaries, so changes must be written
+    back with ``store[key] = ...`` or ``patch``. The ``status`` field selects
+    the entry's TTL.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fields: Tuple[str, ...],
+        ttls: Dict[str, float],
+        default_ttl: float,
+        max_entries: int,
+        sweep_interval: float = 1.0,
+        sweep_batch: int = 1000,
+        backend: Optional[StateBackend] = None,
+        poll_interval: float = 0.25,
+    ):
+        """
+        Args:
+            name: Store name used in logs and stats
+            fields: Field names of a record; must include ``status``
+            ttls: Seconds an entry lives, keyed by its status
+            default_ttl: Seconds an entry with an unlisted status lives
+            max_entries: Hard cap on entries; least recently used are evicted
+            sweep_interval: Seconds between background sweeps
+            sweep_batch: Maximum expiry checks per sweep
+            backend: Where entries live; defaults to a MemoryBackend
+            poll_interval: Seconds between checks for writes made by other
+                workers, for shared backends that support it
+        """
+        self.name = name
+        self.fields = fields
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.poll_interval = poll_interval
+        self.backend = backend if backend is not None else MemoryBackend(fields, max_entries, sweep_batch)
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def shared(self) -> bool:
+        """Whether entries are visible to other worker processes."""
+        return self.backend.shared
+
+    # --- Mapping Interface ---
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        value = self.backend.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Dict[str, Any]) -> None:
+        written = {field: value.get(field) for field in self.fields}
+        ttl = self.ttls.get(written["status"], self.default_ttl)
+        self.backend.set(key, written, ttl)
+        self._notify(key, written)
+
+    def __delitem__(self, key: str) -> None:
+        if not self.backend.delete(key):
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return self.backend.get(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.backend.keys())
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    def patch(self, key: str, **fields: Any) -> Dict[str, Any]:
+        """
+        Update some fields of an existing entry.
+
+        Args:
+            key: Entry key
+            **fields: Field values to overwrite
+
+        Returns:
+            Dict[str, Any]: The updated entry
+
+        Raises:
+            KeyError: If the key is missing or expired
+        """
+        value = self[key]
+        value.update(fields)
+        self[key] = value
+        return value
+
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]) -> None:
+        """
+        Register a callback invoked with the key and new value after every write.
+
+        With a shared backend that can follow other workers' writes, the
+        callback also fires for those, shortly after they land.
+
+        Args:
+            listener: Callback taking the key and the written entry
+        """
+        self._listeners.append(listener)
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        """Start the backend, the background sweeper and any change watcher."""
+        if self._tasks:
+            return
+        await self.backend.start()
+        self._tasks.append(asyncio.create_task(self._sweep_loop(), name=f"{self.name}-sweeper"))
+        if self.shared and type(self.backend).changes_since is not StateBackend.changes_since:
+            self._tasks.append(asyncio.create_task(self._watch_loop(), name=f"{self.name}-watcher"))
+
+    async def stop(self) -> None:
+        """Stop background tasks and flush the backend."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.backend.stop()
+
+    async def commit(self) -> int:
+        """
+        Write buffered changes through to a shared backend.
+
+        Returns:
+            int: Number of changes written
+        """
+        return await self.backend.commit()
+
+    def sweep(self) -> int:
+        """
+        Remove one batch of expired entries.
+
+        Returns:
+            int: Number of entries removed
+        """
+        return self.backend.sweep()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report occupancy, per-status counts and eviction counters.
+
+        Returns:
+            Dict[str, Any]: Store size, capacity and backend counters
+        """
+        size = len(self.backend)
+        return {
+            "name": self.name,
+            "backend": type(self.backend).__name__,
+            "size": size,
+            "max_entries": self.max_entries,
+            "occupancy": size / self.max_entries if self.max_entries else None,
+            **self.backend.stats(),
+        }
+
+    # --- Internals ---
+
+    def _notify(self, key: str, value: Dict[str, Any]) -> None:
+        for listener in self._listeners:
+            listener(key, value)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await self.backend.run_blocking(self.backend.sweep)
+            except Exception:
+                logger.exception("Sweep of %s failed", self.name)
+                continue
+            if removed:
+                logger.debug("Swept %d expired entries from %s", removed, self.name)
+
+    async def _watch_loop(self) -> None:
+        cursor = None
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                cursor, changes = await self.backend.run_blocking(self.backend.changes_since, cursor)
+            except Exception:
+                logger.exception("Watching %s for remote writes failed", self.name)
+                continue
+            for key, value in changes:
+                self._notify(key, value)
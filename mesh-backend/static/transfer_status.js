@@ -0,0 +1,52 @@
+// static/transfer_status.js
+// Follows a transfer's status over /ws/transfer_status, falling back to
+// polling /api/transfer_status when WebSockets are unavailable.
+(function () {
+  const FINAL = new Set(["success", "failed"]);
+
+  function pollTransferStatus(requestId, onStatus) {
+    const timer = setInterval(async () => {
+      try {
+        const res = await fetch(`/api/transfer_status/${requestId}`);
+        if (!res.ok) return;
+        const status = await res.json();
+        onStatus({ request_id: requestId, ...status });
+        if (FINAL.has(status.status)) clearInterval(timer);
+      } catch (e) {
+        console.error("transfer status poll failed", e);
+      }
+    }, 3000);
+    return () => clearInterval(timer);
+  }
+
+  // Calls onStatus({request_id, status, amount, tx_hash}) on every transition
+  // until the transfer succeeds or fails. Returns a function that stops watching.
+  window.watchTransferStatus = function (requestId, onStatus) {
+    if (!window.WebSocket) return pollTransferStatus(requestId, onStatus);
+
+    const scheme = location.protocol === "https:" ? "wss" : "ws";
+    const url = `${scheme}://${location.host}/ws/transfer_status?request_id=${encodeURIComponent(requestId)}`;
+    let stopPolling = null;
+    let finished = false;
+    const ws = new WebSocket(url);
+
+    ws.onmessage = (event) => {
+      const msg = JSON.parse(event.data);
+      if (msg.type !== "status" || msg.request_id !== requestId) return;
+      onStatus(msg);
+      if (FINAL.has(msg.status)) {
+        finished = true;
+        ws.close();
+      }
+    };
+    ws.onclose = () => {
+      if (!finished && !stopPolling) stopPolling = pollTransferStatus(requestId, onStatus);
+    };
+
+    return () => {
+      finished = true;
+      ws.close();
+      if (stopPolling) stopPolling();
+    };
+  };
+})();
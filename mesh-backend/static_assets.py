@@ -0,0 +1,258 @@
+"""
+Static Assets
+
+Serves ``/static`` with precompressed variants, strong ETags and long-lived
+caching for fingerprinted files.
+
+``build_assets.py`` writes content-hashed copies of the front-end assets to
+``static/dist/`` together with ``.gz`` (and, when brotli is installed, ``.br``)
+variants and a ``manifest.json`` that maps each logical name to its hashed
+file and each built file to its ETag. Templates resolve names through
+``AssetManifest.resolve`` so they always point at the current build, and fall
+back to the unhashed file when no build has been run.
+"""
+
+# --- Standard Library Imports ---
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import stat
+from typing import Dict, List, Optional, Tuple
+
+# --- Third-Party Imports ---
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+MANIFEST_NAME = "manifest.json"
+# Preferred first; the suffix is what build_assets.py appends to the file name
+ENCODINGS: Tuple[Tuple[str, str], ...] = (("br", ".br"), ("gzip", ".gz"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """
+    Parse an Accept-Encoding header into the codings the client accepts.
+
+    Args:
+        accept_encoding: Raw header value
+
+    Returns:
+        List[str]: Lower-cased codings with a non-zero quality
+    """
+    accepted = []
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            accepted.append(coding.strip().lower())
+    return accepted
+
+
+class AssetManifest:
+    """Maps logical asset names to their content-hashed paths under ``static``."""
+
+    def __init__(self, static_dir: str, manifest_path: str):
+        """
+        Args:
+            static_dir: Directory mounted at ``/static``
+            manifest_path: Path of the manifest written by ``build_assets.py``
+        """
+        self.static_dir = static_dir
+        self.manifest_path = manifest_path
+        self._mtime: Optional[float] = None
+        self._entries: Dict[str, str] = {}
+        self._etags: Dict[str, str] = {}
+
+    def entries(self) -> Dict[str, str]:
+        """
+        Return the current manifest, reloading it if the file changed.
+
+        Returns:
+            Dict[str, str]: Logical name to hashed path, relative to ``static``
+        """
+        self._refresh()
+        return self._entries
+
+    def etag(self, path: str) -> Optional[str]:
+        """
+        Return the ETag recorded at build time for a built file.
+
+        Args:
+            path: Path relative to ``static``, including any ``.gz``/``.br`` suffix
+
+        Returns:
+            Optional[str]: The quoted ETag, or None if the build did not write this file
+        """
+        self._refresh()
+        return self._etags.get(path)
+
+    def resolve(self, name: str) -> str:
+        """
+        Return the path to reference for an asset in templates.
+
+        Args:
+            name: Logical asset path relative to ``static``, e.g.
+                ``mesh_iframe_app.bundle.js``
+
+        Returns:
+            str: The hashed path if the asset has been built, else ``name``
+        """
+        return self.entries().get(name, name)
+
+    def is_fingerprinted(self, path: str) -> bool:
+        """
+        Check whether a path is a hashed build output.
+
+        Args:
+            path: Path relative to ``static``
+
+        Returns:
+            bool: True if the manifest points at this path
+        """
+        return path in self.entries().values()
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime
+        except FileNotFoundError:
+            self._mtime, self._entries, self._etags = None, {}, {}
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.manifest_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read asset manifest %s: %s", self.manifest_path, e)
+            return
+        if "assets" in data:
+            self._entries, self._etags = data["assets"], data.get("etags", {})
+        else:
+            # Manifests from before ETags were recorded map names to paths directly
+            self._entries, self._etags = data, {}
+        self._mtime = mtime
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves ``.br``/``.gz`` siblings when the client accepts them.
+
+    Every response carries a strong ETag derived from the bytes actually sent
+    and ``Vary: Accept-Encoding`` when variants exist. Built files take their
+    ETag from the manifest; other files are hashed in the worker thread that
+    looks the path up, so the event loop never reads file contents. Files
+    listed in the asset manifest are marked immutable; everything else must
+    revalidate.
+    """
+
+    def __init__(self, *, directory: str, manifest: AssetManifest, **kwargs):
+        """
+        Args:
+            directory: Directory to serve
+            manifest: Asset manifest used to recognise fingerprinted files
+            **kwargs: Passed through to StaticFiles
+        """
+        super().__init__(directory=directory, **kwargs)
+        self.manifest = manifest
+        # path -> (size, mtime, etag) of the last version hashed
+        self._etags: Dict[str, Tuple[int, float, str]] = {}
+
+    def lookup_path(self, path: str) -> Tuple[str, Optional[os.stat_result]]:
+        # Starlette calls this in a worker thread: hash the file and its
+        # variants here so file_response only has to look the ETags up
+        full_path, stat_result = super().lookup_path(path)
+        if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+            self._hash_file(full_path, stat_result)
+            for _, suffix in ENCODINGS:
+                try:
+                    variant_stat = os.stat(full_path + suffix)
+                except OSError:
+                    continue
+                self._hash_file(full_path + suffix, variant_stat)
+        return full_path, stat_result
+
+    def file_response(
+        self,
+        full_path: str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+
+        served_path, served_stat, encoding, has_variants = self._select_variant(
+            full_path, stat_result, request_headers.get("accept-encoding", "")
+        )
+        response = FileResponse(
+            served_path, status_code=status_code, stat_result=served_stat, media_type=media_type
+        )
+        etag = self._etag(served_path, served_stat)
+        if etag is not None:
+            response.headers["etag"] = etag
+        if encoding:
+            response.headers["content-encoding"] = encoding
+        if has_variants:
+            response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = (
+            IMMUTABLE_CACHE_CONTROL if self.manifest.is_fingerprinted(self._relative(full_path)) else REVALIDATE_CACHE_CONTROL
+        )
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _select_variant(
+        self, full_path: str, stat_result: os.stat_result, accept_encoding: str
+    ) -> Tuple[str, os.stat_result, Optional[str], bool]:
+        accepted = accepted_encodings(accept_encoding)
+        has_variants = False
+        for encoding, suffix in ENCODINGS:
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            has_variants = True
+            if encoding in accepted:
+                return full_path + suffix, variant_stat, encoding, True
+        return full_path, stat_result, None, has_variants
+
+    def _etag(self, path: str, stat_result: os.stat_result) -> Optional[str]:
+        etag = self.manifest.etag(self._relative(path))
+        if etag is not None:
+            return etag
+        cached = self._etags.get(path)
+        if cached is not None and cached[:2] == (stat_result.st_size, stat_result.st_mtime):
+            return cached[2]
+        # Replaced since lookup_path hashed it: send this response without one
+        return None
+
+    def _hash_file(self, path: str, stat_result: os.stat_result) -> None:
+        if self.manifest.etag(self._relative(path)) is not None:
+            return
+        cached = self._etags.get(path)
+        if cached is not None and cached[:2] == (stat_result.st_size, stat_result.st_mtime):
+            return
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+        self._etags[path] = (stat_result.st_size, stat_result.st_mtime, f'"{digest.hexdigest()[:32]}"')
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, str(self.directory)).replace(os.sep, "/")
@@ -0,0 +1,276 @@
+"""
+Structured Logging
+
+Log records are written off the event loop, as JSON lines tagged with the
+correlation ID of the request that produced them.
+
+- A ``QueueHandler`` on the root logger only puts records on a queue; a
+  ``QueueListener`` thread formats them and writes them out, so a slow
+  terminal or log shipper never stalls a request. Messages are formatted
+  lazily: callers pass ``%s`` arguments, and a record that is filtered out
+  is never formatted at all.
+- ``correlation_id`` holds the current request's correlation ID. The
+  correlation middleware sets it from the incoming ``X-Request-Id`` header
+  (or generates one), and it is sent on to Mesh in the same header, so one
+  ID follows a request through both systems.
+- High-volume INFO lines can be sampled per logger. Sampling is keyed by
+  correlation ID, so a request's lines are kept or dropped together.
+  Warnings and errors are never sampled, and if the queue is full they wait
+  briefly for room and are then written straight to the output instead of
+  being dropped; only lower levels are dropped.
+"""
+
+# --- Standard Library Imports ---
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+import zlib
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# Header carrying the correlation ID, both inbound and to Mesh
+CORRELATION_HEADER = "X-Request-Id"
+VALID_CORRELATION_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s"
+
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "correlation_id", "color_message"}
+
+
+def new_correlation_id(incoming: Optional[str] = None) -> str:
+    """
+    Return the correlation ID for a request.
+
+    Args:
+        incoming: The caller's ``X-Request-Id`` header, if any
+
+    Returns:
+        str: The incoming ID if it is well formed, otherwise a new one
+    """
+    if incoming and VALID_CORRELATION_ID.fullmatch(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse per-logger INFO sample rates.
+
+    Args:
+        spec: Comma-separated ``logger=rate`` items, e.g. ``uvicorn.access=0.1``;
+            a rate applies to the logger and its children
+
+    Returns:
+        Dict[str, float]: Fraction of INFO and DEBUG records kept, by logger name
+
+    Raises:
+        ValueError: If an item is malformed
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.rpartition("=")
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            raise ValueError(f"Invalid sample rate {item!r}; expected logger=rate")
+    return rates
+
+
+class CorrelationFilter(logging.Filter):
+    """Tags records with the correlation ID of the request that logged them."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a configured fraction of INFO and DEBUG records per logger."""
+
+    def __init__(self, rates: Dict[str, float]):
+        """
+        Args:
+            rates: Fraction of records kept, by logger name
+        """
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+        key = getattr(record, "correlation_id", None)
+        # Same decision for every line of a request, so sampled requests stay whole
+        sample = zlib.crc32(key.encode()) / 0xFFFFFFFF if key else random.random()
+        if sample < rate:
+            return True
+        self.dropped += 1
+        return False
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            parts = name.split(".")
+            for i in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:i])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._resolved[name] = rate
+        return rate
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops low-level records when the queue is full.
+
+    Warnings and errors wait up to ``block_timeout`` seconds for room, then
+    go straight to ``fallback`` on the calling thread, so they are never lost
+    and a stuck listener can't freeze the event loop. Written that way they
+    may appear out of order with records still queued.
+    """
+
+    def __init__(self, log_queue: queue.Queue, fallback: logging.Handler, block_timeout: float = 0.05):
+        """
+        Args:
+            log_queue: Queue the listener thread drains
+            fallback: Handler that writes warnings and errors the queue has no room for
+            block_timeout: Seconds a warning or error waits for room in the queue
+        """
+        super().__init__(log_queue)
+        self.fallback = fallback
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.written_directly = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the arguments here; the listener thread does the rest
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                self.dropped += 1
+                return
+            try:
+                self.queue.put(record, timeout=self.block_timeout)
+            except queue.Full:
+                self.written_directly += 1
+                self.fallback.handle(record)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic one-line format, with the correlation ID (``-`` outside requests)."""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not getattr(record, "correlation_id", None):
+            record.correlation_id = "-"
+        return super().format(record)
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "correlation_id", None):
+            entry["correlation_id"] = record.correlation_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class LogPipeline:
+    """The queue handler, its filters and the listener thread that drains it."""
+
+    def __init__(
+        self,
+        level: str = "INFO",
+        fmt: str = "json",
+        queue_size: int = 10000,
+        sample_rates: Optional[Dict[str, float]] = None,
+        capture: Iterable[str] = (),
+    ):
+        """
+        Args:
+            level: Root log level
+            fmt: ``json`` for JSON lines, ``text`` for the classic one-line format
+            queue_size: Records buffered before INFO and DEBUG records are dropped
+            sample_rates: Fraction of INFO and DEBUG records kept, by logger name
+            capture: Loggers that have their own handlers (such as uvicorn's)
+                to route through the queue as well
+        """
+        self.level = level.upper()
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter())
+        self.handler = BoundedQueueHandler(queue.Queue(maxsize=queue_size), fallback=stream)
+        self.handler.addFilter(CorrelationFilter())
+        self.sampling = SamplingFilter(sample_rates or {})
+        self.handler.addFilter(self.sampling)
+        self.listener = logging.handlers.QueueListener(self.handler.queue, stream, respect_handler_level=True)
+        self.capture = tuple(capture)
+        self._running = False
+
+    def start(self) -> None:
+        """Install the queue handler and start the listener thread."""
+        if self._running:
+            return
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        for name in self.capture:
+            captured = logging.getLogger(name)
+            captured.handlers = [self.handler]
+            captured.propagate = False
+        self.listener.start()
+        self._running = True
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Write out everything queued and stop the listener thread."""
+        if not self._running:
+            return
+        self._running = False
+        self.listener.stop()
+
+    def samples(self) -> Iterator[Tuple[Tuple[str], int]]:
+        """Gauge callback: records dropped by sampling and by a full queue."""
+        yield ("sampled",), self.sampling.dropped
+        yield ("queue_full",), self.handler.dropped
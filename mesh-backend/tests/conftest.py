@@ -0,0 +1,25 @@
+"""
+Shared test setup.
+
+The app modules live flat in mesh-backend/ and are imported by name, so that
+directory goes on the path. Settings are read from the environment when
+main.py is imported; the values below let it import without a .env file.
+"""
+
+# --- Standard Library Imports ---
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+for name, value in {
+    "MESH_CLIENT_ID": "test-client",
+    "MESH_API_SECRET": "test-secret",
+    "SANDBOX": "1",
+    "RAINBOW_WALLET_ADDRESS": "0x0000000000000000000000000000000000000002",
+    "COINBASE_WALLET_ADDRESS": "0x0000000000000000000000000000000000000003",
+    "LINK_TOKEN_POOL_HIGH_WATERMARK": "0",
+    "RECONCILE_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,99 @@
+"""Tests for /api/transfer_preview/batch: result order, streaming, the concurrency bound and failed items."""
+
+# --- Standard Library Imports ---
+import asyncio
+import json
+from typing import Dict, List
+
+# --- Third-Party Imports ---
+import httpx
+import pytest
+
+# --- Local Imports ---
+import main
+
+
+@pytest.fixture
+def mesh_previews(monkeypatch) -> Dict[str, int]:
+    """Fake Mesh previews: each answers after ``amount / 100`` seconds; amount 13 is rejected."""
+    state = {"in_flight": 0, "max_in_flight": 0, "calls": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        amount = json.loads(request.content)["amount"]
+        state["calls"] += 1
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        try:
+            await asyncio.sleep(amount / 100)
+        finally:
+            state["in_flight"] -= 1
+        if amount == 13:
+            return httpx.Response(400, json={"message": "Amount below the minimum"})
+        return httpx.Response(200, json={"content": {"previewResult": {"previewId": f"preview-{amount:g}"}}})
+
+    monkeypatch.setattr(main.mesh_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return state
+
+
+def spec(amount: float) -> dict:
+    return {
+        "auth_token": "token",
+        "from_type": "rainbow",
+        "to_type": "coinbase",
+        "to_address": "0x0000000000000000000000000000000000000001",
+        "amount": amount,
+        "symbol": "ETH",
+    }
+
+
+def post_batch(amounts: List[float], stream: bool = False) -> httpx.Response:
+    async def send() -> httpx.Response:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/api/transfer_preview/batch",
+                params={"stream": "true"} if stream else None,
+                json={"previews": [spec(amount) for amount in amounts]},
+            )
+
+    return asyncio.run(send())
+
+
+def test_results_are_returned_in_request_order(mesh_previews):
+    response = post_batch([15, 1, 8])
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["index"] for result in body["results"]] == [0, 1, 2]
+    assert body["results"][0]["preview"]["content"]["previewResult"]["previewId"] == "preview-15"
+    assert (body["succeeded"], body["failed"]) == (3, 0)
+
+
+def test_stream_yields_results_as_they_complete(mesh_previews):
+    response = post_batch([15, 1, 8], stream=True)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [1, 2, 0]
+    assert all(line["status"] == main.SUCCESS_STATUS for line in lines)
+
+
+def test_concurrency_is_bounded(mesh_previews, monkeypatch):
+    monkeypatch.setattr(main.settings, "preview_batch_concurrency", 2)
+    response = post_batch([2] * 6)
+    assert response.json()["succeeded"] == 6
+    assert mesh_previews["calls"] == 6
+    assert mesh_previews["max_in_flight"] == 2
+
+
+def test_failed_item_does_not_fail_the_batch(mesh_previews):
+    body = post_batch([1, 13, 2]).json()
+    statuses = [result["status"] for result in body["results"]]
+    assert statuses == [main.SUCCESS_STATUS, main.FAILED_STATUS, main.SUCCESS_STATUS]
+    assert body["results"][1]["status_code"] == 502
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+
+
+def test_oversized_batch_is_rejected(mesh_previews, monkeypatch):
+    monkeypatch.setattr(main.settings, "preview_batch_max_items", 2)
+    assert post_batch([1, 1, 1]).status_code == 400
+    assert mesh_previews["calls"] == 0
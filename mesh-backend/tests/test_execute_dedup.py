@@ -0,0 +1,109 @@
+"""Tests for /api/execute_transfer deduplication and Idempotency-Key checks."""
+
+# --- Standard Library Imports ---
+import asyncio
+import uuid
+from typing import List
+
+# --- Third-Party Imports ---
+import httpx
+import pytest
+
+# --- Local Imports ---
+import main
+
+
+@pytest.fixture
+def mesh_calls(monkeypatch) -> List[str]:
+    """Route Mesh calls to a fake that records execute calls and answers slowly."""
+    calls: List[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"content": {"status": "succeeded", "transferId": f"t-{len(calls)}"}})
+
+    monkeypatch.setattr(main.mesh_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return calls
+
+
+def payload(**overrides) -> dict:
+    # A fresh preview per test, so cached results from other tests never match
+    body = {"auth_token": "token", "from_type": "rainbow", "preview_id": uuid.uuid4().hex, "mfa_code": "123456"}
+    body.update(overrides)
+    return body
+
+
+def post(body: dict, *requests_headers: dict) -> List[httpx.Response]:
+    """Send the same execute request once per headers dict, concurrently."""
+
+    async def send_all() -> List[httpx.Response]:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                *(client.post("/api/execute_transfer", json=body, headers=headers) for headers in requests_headers)
+            )
+
+    return asyncio.run(send_all())
+
+
+def test_concurrent_duplicates_reach_mesh_once(mesh_calls):
+    responses = post(payload(), {}, {}, {})
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert len({response.json()["content"]["transferId"] for response in responses}) == 1
+    assert mesh_calls.count("/api/v1/transfers/managed/execute") == 1
+
+
+def test_resubmission_is_replayed(mesh_calls):
+    body = payload()
+    (first,) = post(body, {})
+    (second,) = post(body, {})
+    assert second.status_code == 200
+    assert second.headers.get("Idempotent-Replayed") == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.json() == first.json()
+    assert mesh_calls.count("/api/v1/transfers/managed/execute") == 1
+
+
+def test_different_mfa_code_is_a_different_request(mesh_calls):
+    body = payload()
+    post(body, {})
+    (second,) = post({**body, "mfa_code": "654321"}, {})
+    assert second.status_code == 200
+    assert "Idempotent-Replayed" not in second.headers
+    assert mesh_calls.count("/api/v1/transfers/managed/execute") == 2
+
+
+def test_idempotency_key_reused_for_another_transfer_is_rejected(mesh_calls):
+    key = {"Idempotency-Key": uuid.uuid4().hex}
+    (first,) = post(payload(), key)
+    (second,) = post(payload(), key)
+    assert first.status_code == 200
+    assert second.status_code == 422
+    assert mesh_calls.count("/api/v1/transfers/managed/execute") == 1
+
+
+def test_idempotency_key_is_scoped_to_the_auth_token(mesh_calls):
+    key = {"Idempotency-Key": uuid.uuid4().hex}
+    (first,) = post(payload(auth_token="alice"), key)
+    (second,) = post(payload(auth_token="bob"), key)
+    assert (first.status_code, second.status_code) == (200, 200)
+    assert mesh_calls.count("/api/v1/transfers/managed/execute") == 2
+
+
+def test_failures_are_not_replayed(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            return httpx.Response(400, json={"message": "bad MFA code"})
+        return httpx.Response(200, json={"content": {"status": "succeeded"}})
+
+    monkeypatch.setattr(main.mesh_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    body = payload()
+    (first,) = post(body, {})
+    (second,) = post(body, {})
+    assert first.status_code == 502
+    assert second.status_code == 200
+    assert len(calls) == 2
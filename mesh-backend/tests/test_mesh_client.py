@@ -0,0 +1,68 @@
+"""Tests for MeshClient retries of calls that are not idempotent."""
+
+# --- Standard Library Imports ---
+import asyncio
+
+# --- Third-Party Imports ---
+import httpx
+import pytest
+
+# --- Local Imports ---
+from mesh_client import MeshClient
+
+URL = "https://mesh.test/api/v1/linktoken"
+
+
+def make_client(handler) -> MeshClient:
+    client = MeshClient(
+        timeout=1.0,
+        max_connections=10,
+        max_keepalive_connections=10,
+        keepalive_expiry=5.0,
+        max_connections_per_host=10,
+        retry_attempts=3,
+        retry_base_delay=0.0,
+        retry_max_delay=0.0,
+        hedge=True,
+    )
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def counting(outcomes):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(request)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={})
+
+    return handler, calls
+
+
+def test_connect_errors_are_retried():
+    handler, calls = counting([httpx.ConnectError("refused"), httpx.ConnectError("refused"), 200])
+    client = make_client(handler)
+    response = asyncio.run(client.post(URL, json={}, retry_on_connect_only=True))
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize("outcome", [httpx.ReadTimeout("slow"), httpx.RemoteProtocolError("dropped")])
+def test_errors_after_sending_are_not_retried(outcome):
+    handler, calls = counting([outcome, 200])
+    client = make_client(handler)
+    with pytest.raises(type(outcome)):
+        asyncio.run(client.post(URL, json={}, retry_on_connect_only=True))
+    assert len(calls) == 1
+
+
+def test_retryable_statuses_are_not_retried():
+    handler, calls = counting([503, 200])
+    client = make_client(handler)
+    response = asyncio.run(client.post(URL, json={}, retry_on_connect_only=True))
+    assert response.status_code == 503
+    assert len(calls) == 1
+    assert client._stats["hedged"] == 0
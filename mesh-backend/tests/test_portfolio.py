@@ -0,0 +1,120 @@
+"""Tests for /api/portfolio: totals across accounts, per-account timeouts and merge_positions."""
+
+# --- Standard Library Imports ---
+import asyncio
+import json
+import uuid
+from typing import Dict, List
+
+# --- Third-Party Imports ---
+import httpx
+import pytest
+
+# --- Local Imports ---
+import main
+
+HOLDINGS = {
+    "alice": [{"symbol": "ETH", "name": "Ethereum", "amount": 1.5}, {"symbol": "USDC", "amount": "100"}],
+    "bob": [{"symbol": "ETH", "name": "Ethereum", "amount": 0.25}],
+    "slow": [{"symbol": "ETH", "name": "Ethereum", "amount": 1000}],
+}
+
+
+@pytest.fixture
+def mesh_holdings(monkeypatch) -> List[str]:
+    """Fake Mesh holdings keyed by the auth token's prefix; ``slow`` answers after 0.2 seconds."""
+    calls: List[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        owner = json.loads(request.content)["authToken"].split("-")[0]
+        calls.append(owner)
+        if owner == "slow":
+            await asyncio.sleep(0.2)
+        if owner not in HOLDINGS:
+            return httpx.Response(401, json={"message": "Unknown auth token"})
+        content = {"institutionName": owner.title(), "cryptocurrencyPositions": HOLDINGS[owner]}
+        return httpx.Response(200, json={"content": content})
+
+    monkeypatch.setattr(main.mesh_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return calls
+
+
+def account(owner: str) -> Dict[str, str]:
+    # A fresh token per test, so holdings cached by other tests never match
+    return {"auth_token": f"{owner}-{uuid.uuid4().hex}", "from_type": "rainbow", "label": owner}
+
+
+def post_portfolio(*owners: str) -> httpx.Response:
+    async def send() -> httpx.Response:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/portfolio", json={"accounts": [account(owner) for owner in owners]})
+        # Let loads that outlived their timeout finish in the holdings cache
+        await asyncio.sleep(0.25)
+        return response
+
+    return asyncio.run(send())
+
+
+def test_positions_are_totalled_by_symbol(mesh_holdings):
+    body = post_portfolio("alice", "bob").json()
+    assert body["complete"] is True
+    assert body["totals"] == [
+        {
+            "symbol": "ETH",
+            "name": "Ethereum",
+            "amount": 1.75,
+            "by_account": [{"account": 0, "amount": 1.5}, {"account": 1, "amount": 0.25}],
+        },
+        {"symbol": "USDC", "name": None, "amount": 100.0, "by_account": [{"account": 0, "amount": 100.0}]},
+    ]
+    assert [entry["institution_name"] for entry in body["accounts"]] == ["Alice", "Bob"]
+
+
+def test_timed_out_account_is_left_out_of_the_totals(mesh_holdings, monkeypatch):
+    monkeypatch.setattr(main.settings, "portfolio_account_timeout", 0.05)
+    body = post_portfolio("bob", "slow").json()
+    assert [entry["status"] for entry in body["accounts"]] == [main.SUCCESS_STATUS, "timeout"]
+    assert (body["complete"], body["succeeded"], body["failed"]) == (False, 1, 1)
+    assert body["totals"][0]["amount"] == 0.25
+    assert body["totals"][0]["by_account"] == [{"account": 0, "amount": 0.25}]
+
+
+def test_failed_account_is_reported_without_failing_the_request(mesh_holdings):
+    response = post_portfolio("alice", "mallory")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["accounts"][1]["status"] == main.FAILED_STATUS
+    assert body["accounts"][1]["positions"] == []
+    assert [total["symbol"] for total in body["totals"]] == ["ETH", "USDC"]
+
+
+def test_too_many_accounts_are_rejected(mesh_holdings, monkeypatch):
+    monkeypatch.setattr(main.settings, "portfolio_max_accounts", 1)
+    assert post_portfolio("alice", "bob").status_code == 400
+    assert mesh_holdings == []
+
+
+def test_merge_positions_skips_malformed_amounts():
+    accounts = [
+        {"account": 0, "positions": [
+            {"symbol": "ETH", "amount": "1.5"},
+            {"symbol": "ETH", "amount": "not-a-number"},
+            {"symbol": "BTC", "amount": {"value": 1}},
+            {"amount": 3},
+        ]},
+        {"account": 1, "positions": [{"symbol": "ETH", "name": "Ethereum", "amount": None}]},
+    ]
+    assert main.merge_positions(accounts) == [
+        {
+            "symbol": "ETH",
+            "name": "Ethereum",
+            "amount": 1.5,
+            "by_account": [{"account": 0, "amount": 1.5}, {"account": 1, "amount": 0.0}],
+        },
+    ]
+
+
+def test_merge_positions_sums_without_float_drift():
+    accounts = [{"account": index, "positions": [{"symbol": "ETH", "amount": 0.1}]} for index in range(10)]
+    assert main.merge_positions(accounts)[0]["amount"] == 1.0
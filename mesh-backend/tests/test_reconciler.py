@@ -0,0 +1,157 @@
+"""Tests for transfer reconciliation: matching Mesh's answer to the transfer, and the check schedule."""
+
+# --- Standard Library Imports ---
+import asyncio
+from typing import Any, Dict, List
+
+# --- Third-Party Imports ---
+import httpx
+import pytest
+
+# --- Local Imports ---
+import main
+from reconciler import TransferReconciler
+from state_store import StateStore
+
+
+@pytest.fixture
+def mesh_items(monkeypatch) -> List[Dict[str, Any]]:
+    """Answer transfer lookups with whatever items the test puts in the returned list."""
+    items: List[Dict[str, Any]] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"content": {"items": items}})
+
+    monkeypatch.setattr(main.mesh_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return items
+
+
+def lookup(request_id: str):
+    return asyncio.run(main.get_transfer_status(request_id))
+
+
+def test_final_status_of_the_matching_transfer_is_returned(mesh_items):
+    mesh_items.append({"clientTransactionId": "req-1", "status": "Succeeded", "hash": "0xabc"})
+    assert lookup("req-1") == (main.SUCCESS_STATUS, "0xabc")
+
+
+def test_failed_transfer_is_mapped(mesh_items):
+    mesh_items.append({"clientTransactionId": "req-1", "status": "Rejected"})
+    assert lookup("req-1") == (main.FAILED_STATUS, None)
+
+
+def test_still_pending_transfer_returns_none(mesh_items):
+    mesh_items.append({"clientTransactionId": "req-1", "status": "Pending"})
+    assert lookup("req-1") is None
+
+
+@pytest.mark.parametrize("item", [
+    {"clientTransactionId": "req-2", "status": "succeeded", "hash": "0xother"},
+    {"status": "succeeded", "hash": "0xother"},
+    "not-an-item",
+], ids=["other-transfer", "no-client-transaction-id", "malformed"])
+def test_items_for_other_transfers_are_ignored(mesh_items, item):
+    # As if Mesh ignored the filter and returned its latest transfers
+    mesh_items.append(item)
+    assert lookup("req-1") is None
+
+
+def test_matching_item_is_found_among_others(mesh_items):
+    mesh_items.extend([
+        {"clientTransactionId": "req-2", "status": "failed"},
+        {"clientTransactionId": "req-1", "status": "completed", "txHash": "0xdef"},
+    ])
+    assert lookup("req-1") == (main.SUCCESS_STATUS, "0xdef")
+
+
+def test_empty_answer_returns_none(mesh_items):
+    assert lookup("req-1") is None
+
+
+def make_store() -> StateStore:
+    return StateStore("transfers", ("status", "amount", "tx_hash"), ttls={}, default_ttl=3600, max_entries=100)
+
+
+def reconcile(store: StateStore, check, seconds: float = 0.1, **options) -> TransferReconciler:
+    """Run a reconciler over the store's pending transfers for a short while."""
+    options = {"stale_after": 60.0, "interval": 0.01, "rate": 1000.0, **options}
+
+    async def scenario() -> TransferReconciler:
+        reconciler = TransferReconciler(store, check, **options)
+        await reconciler.start()
+        await asyncio.sleep(seconds)
+        await reconciler.stop()
+        return reconciler
+
+    return asyncio.run(scenario())
+
+
+def test_pending_transfer_is_resolved():
+    store = make_store()
+    store["req-1"] = {"status": "pending", "amount": 1, "tx_hash": None}
+    store["req-2"] = {"status": "success", "amount": 2, "tx_hash": "0x2"}
+    checked = []
+
+    async def check(request_id):
+        checked.append(request_id)
+        return "success", "0x1"
+
+    reconciler = reconcile(store, check)
+    assert checked == ["req-1"]
+    assert store["req-1"] == {"status": "success", "amount": 1, "tx_hash": "0x1"}
+    assert reconciler.stats()["resolved"] == 1
+    assert reconciler.stats()["scheduled"] == 0
+
+
+def test_transfer_resolved_during_the_check_is_left_alone():
+    store = make_store()
+    store["req-1"] = {"status": "pending", "amount": 1, "tx_hash": None}
+
+    async def check(request_id):
+        # The browser reports back while Mesh is answering
+        store.patch(request_id, status="failed")
+        return "success", "0x1"
+
+    reconciler = reconcile(store, check)
+    assert store["req-1"]["status"] == "failed"
+    assert (reconciler.stats()["resolved"], reconciler.stats()["skipped"]) == (0, 1)
+
+
+@pytest.mark.parametrize("outcome", ["pending", "error"])
+def test_unresolved_transfer_is_checked_again_later(outcome):
+    store = make_store()
+    store["req-1"] = {"status": "pending", "amount": 1, "tx_hash": None}
+
+    async def check(request_id):
+        if outcome == "error":
+            raise httpx.ConnectError("Mesh unreachable")
+        return None
+
+    reconciler = reconcile(store, check, stale_after=60.0)
+    stats = reconciler.stats()
+    # Checked once, then backed off instead of being checked every tick
+    assert stats["checked"] == 1
+    assert (stats["scheduled"], stats["overdue"]) == (1, 0)
+    assert store["req-1"]["status"] == "pending"
+
+
+def test_backoff_doubles_up_to_the_limit(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("reconciler.time.monotonic", lambda: clock[0])
+    reconciler = TransferReconciler(make_store(), None, stale_after=10.0, max_backoff=35.0)
+    delays = []
+    for _ in range(4):
+        reconciler._retry_later("req-1")
+        delays.append(reconciler._due["req-1"] - clock[0])
+    assert delays == [10.0, 20.0, 35.0, 35.0]
+
+
+def test_written_pending_transfer_is_tracked_once():
+    store = make_store()
+    reconciler = TransferReconciler(store, None, stale_after=60.0)
+    store.add_listener(reconciler.track)
+    store["req-1"] = {"status": "pending", "amount": 1, "tx_hash": None}
+    store.patch("req-1", amount=2)
+    store["req-2"] = {"status": "success", "amount": 1, "tx_hash": None}
+    assert len(reconciler) == 1
+    assert reconciler.stats()["tracked"] == 1
@@ -0,0 +1,72 @@
+"""Tests for start-up warm-up: required steps gate readiness, optional ones don't."""
+
+# --- Standard Library Imports ---
+import asyncio
+
+# --- Third-Party Imports ---
+import httpx
+
+# --- Local Imports ---
+import main
+from startup import READY, STARTING, StartupTracker
+
+
+async def fail(message: str) -> None:
+    raise RuntimeError(message)
+
+
+async def succeed() -> str:
+    return "ok"
+
+
+def test_failed_optional_step_does_not_block_readiness():
+    async def scenario():
+        tracker = StartupTracker()
+        tracker.begin()
+        assert await tracker.run("templates", fail("no templates"), timeout=1) is None
+        assert tracker.mark_ready()
+        assert tracker.state == READY
+        assert tracker.report()["phases"]["templates"]["ok"] is False
+
+    asyncio.run(scenario())
+
+
+def test_failed_required_step_blocks_readiness_until_it_succeeds():
+    async def scenario():
+        tracker = StartupTracker()
+        tracker.begin()
+        await tracker.run("validation", fail("401 Unauthorized"), timeout=1, required=True)
+        assert not tracker.mark_ready()
+        assert tracker.state == STARTING
+        assert not tracker.succeeded("validation")
+
+        assert await tracker.run("validation", succeed(), timeout=1, required=True) == "ok"
+        assert tracker.succeeded("validation")
+        assert tracker.mark_ready()
+        assert tracker.state == READY
+
+    asyncio.run(scenario())
+
+
+def test_warm_up_retries_validation_before_turning_ready(monkeypatch):
+    tracker = StartupTracker()
+    monkeypatch.setattr(main, "startup", tracker)
+    monkeypatch.setattr(main.settings, "warmup_retry_interval", 0.01)
+    monkeypatch.setattr(main.mesh_client, "_client", httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200))
+    ))
+    attempts = []
+
+    async def refresh():
+        attempts.append(tracker.state)
+        if len(attempts) < 3:
+            raise RuntimeError("401 Unauthorized")
+        return []
+
+    monkeypatch.setattr(main.networks_cache, "refresh", refresh)
+    tracker.begin()
+    asyncio.run(main.warm_up())
+    # Still starting on every attempt, ready only after the third succeeded
+    assert attempts == [STARTING] * 3
+    assert tracker.state == READY
+    assert tracker.report()["phases"]["validation"]["ok"] is True
@@ -0,0 +1,134 @@
+"""Tests for the shared SQLite and file StateStore backends."""
+
+# --- Standard Library Imports ---
+import asyncio
+import os
+import threading
+
+# --- Third-Party Imports ---
+import pytest
+
+# --- Local Imports ---
+from state_backends import FileBackend, SQLiteBackend
+
+ENTRY = {"status": "pending", "amount": 1}
+
+
+def open_sqlite(tmp_path) -> SQLiteBackend:
+    return SQLiteBackend(str(tmp_path / "state.db"), "transfers", max_entries=100)
+
+
+def open_files(tmp_path) -> FileBackend:
+    return FileBackend(str(tmp_path / "transfers"), max_entries=100)
+
+
+@pytest.fixture(params=["sqlite", "file"])
+def open_backend(request):
+    return open_sqlite if request.param == "sqlite" else open_files
+
+
+def test_commit_writes_in_a_worker_thread(tmp_path, open_backend):
+    async def scenario():
+        writer, reader = open_backend(tmp_path), open_backend(tmp_path)
+        threads = []
+        write_batch = writer._write_batch
+
+        def recording_write_batch(writes, deletes):
+            threads.append(threading.get_ident())
+            write_batch(writes, deletes)
+
+        writer._write_batch = recording_write_batch
+        writer.set("a", ENTRY, ttl=60)
+        # Buffered: visible to this worker only
+        assert writer.get("a") == ENTRY
+        assert reader.get("a") is None
+        assert await writer.commit() == 1
+        assert reader.get("a") == ENTRY
+        assert threads and threading.get_ident() not in threads
+        await writer.stop()
+        await reader.stop()
+
+    asyncio.run(scenario())
+
+
+def test_group_commit_runs_without_an_explicit_commit(tmp_path, open_backend):
+    async def scenario():
+        writer, reader = open_backend(tmp_path), open_backend(tmp_path)
+        writer.set("a", ENTRY, ttl=60)
+        writer.set("b", ENTRY, ttl=60)
+        writer.delete("b")
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if reader.get("a") is not None:
+                break
+        assert reader.get("a") == ENTRY
+        assert reader.get("b") is None
+        assert writer.stats()["pending_writes"] == 0
+        await writer.stop()
+        await reader.stop()
+
+    asyncio.run(scenario())
+
+
+def test_keys_include_buffered_writes(tmp_path, open_backend):
+    async def scenario():
+        backend = open_backend(tmp_path)
+        backend.set("a", ENTRY, ttl=60)
+        backend.set("b", ENTRY, ttl=60)
+        await backend.commit()
+        backend.delete("a")
+        backend.set("c", ENTRY, ttl=60)
+        assert sorted(backend.keys()) == ["b", "c"]
+        await backend.stop()
+
+    asyncio.run(scenario())
+
+
+def test_changes_since_reports_other_workers_writes(tmp_path, open_backend):
+    async def scenario():
+        writer, watcher = open_backend(tmp_path), open_backend(tmp_path)
+        # Two processes in production; tell them apart by origin here
+        watcher._origin += 1
+        cursor, changes = await watcher.run_blocking(watcher.changes_since, None)
+        assert changes == []
+
+        writer.set("a", ENTRY, ttl=60)
+        watcher.set("own", ENTRY, ttl=60)
+        await writer.commit()
+        await watcher.commit()
+        cursor, changes = await watcher.run_blocking(watcher.changes_since, cursor)
+        assert changes == [("a", ENTRY)]
+        # Nothing new since
+        cursor, changes = await watcher.run_blocking(watcher.changes_since, cursor)
+        assert changes == []
+        await writer.stop()
+        await watcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_file_backend_counts_entries_before_the_first_sweep(tmp_path):
+    async def scenario():
+        writer = open_files(tmp_path)
+        for i in range(3):
+            writer.set(f"key-{i}", ENTRY, ttl=60)
+        await writer.stop()
+
+        backend = open_files(tmp_path)
+        await backend.start()
+        assert len(backend) == 3
+        await backend.stop()
+
+    asyncio.run(scenario())
+    # Without start, the first len() counts the directory
+    assert len(open_files(tmp_path)) == 3
+
+
+def test_file_backend_prunes_old_change_markers(tmp_path, monkeypatch):
+    backend = open_files(tmp_path)
+    backend.set("a", ENTRY, ttl=60)
+    assert len(os.listdir(backend._changes)) == 1
+    monkeypatch.setattr(FileBackend, "CHANGE_RETENTION", -1.0)
+    backend.sweep()
+    assert os.listdir(backend._changes) == []
+    assert backend.get("a") == ENTRY
@@ -0,0 +1,177 @@
+"""Tests for JournaledBackend: replay after a crash, torn records, segment rotation and snapshots."""
+
+# --- Standard Library Imports ---
+import asyncio
+import os
+import time
+
+# --- Local Imports ---
+from state_journal import JournaledBackend
+from state_store import MemoryBackend
+
+FIELDS = ("status", "amount")
+NAME = "transfers"
+
+
+def make_backend(directory, **options) -> JournaledBackend:
+    options = {"fsync_interval": 0.01, **options}
+    return JournaledBackend(MemoryBackend(FIELDS, max_entries=1000), str(directory), NAME, **options)
+
+
+async def open_backend(directory, **options) -> JournaledBackend:
+    backend = make_backend(directory, **options)
+    await backend.start()
+    return backend
+
+
+async def crash(backend: JournaledBackend) -> None:
+    """Stop the backend the way a killed process would: no final commit or snapshot."""
+    backend._task.cancel()
+    try:
+        await backend._task
+    except asyncio.CancelledError:
+        pass
+    backend._file.close()
+
+
+async def committed() -> None:
+    # Long enough for a group commit at the test fsync interval
+    await asyncio.sleep(0.05)
+
+
+def files(directory):
+    return sorted(name for name in os.listdir(directory) if not name.startswith("."))
+
+
+def contents(backend: JournaledBackend):
+    return {key: backend.get(key) for key in backend.keys()}
+
+
+def test_committed_writes_survive_a_crash(tmp_path):
+    async def scenario():
+        backend = await open_backend(tmp_path)
+        backend.set("a", {"status": "pending", "amount": 1}, ttl=60)
+        backend.set("b", {"status": "pending", "amount": 2}, ttl=60)
+        backend.set("a", {"status": "success", "amount": 1}, ttl=60)
+        backend.delete("b")
+        await committed()
+        await crash(backend)
+
+        recovered = await open_backend(tmp_path)
+        assert contents(recovered) == {"a": {"status": "success", "amount": 1}}
+        recovery = recovered.stats()["journal"]["recovery"]
+        assert (recovery["entries"], recovery["journal_records"]) == (1, 4)
+        await recovered.stop()
+
+    asyncio.run(scenario())
+
+
+def test_uncommitted_writes_are_lost_in_a_crash(tmp_path):
+    async def scenario():
+        backend = await open_backend(tmp_path, fsync_interval=60.0)
+        backend.set("a", {"status": "pending", "amount": 1}, ttl=60)
+        await crash(backend)
+
+        recovered = await open_backend(tmp_path)
+        assert len(recovered) == 0
+        await recovered.stop()
+
+    asyncio.run(scenario())
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    async def scenario():
+        backend = await open_backend(tmp_path)
+        backend.set("a", {"status": "pending", "amount": 1}, ttl=60)
+        backend.set("b", {"status": "pending", "amount": 2}, ttl=60)
+        await committed()
+        await crash(backend)
+        # The process died halfway through writing the next record
+        segment = backend._segment_path(backend._segment)
+        with open(segment, "a", encoding="utf-8") as f:
+            f.write('{"k":"c","v":{"status":"pen')
+
+        recovered = await open_backend(tmp_path)
+        assert contents(recovered) == {
+            "a": {"status": "pending", "amount": 1},
+            "b": {"status": "pending", "amount": 2},
+        }
+        assert recovered.stats()["journal"]["recovery"]["journal_records"] == 2
+        await recovered.stop()
+
+    asyncio.run(scenario())
+
+
+def test_entries_expired_while_down_are_dropped(tmp_path, monkeypatch):
+    async def scenario():
+        backend = await open_backend(tmp_path)
+        backend.set("short", {"status": "pending", "amount": 1}, ttl=5)
+        backend.set("long", {"status": "pending", "amount": 2}, ttl=3600)
+        await committed()
+        await crash(backend)
+
+        # Restart ten seconds later
+        now = time.time() + 10
+        monkeypatch.setattr("state_journal.time.time", lambda: now)
+        recovered = await open_backend(tmp_path)
+        assert recovered.keys() == ["long"]
+        await recovered.stop()
+
+    asyncio.run(scenario())
+
+
+def test_snapshot_rotates_segments(tmp_path):
+    async def scenario():
+        backend = await open_backend(tmp_path, snapshot_max_records=3)
+        first_segment = backend._segment
+        for i in range(5):
+            backend.set(f"key-{i}", {"status": "pending", "amount": i}, ttl=60)
+        await committed()
+        stats = backend.stats()["journal"]
+        # Startup snapshots once; the five records trigger another
+        assert stats["snapshots"] >= 2
+        assert stats["segment"] > first_segment
+        # Only the snapshot and the current segment are left
+        assert files(tmp_path) == [f"{NAME}.journal.{stats['segment']:06d}", f"{NAME}.snapshot"]
+        await backend.stop()
+
+    asyncio.run(scenario())
+
+
+def test_recovery_reads_snapshot_then_later_segments(tmp_path):
+    async def scenario():
+        backend = await open_backend(tmp_path, snapshot_max_records=3)
+        for i in range(3):
+            backend.set(f"key-{i}", {"status": "pending", "amount": i}, ttl=60)
+        await committed()
+        assert backend.stats()["journal"]["records_since_snapshot"] == 0
+        # Written after the snapshot, so only in the journal
+        backend.set("key-0", {"status": "success", "amount": 0}, ttl=60)
+        backend.delete("key-1")
+        await committed()
+        await crash(backend)
+
+        recovered = await open_backend(tmp_path)
+        assert contents(recovered) == {
+            "key-0": {"status": "success", "amount": 0},
+            "key-2": {"status": "pending", "amount": 2},
+        }
+        # Only the records written after the snapshot were replayed
+        assert recovered.stats()["journal"]["recovery"]["journal_records"] == 2
+        await recovered.stop()
+
+    asyncio.run(scenario())
+
+
+def test_clean_shutdown_leaves_only_a_snapshot_to_read(tmp_path):
+    async def scenario():
+        backend = await open_backend(tmp_path, fsync_interval=60.0)
+        backend.set("a", {"status": "pending", "amount": 1}, ttl=60)
+        await backend.stop()
+
+        recovered = await open_backend(tmp_path)
+        assert contents(recovered) == {"a": {"status": "pending", "amount": 1}}
+        assert recovered.stats()["journal"]["recovery"]["journal_records"] == 0
+        await recovered.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,114 @@
+"""Tests for StateStore and MemoryBackend expiry and the entry cap."""
+
+# --- Third-Party Imports ---
+import pytest
+
+# --- Local Imports ---
+from state_store import MemoryBackend, StateStore
+
+FIELDS = ("status", "amount")
+TTLS = {"pending": 10, "success": 100}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("state_store.time.monotonic", lambda: now[0])
+    return now
+
+
+def make_store(max_entries: int = 10) -> StateStore:
+    return StateStore("test", FIELDS, TTLS, default_ttl=50, max_entries=max_entries)
+
+
+def test_reads_hide_expired_entries(clock):
+    store = make_store()
+    store["a"] = {"status": "pending", "amount": 1}
+    assert store["a"] == {"status": "pending", "amount": 1}
+    clock[0] += 10
+    assert "a" not in store
+    with pytest.raises(KeyError):
+        store["a"]
+    assert len(store) == 0
+
+
+def test_ttl_follows_status(clock):
+    store = make_store()
+    store["pending"] = {"status": "pending"}
+    store["success"] = {"status": "success"}
+    store["other"] = {"status": "failed"}
+    clock[0] += 60
+    assert store.sweep() == 2
+    assert list(store) == ["success"]
+    assert store.stats()["expirations"] == 2
+
+
+def test_rewrite_extends_expiry(clock):
+    store = make_store()
+    store["a"] = {"status": "pending"}
+    clock[0] += 8
+    store.patch("a", status="success")
+    clock[0] += 5
+    # The original expiry has passed, but the rewrite's has not
+    assert store.sweep() == 0
+    assert store["a"] == {"status": "success", "amount": None}
+    clock[0] += 100
+    assert store.sweep() == 1
+    assert len(store) == 0
+
+
+def test_rewrite_with_shorter_ttl_expires_sooner(clock):
+    store = make_store()
+    store["a"] = {"status": "success"}
+    store["a"] = {"status": "pending"}
+    clock[0] += 11
+    assert store.sweep() == 1
+    assert len(store) == 0
+
+
+def test_cap_evicts_least_recently_used(clock):
+    store = make_store(max_entries=3)
+    for key in "abc":
+        store[key] = {"status": "pending"}
+    store["a"]
+    store["d"] = {"status": "pending"}
+    assert sorted(store) == ["a", "c", "d"]
+    assert store.stats()["evictions"] == 1
+
+
+def test_status_counts_follow_writes_and_deletes(clock):
+    store = make_store()
+    store["a"] = {"status": "pending"}
+    store["b"] = {"status": "pending"}
+    store["a"] = {"status": "success"}
+    del store["b"]
+    assert store.stats()["by_status"] == {"success": 1}
+
+
+def test_rewrites_keep_one_expiry_entry_per_key():
+    backend = MemoryBackend(FIELDS, max_entries=10)
+    for _ in range(1000):
+        backend.set("a", {"status": "pending"}, ttl=60)
+    assert backend.stats()["expiry_backlog"] == 1
+
+
+def test_rewrite_that_expires_later_is_requeued(clock):
+    backend = MemoryBackend(FIELDS, max_entries=10)
+    backend.set("a", {"status": "pending"}, ttl=10)
+    backend.set("a", {"status": "success"}, ttl=100)
+    clock[0] += 11
+    # The early entry comes up, finds a later expiry and re-queues the key
+    assert backend.sweep() == 0
+    assert backend.stats()["expiry_backlog"] == 1
+    clock[0] += 100
+    assert backend.sweep() == 1
+
+
+def test_expiry_backlog_stays_bounded_by_the_cap():
+    backend = MemoryBackend(FIELDS, max_entries=50)
+    for i in range(10000):
+        backend.set(f"key-{i}", {"status": "pending"}, ttl=3600)
+        if i % 3 == 0:
+            backend.delete(f"key-{i}")
+    assert len(backend) <= 50
+    assert backend.stats()["expiry_backlog"] <= 2 * 50
@@ -0,0 +1,74 @@
+"""Tests for PrecompressedStaticFiles ETags and the asset manifest."""
+
+# --- Standard Library Imports ---
+import asyncio
+import gzip
+import json
+import threading
+
+# --- Third-Party Imports ---
+import httpx
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+# --- Local Imports ---
+from static_assets import AssetManifest, PrecompressedStaticFiles
+
+BUILT_ETAG = '"built-etag"'
+BUILT_GZIP_ETAG = '"built-gzip-etag"'
+
+
+def make_app(tmp_path):
+    (tmp_path / "dist").mkdir()
+    (tmp_path / "dist" / "app.abc.js").write_text("console.log(1)")
+    (tmp_path / "dist" / "app.abc.js.gz").write_bytes(gzip.compress(b"console.log(1)"))
+    (tmp_path / "plain.js").write_text("console.log(2)")
+    manifest_path = tmp_path / "dist" / "manifest.json"
+    manifest_path.write_text(json.dumps({
+        "assets": {"app.js": "dist/app.abc.js"},
+        "etags": {"dist/app.abc.js": BUILT_ETAG, "dist/app.abc.js.gz": BUILT_GZIP_ETAG},
+    }))
+    manifest = AssetManifest(str(tmp_path), str(manifest_path))
+    static = PrecompressedStaticFiles(directory=str(tmp_path), manifest=manifest)
+    return Starlette(routes=[Mount("/static", app=static)]), static
+
+
+async def fetch(app, path, **headers):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path, headers=headers)
+
+
+def test_built_files_use_manifest_etags(tmp_path, monkeypatch):
+    app, static = make_app(tmp_path)
+    monkeypatch.setattr("static_assets.hashlib.sha256", None)
+    response = asyncio.run(fetch(app, "/static/dist/app.abc.js", **{"accept-encoding": "gzip"}))
+    assert response.headers["etag"] == BUILT_GZIP_ETAG
+    response = asyncio.run(fetch(app, "/static/dist/app.abc.js", **{"accept-encoding": "identity"}))
+    assert response.headers["etag"] == BUILT_ETAG
+    response = asyncio.run(fetch(app, "/static/dist/app.abc.js", **{"if-none-match": BUILT_GZIP_ETAG}))
+    assert response.status_code == 304
+    assert static._etags == {}
+
+
+def test_other_files_are_hashed_off_the_event_loop(tmp_path, monkeypatch):
+    app, static = make_app(tmp_path)
+    hashing_threads = []
+    hash_file = static._hash_file
+
+    def recording_hash_file(path, stat_result):
+        hashing_threads.append(threading.get_ident())
+        hash_file(path, stat_result)
+
+    monkeypatch.setattr(static, "_hash_file", recording_hash_file)
+    response = asyncio.run(fetch(app, "/static/plain.js"))
+    etag = response.headers["etag"]
+    assert hashing_threads and threading.get_ident() not in hashing_threads
+    assert list(static._etags) == [str(tmp_path / "plain.js")]
+
+    response = asyncio.run(fetch(app, "/static/plain.js", **{"if-none-match": etag}))
+    assert response.status_code == 304
+    # A changed file gets a new ETag under the same cache key
+    (tmp_path / "plain.js").write_text("console.log(3)")
+    response = asyncio.run(fetch(app, "/static/plain.js"))
+    assert response.headers["etag"] != etag
+    assert len(static._etags) == 1
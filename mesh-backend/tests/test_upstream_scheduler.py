@@ -0,0 +1,223 @@
+"""Tests for UpstreamScheduler: priorities, reservations, and the cancel, evict and expire paths."""
+
+# --- Standard Library Imports ---
+import asyncio
+
+# --- Third-Party Imports ---
+import pytest
+
+# --- Local Imports ---
+from upstream_scheduler import (
+    EXECUTE, HOLDINGS, NETWORKS, PREVIEW, UpstreamOverloaded, UpstreamScheduler, parse_reservations,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle() -> None:
+    # Let queued tasks reach their await
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_parse_reservations():
+    assert parse_reservations("execute=2, link_token=1") == {"execute": 2, "link_token": 1}
+    assert parse_reservations("") == {}
+    with pytest.raises(ValueError):
+        parse_reservations("bogus=1")
+    with pytest.raises(ValueError):
+        parse_reservations("execute=many")
+
+
+def test_reservations_cannot_exceed_capacity():
+    with pytest.raises(ValueError):
+        UpstreamScheduler(2, 10, 1.0, reserved={EXECUTE: 3})
+
+
+def test_reserved_slot_is_kept_for_its_class():
+    async def scenario():
+        scheduler = UpstreamScheduler(2, 10, 1.0, reserved={EXECUTE: 1})
+        await scheduler.acquire(HOLDINGS)
+        # The other slot is reserved: holdings must queue, execute need not
+        holdings = asyncio.create_task(scheduler.acquire(HOLDINGS))
+        await settle()
+        assert scheduler.queued == 1
+        await asyncio.wait_for(scheduler.acquire(EXECUTE), timeout=0.1)
+        assert scheduler.active == 2
+        holdings.cancel()
+
+    run(scenario())
+
+
+def test_released_slot_goes_to_highest_priority():
+    async def scenario():
+        scheduler = UpstreamScheduler(1, 10, 1.0, starvation_timeout=10.0)
+        await scheduler.acquire(EXECUTE)
+        order = []
+
+        async def call(priority):
+            await scheduler.acquire(priority)
+            order.append(priority)
+            scheduler.release(priority)
+
+        tasks = [asyncio.create_task(call(priority)) for priority in (NETWORKS, HOLDINGS, PREVIEW)]
+        await settle()
+        scheduler.release(EXECUTE)
+        await asyncio.gather(*tasks)
+        assert order == [PREVIEW, HOLDINGS, NETWORKS]
+
+    run(scenario())
+
+
+def test_starving_call_is_promoted():
+    async def scenario():
+        scheduler = UpstreamScheduler(1, 10, 5.0, starvation_timeout=0.05)
+        await scheduler.acquire(EXECUTE)
+        networks = asyncio.create_task(scheduler.acquire(NETWORKS))
+        await asyncio.sleep(0.1)
+        preview = asyncio.create_task(scheduler.acquire(PREVIEW))
+        await settle()
+        scheduler.release(EXECUTE)
+        await networks
+        assert not preview.done()
+        assert scheduler.stats()["classes"][NETWORKS]["promoted"] == 1
+        scheduler.release(NETWORKS)
+        await preview
+
+    run(scenario())
+
+
+def test_full_queue_evicts_newest_lower_class_waiter():
+    async def scenario():
+        scheduler = UpstreamScheduler(1, 2, 5.0)
+        await scheduler.acquire(EXECUTE)
+        older = asyncio.create_task(scheduler.acquire(NETWORKS))
+        newer = asyncio.create_task(scheduler.acquire(NETWORKS))
+        await settle()
+        preview = asyncio.create_task(scheduler.acquire(PREVIEW))
+        await settle()
+        with pytest.raises(UpstreamOverloaded) as shed:
+            await newer
+        assert shed.value.reason == "evicted"
+        assert not older.done()
+        assert scheduler.queued == 2
+        assert scheduler.stats()["classes"][NETWORKS]["evicted"] == 1
+        for task in (older, preview):
+            task.cancel()
+
+    run(scenario())
+
+
+def test_full_queue_sheds_call_with_nothing_below_it():
+    async def scenario():
+        scheduler = UpstreamScheduler(1, 1, 5.0, retry_after=2.0)
+        await scheduler.acquire(EXECUTE)
+        waiting = asyncio.create_task(scheduler.acquire(PREVIEW))
+        await settle()
+        with pytest.raises(UpstreamOverloaded) as shed:
+            await scheduler.acquire(NETWORKS)
+        assert shed.value.reason == "queue full"
+        assert shed.value.retry_after == 2.0
+        waiting.cancel()
+
+    run(scenario())
+
+
+def test_waiter_expires_after_queue_timeout():
+    async def scenario():
+        scheduler = UpstreamScheduler(1, 10, 0.05)
+        await scheduler.acquire(EXECUTE)
+        with pytest.raises(UpstreamOverloaded) as shed:
+            await scheduler.acquire(HOLDINGS)
+        assert shed.value.reason == "queue timeout"
+        assert scheduler.queued == 0
+        assert scheduler.active == 1
+
+    run(scenario())
+
+
+def test_execute_waiter_outlives_queue_timeout():
+    async def scenario():
+        scheduler = UpstreamScheduler(1, 10, 0.05)
+        await scheduler.acquire(PREVIEW)
+        execute = asyncio.create_task(scheduler.acquire(EXECUTE))
+        holdings = asyncio.create_task(scheduler.acquire(HOLDINGS))
+        await asyncio.sleep(0.15)
+        # The read was shed at the timeout; the execution is still waiting
+        with pytest.raises(UpstreamOverloaded):
+            await holdings
+        assert not execute.done()
+        assert scheduler.queued == 1
+        scheduler.release(PREVIEW)
+        await asyncio.wait_for(execute, timeout=0.1)
+        assert scheduler.active == 1
+
+    run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = UpstreamScheduler(1, 10, 5.0)
+        await scheduler.acquire(EXECUTE)
+        waiting = asyncio.create_task(scheduler.acquire(HOLDINGS))
+        await settle()
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert (scheduler.active, scheduler.queued) == (1, 0)
+        scheduler.release(EXECUTE)
+        assert (scheduler.active, scheduler.queued) == (0, 0)
+
+    run(scenario())
+
+
+def test_cancel_after_grant_passes_the_slot_on():
+    async def scenario():
+        scheduler = UpstreamScheduler(1, 10, 5.0)
+        await scheduler.acquire(EXECUTE)
+        first = asyncio.create_task(scheduler.acquire(HOLDINGS))
+        second = asyncio.create_task(scheduler.acquire(HOLDINGS))
+        await settle()
+        # Grant the slot to the first waiter, then cancel it before it runs
+        scheduler.release(EXECUTE)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await asyncio.wait_for(second, timeout=0.1)
+        assert (scheduler.active, scheduler.queued) == (1, 0)
+
+    run(scenario())
+
+
+def test_cancel_after_eviction_releases_nothing():
+    async def scenario():
+        scheduler = UpstreamScheduler(1, 1, 5.0)
+        await scheduler.acquire(EXECUTE)
+        evicted = asyncio.create_task(scheduler.acquire(NETWORKS))
+        await settle()
+        preview = asyncio.create_task(scheduler.acquire(PREVIEW))
+        await asyncio.sleep(0)
+        # Evicted, but cancelled (like a hedge loser) before it saw the error
+        evicted.cancel()
+        with pytest.raises((asyncio.CancelledError, UpstreamOverloaded)):
+            await evicted
+        assert (scheduler.active, scheduler.queued) == (1, 1)
+        scheduler.release(EXECUTE)
+        await preview
+        assert (scheduler.active, scheduler.queued) == (1, 0)
+
+    run(scenario())
+
+
+def test_slot_context_manager_releases_on_error():
+    async def scenario():
+        scheduler = UpstreamScheduler(1, 10, 1.0)
+        with pytest.raises(RuntimeError):
+            async with scheduler.slot(EXECUTE):
+                assert scheduler.active == 1
+                raise RuntimeError("boom")
+        assert scheduler.active == 0
+
+    run(scenario())
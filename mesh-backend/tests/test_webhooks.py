@@ -0,0 +1,216 @@
+"""Tests for webhook verification: signatures, the timestamp window, replay protection and the body cap."""
+
+# --- Standard Library Imports ---
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+
+# --- Third-Party Imports ---
+import httpx
+import pytest
+
+# --- Local Imports ---
+import main
+from webhooks import WebhookIngestor, WebhookRejected, WebhookVerifier, normalize_event
+
+SECRET = "test-webhook-secret"
+NOW = 1_700_000_000.0
+
+
+def make_body(**fields) -> bytes:
+    payload = {"eventId": "evt-1", "timestamp": NOW, "eventType": "transfer.executed", **fields}
+    return json.dumps(payload).encode("utf-8")
+
+
+def sign(body: bytes, secret: str = SECRET) -> bytes:
+    return hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest()
+
+
+@pytest.fixture
+def verifier():
+    return WebhookVerifier(SECRET, tolerance=300)
+
+
+@pytest.mark.parametrize("encode", [
+    lambda digest: base64.b64encode(digest).decode("ascii"),
+    lambda digest: digest.hex(),
+    lambda digest: "sha256=" + digest.hex(),
+], ids=["base64", "hex", "prefixed-hex"])
+def test_valid_signature_is_accepted(verifier, encode):
+    body = make_body()
+    event = verifier.verify(body, encode(sign(body)), now=NOW)
+    assert event["event_id"] == "evt-1"
+    assert event["timestamp"] == NOW
+
+
+@pytest.mark.parametrize("signature", [None, "", "not-a-signature"])
+def test_missing_or_malformed_signature_is_rejected(verifier, signature):
+    with pytest.raises(WebhookRejected) as rejected:
+        verifier.verify(make_body(), signature, now=NOW)
+    assert (rejected.value.reason, rejected.value.status_code) == ("bad_signature", 401)
+
+
+def test_signature_must_cover_the_exact_body(verifier):
+    body = make_body()
+    tampered = make_body(status="failed")
+    with pytest.raises(WebhookRejected) as rejected:
+        verifier.verify(tampered, sign(body).hex(), now=NOW)
+    assert rejected.value.status_code == 401
+
+
+def test_signature_with_another_secret_is_rejected(verifier):
+    body = make_body()
+    with pytest.raises(WebhookRejected) as rejected:
+        verifier.verify(body, sign(body, "other-secret").hex(), now=NOW)
+    assert rejected.value.reason == "bad_signature"
+
+
+@pytest.mark.parametrize("offset", [-301, 301])
+def test_event_outside_the_window_is_rejected(verifier, offset):
+    body = make_body(timestamp=NOW + offset)
+    with pytest.raises(WebhookRejected) as rejected:
+        verifier.verify(body, sign(body).hex(), now=NOW)
+    assert (rejected.value.reason, rejected.value.status_code) == ("stale", 400)
+
+
+def test_event_at_the_edge_of_the_window_is_accepted(verifier):
+    body = make_body(timestamp=NOW - 300)
+    assert verifier.verify(body, sign(body).hex(), now=NOW)["timestamp"] == NOW - 300
+
+
+def test_millisecond_timestamps_are_converted(verifier):
+    body = make_body(timestamp=int(NOW * 1000))
+    assert verifier.verify(body, sign(body).hex(), now=NOW)["timestamp"] == NOW
+
+
+@pytest.mark.parametrize("body", [b"not json", b"[1, 2]", json.dumps({"timestamp": NOW}).encode("utf-8")])
+def test_invalid_body_is_rejected_after_the_signature_check(verifier, body):
+    with pytest.raises(WebhookRejected) as rejected:
+        verifier.verify(body, sign(body).hex(), now=NOW)
+    assert (rejected.value.reason, rejected.value.status_code) == ("invalid", 400)
+
+
+def test_redelivery_is_detected(verifier):
+    assert verifier.first_delivery("evt-1", now=NOW)
+    assert not verifier.first_delivery("evt-1", now=NOW + 10)
+    assert verifier.first_delivery("evt-2", now=NOW + 10)
+
+
+def test_event_ids_are_forgotten_after_twice_the_tolerance(verifier):
+    assert verifier.first_delivery("evt-1", now=NOW)
+    assert not verifier.first_delivery("evt-1", now=NOW + 599)
+    assert verifier.first_delivery("evt-1", now=NOW + 601)
+
+
+def test_forgotten_event_is_accepted_again(verifier):
+    assert verifier.first_delivery("evt-1", now=NOW)
+    verifier.forget("evt-1")
+    assert verifier.first_delivery("evt-1", now=NOW)
+
+
+def test_remembered_event_ids_are_capped():
+    verifier = WebhookVerifier(SECRET, tolerance=300, max_event_ids=2)
+    for event_id in ("evt-1", "evt-2", "evt-3"):
+        assert verifier.first_delivery(event_id, now=NOW)
+    # The newest ID is still remembered; the oldest was dropped to make room
+    assert not verifier.first_delivery("evt-3", now=NOW)
+    assert verifier.first_delivery("evt-1", now=NOW)
+
+
+def test_normalize_event_reads_nested_payload():
+    event = normalize_event({
+        "EventId": "evt-1",
+        "CreatedTimestamp": NOW,
+        "Type": "transfer.executed",
+        "payload": {"ClientTransactionId": "req-1", "TransferStatus": "succeeded", "hash": "0xabc"},
+    })
+    assert event == {
+        "event_id": "evt-1",
+        "timestamp": NOW,
+        "event_type": "transfer.executed",
+        "client_transaction_id": "req-1",
+        "transfer_id": None,
+        "status": "succeeded",
+        "tx_hash": "0xabc",
+    }
+
+
+def test_ingestor_applies_events_in_batches():
+    batches = []
+
+    async def scenario():
+        ingestor = WebhookIngestor(lambda batch: batches.append(batch) or len(batch), max_queue=2, batch_size=10)
+        assert ingestor.submit({"event_id": "evt-1"})
+        assert ingestor.submit({"event_id": "evt-2"})
+        assert not ingestor.submit({"event_id": "evt-3"})
+        await ingestor.start()
+        await asyncio.sleep(0.1)
+        await ingestor.stop()
+        return ingestor.stats()
+
+    stats = asyncio.run(scenario())
+    assert [[event["event_id"] for event in batch] for batch in batches] == [["evt-1", "evt-2"]]
+    assert (stats["queue_full"], stats["batches"], stats["applied"]) == (1, 1, 2)
+
+
+@pytest.fixture
+def webhook_route(monkeypatch):
+    monkeypatch.setattr(main, "webhook_verifier", WebhookVerifier(SECRET, tolerance=300))
+    monkeypatch.setattr(main.settings, "mesh_webhook_max_body", 1000)
+
+
+async def post_webhook(content, headers=None) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        return await client.post("/api/mesh/webhook", content=content, headers=headers)
+
+
+def test_declared_oversized_body_is_rejected_unread(webhook_route):
+    response = asyncio.run(post_webhook(b"x" * 1001))
+    assert response.status_code == 413
+
+
+def test_streamed_body_is_cut_off_at_the_cap(webhook_route):
+    sent = []
+
+    async def chunks():
+        # No Content-Length: only the running count can catch this one
+        for _ in range(100):
+            sent.append(1)
+            yield b"x" * 100
+
+    response = asyncio.run(post_webhook(chunks()))
+    assert response.status_code == 413
+    assert len(sent) < 100
+
+
+def test_body_within_the_cap_is_verified(webhook_route):
+    async def chunks():
+        yield b'{"eventId": '
+        yield b'"evt-1"}'
+
+    # Read in full and handed to the verifier, which wants a signature
+    response = asyncio.run(post_webhook(chunks()))
+    assert response.status_code == 401
+
+
+def test_only_transfer_request_sets_the_client_transaction_id(monkeypatch):
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(json.loads(request.content)["transferOptions"])
+        return httpx.Response(200, json={"content": {"linkToken": "token"}})
+
+    monkeypatch.setattr(main.mesh_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            # A caller can't tie its token to someone else's transfer
+            await client.post("/api/linktoken_transfer", json={"amount": 5, "client_transaction_id": "victim"})
+            response = await client.post("/api/transfer_request", json={"amount": 5})
+            return response.json()["request_id"]
+
+    request_id = asyncio.run(scenario())
+    assert "clientTransactionId" not in sent[0]
+    assert sent[1]["clientTransactionId"] == request_id
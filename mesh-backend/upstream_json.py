@@ -0,0 +1,111 @@
+"""
+Upstream JSON
+
+Keeps Mesh response bodies as the bytes Mesh sent, so routes that forward a
+payload unchanged never decode and re-encode it.
+
+``UpstreamJSON`` wraps a body and its content type. Routes that forward it
+return ``passthrough_response``, which writes the bytes as-is. Code that needs
+the data calls ``.data()``, which decodes once and caches the result, so a
+cached body shared between requests is decoded at most once.
+
+``dumps`` and ``FastJSONResponse`` encode payloads that are built or changed
+here. They use ``orjson`` when it is installed (``pip install orjson``) and
+fall back to the standard library otherwise.
+"""
+
+# --- Standard Library Imports ---
+import json
+from typing import Any, Dict, Optional
+
+# --- Third-Party Imports ---
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- Constants ---
+JSON_MEDIA_TYPE = "application/json"
+
+
+def loads(data: bytes) -> Any:
+    """Decode JSON bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode an object as compact UTF-8 JSON.
+
+    Args:
+        obj: JSON-compatible object
+
+    Returns:
+        bytes: Encoded JSON, as ``JSONResponse`` would render it
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` rendered with ``dumps``."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class UpstreamJSON:
+    """An upstream JSON body, kept as bytes and decoded only on demand."""
+
+    __slots__ = ("content", "media_type", "_data")
+
+    def __init__(self, content: bytes, media_type: Optional[str] = None):
+        """
+        Args:
+            content: Response body as received
+            media_type: Upstream Content-Type; defaults to ``application/json``
+        """
+        self.content = content
+        self.media_type = media_type or JSON_MEDIA_TYPE
+        self._data: Any = None
+
+    @classmethod
+    def from_response(cls, response: Any) -> "UpstreamJSON":
+        """Wrap the body of an ``httpx.Response``."""
+        return cls(response.content, response.headers.get("content-type"))
+
+    def data(self) -> Any:
+        """
+        Return the decoded body, decoding it on first use.
+
+        Returns:
+            Any: The parsed JSON
+
+        Raises:
+            ValueError: If the body is not valid JSON
+        """
+        if self._data is None:
+            self._data = loads(self.content)
+        return self._data
+
+
+def passthrough_response(
+    body: UpstreamJSON, status_code: int = 200, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Send an upstream body to the client byte for byte.
+
+    Args:
+        body: Upstream body
+        status_code: Response status
+        headers: Extra response headers
+
+    Returns:
+        Response: Response carrying the upstream bytes and content type
+    """
+    return Response(content=body.content, status_code=status_code, headers=headers, media_type=body.media_type)
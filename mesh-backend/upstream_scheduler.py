@@ -0,0 +1,335 @@
+"""
+Upstream Scheduler
+
+Decides which Mesh call goes next when upstream capacity is short, so the
+user-critical transfer execution (whose MFA code is only valid briefly) never
+queues behind a burst of holdings or preview reads.
+
+Every Mesh call belongs to a priority class, highest first::
+
+    execute > link_token > preview > holdings > networks > reconcile
+
+``reconcile`` is background work: status checks for transfers nobody is
+waiting on.
+
+At most ``max_concurrency`` calls are in flight at once. Each class can have
+slots reserved for it: other classes may not take a slot that would leave a
+class with fewer free slots than its unused reservation, so execution always
+has capacity even while reads fill the rest. Calls over the limit wait in
+per-class FIFO queues; a released slot goes to the highest-priority class
+that may take it. A call that has waited ``starvation_timeout`` seconds is
+served before any younger call regardless of class, so a steady stream of
+high-priority calls can't starve the lower classes.
+
+The queues are bounded. When they are full a new call evicts the newest
+waiter of a lower class, or is shed itself if there is none; a call that
+waits longer than ``queue_timeout`` is shed too. Execution is exempt from
+the timeout: it is the call a user is actively waiting on, nothing outranks
+it, and shedding it would throw away an MFA code the user just entered.
+Shed calls raise ``UpstreamOverloaded`` and the route answers ``503`` with
+``Retry-After``.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional, Tuple
+
+# --- Third-Party Imports ---
+import httpx
+
+# --- Local Imports ---
+from metrics import REGISTRY
+
+# --- Priority Classes ---
+EXECUTE = "execute"
+LINK_TOKEN = "link_token"
+PREVIEW = "preview"
+HOLDINGS = "holdings"
+NETWORKS = "networks"
+RECONCILE = "reconcile"
+PRIORITIES = (EXECUTE, LINK_TOKEN, PREVIEW, HOLDINGS, NETWORKS, RECONCILE)
+
+# --- Metrics ---
+UPSTREAM_SHED = REGISTRY.counter(
+    "upstream_shed_total", "Mesh calls shed by the upstream scheduler, by priority class and reason", ("priority", "reason")
+)
+UPSTREAM_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "upstream_queue_wait_seconds",
+    "Time Mesh calls waited for an upstream slot, by priority class",
+    ("priority",),
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+class UpstreamOverloaded(httpx.HTTPError):
+    """Raised instead of calling Mesh when the upstream queue is full or too slow."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Upstream overloaded ({reason}); retry in {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_reservations(spec: str) -> Dict[str, int]:
+    """
+    Parse per-class slot reservations.
+
+    Args:
+        spec: Comma-separated ``class=slots`` items, e.g. ``execute=8,link_token=4``
+
+    Returns:
+        Dict[str, int]: Reserved slots by priority class
+
+    Raises:
+        ValueError: If an item is malformed or names an unknown class
+    """
+    reserved = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        priority, _, slots = item.partition("=")
+        priority = priority.strip()
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority class {priority!r}; expected one of {', '.join(PRIORITIES)}")
+        try:
+            reserved[priority] = int(slots)
+        except ValueError:
+            raise ValueError(f"Invalid reservation {item!r}; expected class=slots")
+    return reserved
+
+
+class _Waiter:
+    __slots__ = ("future", "priority", "enqueued")
+
+    def __init__(self, future: asyncio.Future, priority: str, enqueued: float):
+        self.future = future
+        self.priority = priority
+        self.enqueued = enqueued
+
+
+class UpstreamScheduler:
+    """Priority-aware cap on in-flight Mesh calls, with reserved capacity per class."""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        reserved: Optional[Dict[str, int]] = None,
+        starvation_timeout: float = 0.5,
+        retry_after: float = 1.0,
+    ):
+        """
+        Args:
+            max_concurrency: Maximum Mesh calls in flight at once
+            max_queue: Maximum calls waiting for a slot, across all classes
+            queue_timeout: Seconds a call below ``execute`` may wait for a slot
+                before it is shed
+            reserved: Slots held back for each priority class
+            starvation_timeout: Seconds after which a waiting call is served
+                ahead of higher classes
+            retry_after: Seconds clients are told to wait after a shed call
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.reserved = {priority: 0 for priority in PRIORITIES}
+        self.reserved.update(reserved or {})
+        if sum(self.reserved.values()) > max_concurrency:
+            raise ValueError(f"Reserved slots exceed max_concurrency ({max_concurrency})")
+        self.starvation_timeout = starvation_timeout
+        self.retry_after = retry_after
+        self._active = {priority: 0 for priority in PRIORITIES}
+        self._total_active = 0
+        self._waiters: Dict[str, Deque[_Waiter]] = {priority: deque() for priority in PRIORITIES}
+        self._queued = 0
+        self._stats = {
+            priority: {
+                "admitted": 0, "waited": 0, "promoted": 0, "queue_full": 0, "evicted": 0,
+                "queue_timeout": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+            }
+            for priority in PRIORITIES
+        }
+        self._wait_metrics = {priority: UPSTREAM_QUEUE_WAIT_SECONDS.labels(priority) for priority in PRIORITIES}
+
+    @property
+    def active(self) -> int:
+        """Calls currently holding a slot."""
+        return self._total_active
+
+    @property
+    def queued(self) -> int:
+        """Calls waiting for a slot."""
+        return self._queued
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Hold an upstream slot for the duration of the block.
+
+        Args:
+            priority: The call's priority class (defaults to the lowest)
+
+        Raises:
+            UpstreamOverloaded: If the call was shed
+        """
+        priority = priority or PRIORITIES[-1]
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    async def acquire(self, priority: str) -> None:
+        """
+        Take a slot for a call of the given class, waiting if none may be taken.
+
+        Args:
+            priority: The call's priority class
+
+        Raises:
+            UpstreamOverloaded: If the queue is full or the wait timed out
+        """
+        if not self._queued and self._may_start(priority):
+            self._grant(priority)
+            self._record_wait(priority, 0.0)
+            return
+        if self._queued >= self.max_queue:
+            self._evict_below(priority)
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop.create_future(), priority, loop.time())
+        self._waiters[priority].append(waiter)
+        self._queued += 1
+        self._stats[priority]["waited"] += 1
+        # A free slot this class may use can exist behind waiters of other classes
+        self._dispatch()
+        timer = None
+        if priority != EXECUTE:
+            timer = loop.call_later(self.queue_timeout, self._expire, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            future = waiter.future
+            if future.cancelled() or not future.done():
+                # Still queued: leave the queue without ever holding a slot
+                future.cancel()
+                self._remove(waiter)
+            elif future.exception() is None:
+                # Handed a slot just as the caller was cancelled: pass it on
+                self.release(priority)
+            # Otherwise it was evicted or timed out first, and holds nothing
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+        self._record_wait(priority, loop.time() - waiter.enqueued)
+
+    def release(self, priority: str) -> None:
+        """Give a slot back and hand free slots to waiting calls."""
+        self._active[priority] -= 1
+        self._total_active -= 1
+        self._dispatch()
+
+    def _may_start(self, priority: str) -> bool:
+        # Taking a slot must leave every other class its unused reservation
+        free = self.max_concurrency - self._total_active
+        if free <= 0:
+            return False
+        held_back = sum(
+            max(0, self.reserved[other] - self._active[other]) for other in PRIORITIES if other != priority
+        )
+        return free - 1 >= held_back
+
+    def _grant(self, priority: str) -> None:
+        self._active[priority] += 1
+        self._total_active += 1
+        self._stats[priority]["admitted"] += 1
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        # The oldest starving call goes first, then the highest class that may start
+        now = asyncio.get_running_loop().time()
+        starving = [
+            queue[0] for queue in self._waiters.values()
+            if queue and now - queue[0].enqueued >= self.starvation_timeout
+        ]
+        for waiter in sorted(starving, key=lambda waiter: waiter.enqueued):
+            if self._may_start(waiter.priority):
+                if waiter.priority != PRIORITIES[0]:
+                    self._stats[waiter.priority]["promoted"] += 1
+                return waiter
+        for priority in PRIORITIES:
+            if self._waiters[priority] and self._may_start(priority):
+                return self._waiters[priority][0]
+        return None
+
+    def _dispatch(self) -> None:
+        while self._queued:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self._remove(waiter)
+            self._grant(waiter.priority)
+            waiter.future.set_result(None)
+
+    def _remove(self, waiter: _Waiter) -> None:
+        self._waiters[waiter.priority].remove(waiter)
+        self._queued -= 1
+
+    def _evict_below(self, priority: str) -> None:
+        # Make room by shedding the newest waiter of the lowest class below this one
+        for lower in reversed(PRIORITIES[PRIORITIES.index(priority) + 1:]):
+            if self._waiters[lower]:
+                waiter = self._waiters[lower][-1]
+                self._remove(waiter)
+                waiter.future.set_exception(self._overloaded(lower, "evicted"))
+                return
+        raise self._overloaded(priority, "queue_full")
+
+    def _expire(self, waiter: _Waiter) -> None:
+        if waiter.future.done():
+            return
+        self._remove(waiter)
+        waiter.future.set_exception(self._overloaded(waiter.priority, "queue_timeout"))
+
+    def _record_wait(self, priority: str, seconds: float) -> None:
+        stats = self._stats[priority]
+        stats["wait_seconds"] += seconds
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], seconds)
+        self._wait_metrics[priority].observe(seconds)
+
+    def _overloaded(self, priority: str, reason: str) -> UpstreamOverloaded:
+        self._stats[priority][reason] += 1
+        UPSTREAM_SHED.labels(priority, reason).inc()
+        return UpstreamOverloaded(reason.replace("_", " "), self.retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report limits, occupancy and per-class counters.
+
+        Returns:
+            Dict[str, Any]: Limits and occupancy, plus, by priority class, the
+                reservation, active and queued calls, counters and mean wait
+        """
+        classes = {}
+        for priority in PRIORITIES:
+            stats = self._stats[priority]
+            classes[priority] = {
+                "reserved": self.reserved[priority],
+                "active": self._active[priority],
+                "queued": len(self._waiters[priority]),
+                **stats,
+                "mean_wait_seconds": stats["wait_seconds"] / stats["admitted"] if stats["admitted"] else None,
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._total_active,
+            "queued": self._queued,
+            "classes": classes,
+        }
+
+    def samples(self) -> Iterator[Tuple[Tuple[str], int]]:
+        """Gauge callback: waiting calls by priority class."""
+        for priority in PRIORITIES:
+            yield (priority,), len(self._waiters[priority])
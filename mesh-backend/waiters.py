@@ -0,0 +1,117 @@
+"""
+Keyed Waiters
+
+Lets request handlers park until another handler signals that the state for
+a key has changed, instead of having clients poll.
+
+Used by the long-poll and Server-Sent Events variants of ``/api/get_token``:
+``/api/store_token`` notifies the request ID and every parked waiter wakes
+immediately. The total number of parked waiters is capped.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+from contextlib import contextmanager
+from typing import Dict, Iterator, Set
+
+
+class WaiterLimitExceeded(Exception):
+    """Raised when the concurrent waiter cap has been reached."""
+
+
+class Waiter:
+    """A single parked waiter for one key."""
+
+    __slots__ = ("_event",)
+
+    def __init__(self):
+        self._event = asyncio.Event()
+
+    async def wait(self, timeout: float) -> bool:
+        """
+        Wait until the key is notified or the timeout passes.
+
+        The waiter is re-armed afterwards so it can be waited on again.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            bool: True if notified, False on timeout
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._event.clear()
+
+    def wake(self) -> None:
+        """Wake the waiter."""
+        self._event.set()
+
+
+class KeyedWaiters:
+    """Registry of waiters grouped by key, with a global cap."""
+
+    def __init__(self, max_waiters: int):
+        """
+        Args:
+            max_waiters: Maximum number of waiters parked at the same time
+        """
+        self.max_waiters = max_waiters
+        self._waiters: Dict[str, Set[Waiter]] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def full(self) -> bool:
+        """Whether the waiter cap has been reached."""
+        return self._count >= self.max_waiters
+
+    @contextmanager
+    def subscribe(self, key: str) -> Iterator[Waiter]:
+        """
+        Register a waiter for a key for the duration of the block.
+
+        Args:
+            key: Key to wait on
+
+        Yields:
+            Waiter: The registered waiter
+
+        Raises:
+            WaiterLimitExceeded: If ``max_waiters`` waiters are already parked
+        """
+        if self.full:
+            raise WaiterLimitExceeded(f"{self.max_waiters} waiters already parked")
+        waiter = Waiter()
+        self._waiters.setdefault(key, set()).add(waiter)
+        self._count += 1
+        try:
+            yield waiter
+        finally:
+            self._count -= 1
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[key]
+
+    def notify(self, key: str) -> int:
+        """
+        Wake every waiter registered for a key.
+
+        Args:
+            key: Key whose state changed
+
+        Returns:
+            int: Number of waiters woken
+        """
+        waiters = self._waiters.get(key, ())
+        for waiter in waiters:
+            waiter.wake()
+        return len(waiters)
@@ -0,0 +1,300 @@
+"""
+Mesh Webhooks
+
+Receives Mesh transfer events, so a transfer's outcome is recorded even when
+the browser that started it never reports back.
+
+``WebhookVerifier`` checks each delivery before anything else happens:
+
+- the body must carry a valid HMAC-SHA256 signature made with the shared
+  webhook secret (base64 or hex encoded);
+- the signed event's timestamp must be within ``tolerance`` seconds of now,
+  so a captured delivery can't be replayed later;
+- an event ID seen within that window is acknowledged but not applied again.
+
+``WebhookIngestor`` decouples receiving from applying. Verified events go
+onto a bounded queue and the delivery is acknowledged at once; a full queue
+answers ``503`` so Mesh retries later. A background task drains the queue in
+micro-batches of up to ``batch_size`` events, collected for at most
+``batch_interval`` seconds, and hands each batch to a callback that writes
+``transfer_storage``. A burst of webhooks therefore costs user-facing routes
+one short batch at a time instead of one write per delivery.
+"""
+
+# --- Standard Library Imports ---
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+# --- Local Imports ---
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# --- Metrics ---
+WEBHOOK_DELIVERIES = REGISTRY.counter(
+    "webhook_deliveries_total", "Mesh webhook deliveries, by outcome", ("outcome",)
+)
+WEBHOOK_BATCH_SIZE = REGISTRY.histogram(
+    "webhook_batch_size", "Events applied per webhook micro-batch", buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+WEBHOOK_APPLY_LAG_SECONDS = REGISTRY.histogram(
+    "webhook_apply_lag_seconds", "Time from receiving a webhook event to applying it"
+)
+
+
+class WebhookRejected(Exception):
+    """Raised when a webhook delivery fails verification."""
+
+    def __init__(self, reason: str, status_code: int, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _field(payload: Dict[str, Any], *names: str) -> Any:
+    # Mesh payloads have used both camelCase and PascalCase keys
+    lowered = {key.lower(): value for key, value in payload.items()}
+    for name in names:
+        value = lowered.get(name.lower())
+        if value is not None:
+            return value
+    return None
+
+
+def normalize_event(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pull the fields the app uses out of a Mesh transfer event.
+
+    Args:
+        payload: Decoded webhook body
+
+    Returns:
+        Dict[str, Any]: ``event_id``, ``timestamp`` (epoch seconds),
+            ``event_type``, ``client_transaction_id``, ``transfer_id``,
+            ``status`` and ``tx_hash``
+
+    Raises:
+        WebhookRejected: If the event ID or timestamp is missing or malformed
+    """
+    data = _field(payload, "payload", "data")
+    fields = {**payload, **data} if isinstance(data, dict) else payload
+    event_id = _field(payload, "eventId")
+    timestamp = _field(payload, "timestamp", "createdTimestamp")
+    if not event_id or timestamp is None:
+        raise WebhookRejected("invalid", 400, "Event ID and timestamp are required")
+    try:
+        timestamp = float(timestamp)
+    except (TypeError, ValueError):
+        raise WebhookRejected("invalid", 400, "Malformed timestamp")
+    if timestamp > 1e11:
+        # Milliseconds
+        timestamp /= 1000
+    return {
+        "event_id": str(event_id),
+        "timestamp": timestamp,
+        "event_type": _field(payload, "eventType", "type"),
+        "client_transaction_id": _field(fields, "clientTransactionId"),
+        "transfer_id": _field(fields, "transferId"),
+        "status": _field(fields, "transferStatus", "status"),
+        "tx_hash": _field(fields, "txHash", "hash"),
+    }
+
+
+class WebhookVerifier:
+    """Signature, freshness and replay checks for webhook deliveries."""
+
+    def __init__(self, secret: str, tolerance: float = 300.0, max_event_ids: int = 100000):
+        """
+        Args:
+            secret: Shared webhook signing secret
+            tolerance: Maximum age, in seconds, of an accepted event
+            max_event_ids: Maximum event IDs remembered for replay protection
+        """
+        self._secret = secret.encode("utf-8")
+        self.tolerance = tolerance
+        self.max_event_ids = max_event_ids
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def verify(self, body: bytes, signature: Optional[str], now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Check a delivery and return its event.
+
+        Args:
+            body: Raw request body, exactly as signed
+            signature: Signature header value
+            now: Current wall-clock time (defaults to now)
+
+        Returns:
+            Dict[str, Any]: The normalized event (see ``normalize_event``)
+
+        Raises:
+            WebhookRejected: If the signature is missing or wrong, the body is
+                not a JSON object, or the event is too old or from the future
+        """
+        if not signature or not self._signature_matches(body, signature.strip()):
+            raise WebhookRejected("bad_signature", 401, "Invalid webhook signature")
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise WebhookRejected("invalid", 400, "Body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise WebhookRejected("invalid", 400, "Body is not a JSON object")
+        event = normalize_event(payload)
+        if now is None:
+            now = time.time()
+        if abs(now - event["timestamp"]) > self.tolerance:
+            raise WebhookRejected("stale", 400, "Event timestamp outside the accepted window")
+        return event
+
+    def first_delivery(self, event_id: str, now: Optional[float] = None) -> bool:
+        """
+        Record an event ID, reporting whether it was seen before.
+
+        IDs are remembered for twice the tolerance, after which a replay is
+        rejected as stale anyway.
+
+        Args:
+            event_id: The event's ID
+            now: Current wall-clock time (defaults to now)
+
+        Returns:
+            bool: True the first time an ID is seen, False for a redelivery
+        """
+        if now is None:
+            now = time.time()
+        while self._seen:
+            oldest_id, expires_at = next(iter(self._seen.items()))
+            if expires_at > now and len(self._seen) < self.max_event_ids:
+                break
+            del self._seen[oldest_id]
+        if event_id in self._seen:
+            return False
+        self._seen[event_id] = now + 2 * self.tolerance
+        return True
+
+    def forget(self, event_id: str) -> None:
+        """Forget an event ID, so a redelivery is accepted (e.g. after the queue refused it)."""
+        self._seen.pop(event_id, None)
+
+    def _signature_matches(self, body: bytes, signature: str) -> bool:
+        digest = hmac.new(self._secret, body, hashlib.sha256).digest()
+        if signature.startswith("sha256="):
+            signature = signature[len("sha256="):]
+        candidates = (base64.b64encode(digest).decode("ascii"), digest.hex())
+        return any(hmac.compare_digest(signature, candidate) for candidate in candidates)
+
+
+class WebhookIngestor:
+    """Bounded queue of verified events, applied in micro-batches by a background task."""
+
+    def __init__(
+        self,
+        apply: Callable[[List[Dict[str, Any]]], int],
+        max_queue: int = 1000,
+        batch_size: int = 100,
+        batch_interval: float = 0.05,
+    ):
+        """
+        Args:
+            apply: Writes a batch of events; returns how many entries changed
+            max_queue: Events buffered before deliveries are refused
+            batch_size: Maximum events per batch
+            batch_interval: Seconds to keep collecting after a batch's first event
+        """
+        self.apply = apply
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"queued": 0, "queue_full": 0, "batches": 0, "applied": 0, "updated": 0, "apply_errors": 0}
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """
+        Queue an event for the next batch.
+
+        Args:
+            event: A verified, normalized event
+
+        Returns:
+            bool: False if the queue is full and the event was not taken
+        """
+        event["received"] = time.monotonic()
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._stats["queue_full"] += 1
+            return False
+        self._stats["queued"] += 1
+        return True
+
+    async def start(self) -> None:
+        """Start applying queued events."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="webhook-ingestor")
+
+    async def stop(self) -> None:
+        """Stop the background task and apply whatever is still queued."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            batch = [self._queue.get_nowait() for _ in range(min(self.batch_size, self._queue.qsize()))]
+            self._apply(batch)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_interval
+            while len(batch) < self.batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._apply(batch)
+
+    def _apply(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            updated = self.apply(batch)
+        except Exception:
+            self._stats["apply_errors"] += 1
+            logger.exception("Applying %d webhook events failed", len(batch))
+            return
+        now = time.monotonic()
+        for event in batch:
+            WEBHOOK_APPLY_LAG_SECONDS.labels().observe(now - event["received"])
+        WEBHOOK_BATCH_SIZE.labels().observe(len(batch))
+        self._stats["batches"] += 1
+        self._stats["applied"] += len(batch)
+        self._stats["updated"] += updated
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report queue depth and batch counters.
+
+        Returns:
+            Dict[str, Any]: Queue depth and limit, plus counters
+        """
+        return {"queue_depth": self._queue.qsize(), "max_queue": self._queue.maxsize, **self._stats}